@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Times every benchmark script on the tree walker, the closure compiler and the VM."""
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from interpreter import Interpreter
+from closures import ClosureInterpreter
+from vm import VM
+
+ENGINES = (Interpreter, ClosureInterpreter, VM)
+# Measured by bench_startup.py instead
+SKIPPED = {"hello_world.shs"}
+REPEAT = 5
+
+
+def best_time(engine, source):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine().interpret(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    workloads = sorted(glob.glob(os.path.join(BENCH_DIR, "*.shs")))
+    for path in workloads:
+        if os.path.basename(path) in SKIPPED:
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            source = file.read()
+        baseline = None
+        for engine in ENGINES:
+            elapsed = best_time(engine, source)
+            if baseline is None:
+                baseline = elapsed
+            print(f"{os.path.basename(path):<20} {engine.__name__:<20} "
+                  f"{elapsed * 1000:8.1f} ms  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
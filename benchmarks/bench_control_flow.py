@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Times return/break/continue-heavy workloads on the tree walker and the VM."""
+import contextlib
+import io
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from interpreter import Interpreter
+from vm import VM
+
+WORKLOADS = ["fib.shs", "loop_control.shs"]
+REPEAT = 5
+
+
+def best_time(engine, source):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine().interpret(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    for workload in WORKLOADS:
+        with open(os.path.join(BENCH_DIR, workload), "r", encoding="utf-8") as file:
+            source = file.read()
+        for engine in (Interpreter, VM):
+            print(f"{workload:<20} {engine.__name__:<12} {best_time(engine, source) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
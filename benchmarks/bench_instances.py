@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Reports memory per class instance and the time of a field read on every engine."""
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from interpreter import Interpreter
+from closures import ClosureInterpreter
+from vm import VM
+
+ENGINES = (Interpreter, ClosureInterpreter, VM)
+COUNT = 20000
+READS = 200000
+REPEAT = 5
+
+# Builds a linked list of COUNT records; `head` keeps them all alive
+ALLOCATE = """
+class Record {
+    fn init(id, value, next) {
+        this.id = id
+        this.value = value
+        this.next = next
+    }
+}
+let head = null
+for i in 0 .. %d {
+    head = Record(i, i, head)
+}
+"""
+
+# Two field reads per iteration, minus the same loop without them
+READ_FIELDS = """
+class Point {
+    fn init(x, y) {
+        this.x = x
+        this.y = y
+    }
+}
+let p = Point(1, 2)
+let total = 0
+for i in 0 .. %d {
+    total = total + p.x + p.y
+}
+"""
+
+READ_NOTHING = """
+let total = 0
+for i in 0 .. %d {
+    total = total + 1 + 2
+}
+"""
+
+
+def traced_size(engine, count):
+    engine_instance = engine()
+    tracemalloc.start()
+    try:
+        engine_instance.interpret(ALLOCATE % count)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size
+
+
+def bytes_per_instance(engine):
+    # The empty run accounts for the interpreter, the program and the class
+    return (traced_size(engine, COUNT) - traced_size(engine, 0)) / COUNT
+
+
+def best_time(engine, source):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine().interpret(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    for engine in ENGINES:
+        size = bytes_per_instance(engine)
+        reads = best_time(engine, READ_FIELDS % READS) - best_time(engine, READ_NOTHING % READS)
+        print(f"{engine.__name__:<20} {size:7.1f} bytes/instance   "
+              f"{reads / (2 * READS) * 1e9:7.1f} ns/field read")
+
+
+if __name__ == "__main__":
+    main()
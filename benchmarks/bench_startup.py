@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Measures `shrav` wall time for a hello-world script, i.e. interpreter startup."""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(BENCH_DIR, "..", "src", "main.py")
+SCRIPT = os.path.join(BENCH_DIR, "hello_world.shs")
+REPEAT = 30
+
+
+def wall_times(command):
+    # One untimed run so bytecode and parse caches are warm
+    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    commands = [
+        ("python (no script)", [sys.executable, "-c", "pass"]),
+        ("shrav hello_world", [sys.executable, MAIN, SCRIPT]),
+        ("shrav --vm hello_world", [sys.executable, MAIN, "--vm", SCRIPT]),
+    ]
+    for label, command in commands:
+        times = wall_times(command)
+        print(f"{label:<24} best {min(times) * 1000:6.1f} ms   median {statistics.median(times) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
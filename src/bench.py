@@ -0,0 +1,208 @@
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import parser as parser_module
+from tokenizer import Tokenizer
+from resolver import Resolver
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks")
+ENGINES = ("tree", "closures", "vm")
+# Size of the generated source used to measure tokenizer and parser throughput
+GENERATED_FUNCTIONS = 2000
+
+
+def generated_source(functions=GENERATED_FUNCTIONS):
+    # A large but cheap-to-run program exercising most of the grammar
+    chunks = []
+    for i in range(functions):
+        chunks.append(
+            f"# Generated function {i}\n"
+            f"fn compute_{i}(a, b) {{\n"
+            f"    let total = a * {i} + b - (a % 7)\n"
+            f"    if total > {i * 3} and not (b == 0) {{\n"
+            f"        total = total - len(\"{i}\")\n"
+            f"    }} elif total < 0 {{\n"
+            f"        total = -total\n"
+            f"    }} else {{\n"
+            f"        total = total + 1.5\n"
+            f"    }}\n"
+            f"    let items = [a, b, {i}, \"text ${{a}}\"]\n"
+            f"    let record = {{name: \"f{i}\", size: {i}}}\n"
+            f"    return total\n"
+            f"}}\n"
+        )
+    chunks.append(f"print(compute_{functions - 1}(1, 2))\n")
+    return "".join(chunks)
+
+
+def load_workloads(paths):
+    # [(name, source)]: the given scripts, or the suite plus the generated source
+    workloads = []
+    for path in paths or sorted(glob.glob(os.path.join(BENCH_DIR, "*.shs"))):
+        with open(path, "r", encoding="utf-8") as file:
+            workloads.append((os.path.splitext(os.path.basename(path))[0], file.read()))
+    if not paths:
+        workloads.append(("generated", generated_source()))
+    return workloads
+
+
+def create_engine(engine):
+    if engine == "vm":
+        from vm import VM
+        return VM()
+    if engine == "closures":
+        from closures import ClosureInterpreter
+        return ClosureInterpreter()
+    from interpreter import Interpreter
+    return Interpreter()
+
+
+def summarize(times):
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "runs": len(times),
+    }
+
+
+def measure(function, warmup, repeat):
+    # Seconds taken by each of `repeat` calls, after `warmup` untimed ones
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_workload(source, engine, warmup, repeat):
+    tokens = Tokenizer(source).tokenize()
+    tokenize_times = measure(lambda: Tokenizer(source).tokenize(), warmup, repeat)
+    parse_times = measure(lambda: parser_module.Parser(tokens).parse(), warmup, repeat)
+
+    execute_times = []
+    for run in range(warmup + repeat):
+        # Every run gets a fresh tree: running one fills in runtime caches
+        program = parser_module.Parser(tokens).parse()
+        Resolver().resolve(program)
+        interpreter = create_engine(engine)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            interpreter.run_program(program)
+            elapsed = time.perf_counter() - start
+        if run >= warmup:
+            execute_times.append(elapsed)
+
+    return {
+        "bytes": len(source.encode("utf-8")),
+        "tokens": len(tokens),
+        "tokenize": summarize(tokenize_times),
+        "parse": summarize(parse_times),
+        "execute": summarize(execute_times),
+    }
+
+
+def run_benchmarks(paths=None, engine="tree", warmup=1, repeat=5):
+    results = {}
+    for name, source in load_workloads(paths):
+        try:
+            results[name] = bench_workload(source, engine, warmup, repeat)
+        except SyntaxError as e:
+            results[name] = failure("Syntax Error", e)
+        except Exception as e:
+            # One broken script should not cost the timings of the others
+            results[name] = failure("Runtime Error", e)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "engine": engine,
+        "warmup": warmup,
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+
+
+def failure(kind, error):
+    message = f"{kind}: {error}"
+    print(f"bench: {message}", file=sys.stderr)
+    return {"failed": True, "error": message}
+
+
+def print_usage():
+    print("Usage: shrav bench [options] [script.shs ...]")
+    print()
+    print("Times tokenizing, parsing and executing each script (by default the")
+    print("scripts in benchmarks/ plus a large generated source) and prints JSON.")
+    print()
+    print("Options:")
+    print("  --engine NAME  tree (default), closures or vm")
+    print("  --warmup N     Untimed runs before measuring (default 1)")
+    print("  --repeat N     Timed runs per phase (default 5)")
+    print("  --output FILE  Write the JSON to FILE instead of standard output")
+    print()
+    print("A script that fails is recorded with \"failed\": true and its error message,")
+    print("and the remaining scripts are still measured.")
+
+
+def main(args):
+    engine = "tree"
+    warmup = 1
+    repeat = 5
+    output = None
+    paths = []
+    args = list(args)
+    try:
+        while args:
+            option = args.pop(0)
+            if option == "--engine":
+                engine = args.pop(0)
+                if engine not in ENGINES:
+                    raise ValueError(f"Unknown engine '{engine}'")
+            elif option == "--warmup":
+                warmup = int(args.pop(0))
+            elif option == "--repeat":
+                repeat = int(args.pop(0))
+                if repeat < 1:
+                    raise ValueError("--repeat must be at least 1")
+            elif option == "--output":
+                output = args.pop(0)
+            elif option in ("-h", "--help"):
+                print_usage()
+                return 0
+            elif option.startswith("-"):
+                raise ValueError(f"Unknown option '{option}'")
+            else:
+                paths.append(option)
+    except IndexError:
+        print(f"Error: Missing value for option '{option}'")
+        print_usage()
+        return 1
+    except ValueError as e:
+        print(f"Error: {e}")
+        print_usage()
+        return 1
+
+    results = run_benchmarks(paths, engine, warmup, repeat)
+    text = json.dumps(results, indent=2)
+    if output is None:
+        print(text)
+    else:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    # Failed benchmarks are recorded in the results but still fail the run
+    failed = any(result.get("failed") for result in results["benchmarks"].values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
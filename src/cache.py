@@ -0,0 +1,105 @@
+import os
+import sys
+
+import environment
+import optimizer
+import parser as parser_module
+import resolver
+import tokenizer
+
+# Parsed programs are cached next to the script, like Python's __pycache__
+CACHE_DIR = "__shravcache__"
+CACHE_SUFFIX = ".shrc"
+
+# Set to False (main.py --no-cache) to always parse from source
+enabled = True
+
+# Sources shorter than this parse faster than a cache entry can be loaded
+MIN_CACHED_SIZE = 1024
+
+_fingerprint = None
+
+
+def interpreter_fingerprint():
+    """
+    Identify the front end that produced a cached program.
+
+    Records the Python version and the modification time and size of every
+    module that builds or defines the pickled tree (the same check Python
+    applies to .pyc files), so editing the tokenizer, parser, optimizer,
+    resolver or node definitions invalidates existing cache entries.
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        stats = []
+        for module in (tokenizer, parser_module, optimizer, resolver, environment):
+            info = os.stat(module.__file__)
+            stats.append((info.st_mtime_ns, info.st_size))
+        _fingerprint = (sys.version, tuple(stats))
+    return _fingerprint
+
+
+def cache_key(source):
+    # The full source is stored and compared rather than a digest of it:
+    # comparing is exact, and avoids importing hashlib (and OpenSSL) at startup
+    return (interpreter_fingerprint(), source)
+
+
+def cache_path(path, optimized=False):
+    directory, filename = os.path.split(os.path.abspath(path))
+    stem = os.path.splitext(filename)[0]
+    # Optimized trees are kept apart, like Python's .opt-1.pyc files
+    if optimized:
+        stem += ".opt"
+    return os.path.join(directory, CACHE_DIR, stem + CACHE_SUFFIX)
+
+
+def load_program(path, source, parse, optimized=False):
+    """
+    Return the resolved Program for a script, reusing the cached tree when
+    the source and interpreter are unchanged and calling parse(source)
+    (then refreshing the cache) otherwise.
+    """
+    if not enabled or len(source) < MIN_CACHED_SIZE:
+        return parse(source)
+
+    key = cache_key(source)
+    location = cache_path(path, optimized)
+
+    program = read_cache(location, key)
+    if program is None:
+        program = parse(source)
+        write_cache(location, key, program)
+    return program
+
+
+def read_cache(location, key):
+    import pickle
+    try:
+        with open(location, 'rb') as file:
+            # The key is pickled separately so stale entries are rejected
+            # without unpickling their tree
+            if pickle.load(file) != key:
+                return None
+            return pickle.load(file)
+    except Exception:
+        # Missing, truncated or unreadable entries are simply a cache miss
+        return None
+
+
+def write_cache(location, key, program):
+    import pickle
+    temporary = f"{location}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        with open(temporary, 'wb') as file:
+            pickle.dump(key, file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(program, file, pickle.HIGHEST_PROTOCOL)
+        # Atomic rename so concurrent runs never see a partial entry
+        os.replace(temporary, location)
+    except Exception:
+        # Read-only directories or trees too deep to pickle just skip caching
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
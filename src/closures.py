@@ -0,0 +1,742 @@
+import parser as parser_module
+from environment import (
+    Frame, loop_frames, ShravScriptFunction, ShravScriptGeneratorFunction, ShravScriptClass, ShravScriptInstance, ShravScriptModule, TailCall, UNSET,
+    BREAK, CONTINUE, RETURN,
+)
+from interpreter import Interpreter
+from library import add, find_method
+import operator
+
+
+class ClosureFunction(ShravScriptFunction):
+    """A ShravScript function whose body has been compiled to a closure."""
+
+    def __init__(self, declaration, body, closure, interpreter):
+        super().__init__(declaration, closure)
+        self.body = body
+        self.layout = declaration.layout
+        self.param_slots = tuple(declaration.param_slots)
+        # Return values are handed over through the compiling interpreter
+        self.interpreter = interpreter
+
+    def __call__(self, interpreter, arguments):
+        function = self
+        # Reused by tail calls to the same function, as in ShravScriptFunction
+        frame = None
+        while True:
+            layout = function.layout
+            if layout is None:
+                # No parameters or locals: run directly in the closure scope
+                environment = function.closure
+            else:
+                if frame is not None and frame.layout is layout and frame.enclosing is function.closure:
+                    environment = frame
+                    environment.reset()
+                else:
+                    environment = Frame(layout, function.closure)
+                frame = None if layout.captured else environment
+                slots = environment.slots
+                count = len(arguments)
+                for i, slot in enumerate(function.param_slots):
+                    slots[slot] = arguments[i] if i < count else None
+
+            if function.body(environment) is not RETURN:
+                return None
+            owner = function.interpreter
+            value = owner.return_value
+            owner.return_value = None
+            if type(value) is not TailCall:
+                return value
+            function = value.function
+            arguments = value.arguments
+
+    def call_method(self, interpreter, receiver, arguments):
+        environment = Frame(self.layout, self.closure)
+        slots = environment.slots
+        slots[self.declaration.this_slot] = receiver
+        count = len(arguments)
+        for i, slot in enumerate(self.param_slots):
+            slots[slot] = arguments[i] if i < count else None
+
+        completion = self.body(environment)
+        value = None
+        if completion is RETURN:
+            owner = self.interpreter
+            value = owner.return_value
+            owner.return_value = None
+            if type(value) is TailCall:
+                value = value.function(interpreter, value.arguments)
+        if self.is_initializer:
+            return receiver
+        return value
+
+
+def run_nothing(env):
+    return None
+
+
+class ClosureCompiler:
+    """
+    Translates a resolved Program into nested Python closures.
+
+    Every node is visited once. The result is a closure specialized for the
+    node's type, operator and resolved variable location, so running it does
+    no type switch or operator string comparison. Statement closures take
+    the current frame and return None or a completion signal like
+    Interpreter.execute. Expression closures take the frame and return the
+    value.
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def compile(self, program):
+        statements = [self.compile_statement(stmt) for stmt in program.statements]
+
+        def run_program(env):
+            for run in statements:
+                if run(env) is not None:
+                    # A top-level return ends the program
+                    break
+            return None
+        return run_program
+
+    # Statements
+
+    def compile_block(self, statements, layout=None):
+        runs = tuple(self.compile_statement(stmt) for stmt in statements)
+
+        if not runs:
+            body = run_nothing
+        elif len(runs) == 1:
+            body = runs[0]
+        else:
+            def body(env):
+                for run in runs:
+                    completion = run(env)
+                    if completion is not None:
+                        return completion
+                return None
+
+        if layout is None:
+            # Blocks that declare nothing run in the enclosing frame
+            return body
+
+        def scoped(env):
+            return body(Frame(layout, env))
+        return scoped
+
+    def compile_statement(self, stmt):
+        stmt_type = type(stmt)
+
+        if stmt_type == parser_module.Print:
+            return self.compile_print(stmt)
+        elif stmt_type == parser_module.VariableDeclaration:
+            value = self.compile_expression(stmt.value) if stmt.value is not None else None
+            return self.compile_declare(stmt.slot, stmt.name, value)
+        elif stmt_type == parser_module.FunctionDeclaration:
+            return self.compile_declare(stmt.slot, stmt.name, self.compile_function(stmt))
+        elif stmt_type == parser_module.Return:
+            return self.compile_return(stmt)
+        elif stmt_type == parser_module.IfStatement:
+            return self.compile_if(stmt)
+        elif stmt_type == parser_module.WhileLoop:
+            return self.compile_while(stmt)
+        elif stmt_type == parser_module.ForLoop:
+            return self.compile_for(stmt)
+        elif stmt_type == parser_module.ForInLoop:
+            return self.compile_for_in(stmt)
+        elif stmt_type == parser_module.WithStatement:
+            return self.compile_with(stmt)
+        elif stmt_type == parser_module.BreakStatement:
+            return lambda env: BREAK
+        elif stmt_type == parser_module.ContinueStatement:
+            return lambda env: CONTINUE
+        elif stmt_type == parser_module.TryCatch:
+            return self.compile_try_catch(stmt)
+        elif stmt_type == parser_module.ImportStatement:
+            return self.compile_import(stmt)
+        elif stmt_type == parser_module.ClassDeclaration:
+            return self.compile_class(stmt)
+        elif stmt_type == parser_module.SwitchStatement:
+            # Not executed by the tree walker either
+            return run_nothing
+
+        evaluate = self.compile_expression(stmt)
+
+        def run_expression(env):
+            evaluate(env)
+        return run_expression
+
+    def compile_declare(self, slot, name, value):
+        # value is an expression closure, or None to declare null
+        if value is None:
+            value = lambda env: None
+
+        if slot is None:
+            def declare_global(env):
+                env.define(name, value(env))
+            return declare_global
+
+        def declare_local(env):
+            env.slots[slot] = value(env)
+        return declare_local
+
+    def compile_print(self, stmt):
+        interpreter = self.interpreter
+        value = self.compile_expression(stmt.value)
+
+        def run_print(env):
+            print(interpreter.stringify(value(env)))
+        return run_print
+
+    def compile_return(self, stmt):
+        interpreter = self.interpreter
+        if stmt.value is None:
+            def run_return(env):
+                interpreter.return_value = None
+                return RETURN
+            return run_return
+
+        if stmt.tail_call:
+            return self.compile_tail_call(stmt.value)
+
+        value = self.compile_expression(stmt.value)
+
+        def run_return_value(env):
+            interpreter.return_value = value(env)
+            return RETURN
+        return run_return_value
+
+    def compile_tail_call(self, expr):
+        # Compiled functions are left for the calling ClosureFunction's loop
+        interpreter = self.interpreter
+        callee = self.compile_expression(expr.func)
+        args = tuple(self.compile_expression(arg) for arg in expr.args)
+
+        def run_tail_call(env):
+            function = callee(env)
+            arguments = [arg(env) for arg in args]
+            if type(function) is ClosureFunction:
+                interpreter.return_value = TailCall(function, arguments)
+            else:
+                interpreter.return_value = call_value(interpreter, function, arguments)
+            return RETURN
+        return run_tail_call
+
+    def compile_if(self, stmt):
+        is_truthy = self.interpreter.is_truthy
+        branches = [(self.compile_expression(stmt.condition), self.compile_block(stmt.if_body, stmt.if_layout))]
+        for condition, body, layout in zip(stmt.elif_conditions, stmt.elif_bodies, stmt.elif_layouts):
+            branches.append((self.compile_expression(condition), self.compile_block(body, layout)))
+        otherwise = None
+        if stmt.else_body is not None:
+            otherwise = self.compile_block(stmt.else_body, stmt.else_layout)
+
+        if len(branches) == 1:
+            condition, body = branches[0]
+            if otherwise is None:
+                def run_if(env):
+                    value = condition(env)
+                    if value is True or (value is not False and is_truthy(value)):
+                        return body(env)
+                    return None
+                return run_if
+
+            def run_if_else(env):
+                value = condition(env)
+                if value is True or (value is not False and is_truthy(value)):
+                    return body(env)
+                return otherwise(env)
+            return run_if_else
+
+        branches = tuple(branches)
+
+        def run_if_chain(env):
+            # Only the first branch whose condition holds runs
+            for condition, body in branches:
+                value = condition(env)
+                if value is True or (value is not False and is_truthy(value)):
+                    return body(env)
+            if otherwise is not None:
+                return otherwise(env)
+            return None
+        return run_if_chain
+
+    def compile_while(self, stmt):
+        is_truthy = self.interpreter.is_truthy
+        condition = self.compile_expression(stmt.condition)
+        layout = stmt.body_layout
+        # Frames are created by the loop itself, so the body runs unscoped
+        body = self.compile_block(stmt.body)
+
+        def run_while(env):
+            frames = loop_frames(layout, env)
+            while True:
+                value = condition(env)
+                if value is not True and (value is False or not is_truthy(value)):
+                    break
+
+                completion = body(next(frames))
+                if completion is BREAK:
+                    break
+                elif completion is RETURN:
+                    return RETURN
+                # CONTINUE and normal completion both move on to the next iteration
+            return None
+        return run_while
+
+    def compile_for(self, stmt):
+        range_start = self.compile_expression(stmt.range_start)
+        range_end = self.compile_expression(stmt.range_end)
+        layout = stmt.body_layout
+        body = self.compile_block(stmt.body)
+
+        def run_for(env):
+            start = int(range_start(env))
+            end = int(range_end(env))
+            for i, scope in zip(range(start, end), loop_frames(layout, env, 1)):
+                scope.slots[0] = i  # The loop variable
+
+                completion = body(scope)
+                if completion is BREAK:
+                    break
+                elif completion is RETURN:
+                    return RETURN
+            return None
+        return run_for
+
+    def compile_for_in(self, stmt):
+        iterable = self.compile_expression(stmt.iterable)
+        iterate = self.interpreter.iterate
+        layout = stmt.body_layout
+        body = self.compile_block(stmt.body)
+
+        def run_for_in(env):
+            for item, scope in zip(iterate(iterable(env)), loop_frames(layout, env, 1)):
+                scope.slots[0] = item  # The loop variable
+
+                completion = body(scope)
+                if completion is BREAK:
+                    break
+                elif completion is RETURN:
+                    return RETURN
+            return None
+        return run_for_in
+
+    def compile_with(self, stmt):
+        expression = self.compile_expression(stmt.expression)
+        layout = stmt.body_layout
+        body = self.compile_block(stmt.body)
+
+        def run_with(env):
+            resource = expression(env)
+            # The 'as' variable lives in slot 0
+            scope = Frame(layout, env)
+            scope.slots[0] = resource
+            try:
+                return body(scope)
+            finally:
+                # Close the resource if it has a close method
+                if hasattr(resource, 'close') and callable(resource.close):
+                    resource.close()
+        return run_with
+
+    def compile_try_catch(self, stmt):
+        try_body = self.compile_block(stmt.try_body, stmt.try_layout)
+        catch_layout = stmt.catch_layout
+        catch_body = self.compile_block(stmt.catch_body)
+
+        def run_try_catch(env):
+            try:
+                return try_body(env)
+            except Exception as e:
+                scope = Frame(catch_layout, env)
+                scope.slots[0] = str(e)  # The catch variable
+                return catch_body(scope)
+        return run_try_catch
+
+    def compile_import(self, stmt):
+        interpreter = self.interpreter
+        module_name = stmt.module_name
+        return self.compile_declare(stmt.slot, module_name,
+                                    lambda env: interpreter.import_module(module_name))
+
+    def compile_class(self, stmt):
+        methods = [(method.name, self.compile_body(method)) for method in stmt.methods]
+        declarations = {method.name: method for method in stmt.methods}
+        interpreter = self.interpreter
+        name = stmt.name
+
+        def make_class(env):
+            functions = {}
+            for method_name, body in methods:
+                declaration = declarations[method_name]
+                if declaration.is_generator:
+                    functions[method_name] = ShravScriptGeneratorFunction(declaration, env)
+                    continue
+                function = ClosureFunction(declaration, body, env, interpreter)
+                function.is_initializer = method_name == "init"
+                functions[method_name] = function
+            return ShravScriptClass(name, functions)
+        return self.compile_declare(stmt.slot, name, make_class)
+
+    def compile_body(self, function):
+        # The call frame is created by ClosureFunction
+        if function.is_generator:
+            # Generator bodies are run by the tree walker, which can suspend them
+            return None
+        return self.compile_block(function.body)
+
+    def compile_function(self, function):
+        if function.is_generator:
+            return lambda env: ShravScriptGeneratorFunction(function, env)
+        body = self.compile_body(function)
+        interpreter = self.interpreter
+
+        def make_function(env):
+            return ClosureFunction(function, body, env, interpreter)
+        return make_function
+
+    # Expressions
+
+    def compile_expression(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == parser_module.Literal:
+            value = expr.value
+            return lambda env: value
+        elif expr_type == parser_module.Identifier:
+            return self.compile_lookup(expr)
+        elif expr_type == parser_module.Assignment:
+            return self.compile_assignment(expr)
+        elif expr_type == parser_module.BinaryOp:
+            return self.compile_binary(expr)
+        elif expr_type == parser_module.UnaryOp:
+            return self.compile_unary(expr)
+        elif expr_type == parser_module.FunctionCall:
+            return self.compile_call(expr)
+        elif expr_type in (parser_module.ListLiteral, parser_module.DictLiteral) and expr.template is not None:
+            copy = expr.template.copy
+            return lambda env: copy()
+        elif expr_type == parser_module.ListLiteral:
+            elements = tuple(self.compile_expression(element) for element in expr.elements)
+            return lambda env: [element(env) for element in elements]
+        elif expr_type == parser_module.DictLiteral:
+            items = tuple((key, self.compile_expression(value)) for key, value in expr.items.items())
+            return lambda env: {key: value(env) for key, value in items}
+        elif expr_type == parser_module.IndexAccess:
+            get_index = self.interpreter.get_index
+            obj = self.compile_expression(expr.obj)
+            index = self.compile_expression(expr.index)
+            return lambda env: get_index(obj(env), index(env))
+        elif expr_type == parser_module.PropertyAccess:
+            return self.compile_property_access(expr)
+        elif expr_type == parser_module.LambdaExpression:
+            return self.compile_function(expr)
+        elif expr_type == parser_module.InterpolatedString:
+            return self.compile_interpolated_string(expr)
+        raise RuntimeError(f"Cannot compile {expr_type.__name__}")
+
+    def compile_lookup(self, expr):
+        name = expr.name
+        slot = expr.slot
+
+        if slot is None:
+            values = self.interpreter.globals.values
+
+            def load_global(env):
+                if name in values:
+                    return values[name]
+                raise NameError(f"Undefined variable '{name}'")
+            return load_global
+
+        depth = expr.depth
+        if depth == 0:
+            def load_local(env):
+                value = env.slots[slot]
+                if value is UNSET:
+                    # Not declared yet in the resolved scope; fall back to the dynamic lookup
+                    return env.get(name)
+                return value
+            return load_local
+
+        if depth == 1:
+            def load_enclosing(env):
+                value = env.enclosing.slots[slot]
+                if value is UNSET:
+                    return env.get(name)
+                return value
+            return load_enclosing
+
+        return lambda env: env.get_at(depth, slot, name)
+
+    def compile_assignment(self, expr):
+        value = self.compile_expression(expr.value)
+        target = expr.target
+
+        if isinstance(target, parser_module.Identifier):
+            name = target.name
+            slot = expr.slot
+            if slot is None:
+                assign = self.interpreter.globals.assign
+
+                def assign_global(env):
+                    result = value(env)
+                    assign(name, result)
+                    return result
+                return assign_global
+
+            depth = expr.depth
+            if depth == 0:
+                def assign_local(env):
+                    result = value(env)
+                    slots = env.slots
+                    if slots[slot] is UNSET:
+                        env.assign(name, result)
+                    else:
+                        slots[slot] = result
+                    return result
+                return assign_local
+
+            def assign_at(env):
+                result = value(env)
+                env.assign_at(depth, slot, name, result)
+                return result
+            return assign_at
+
+        obj = self.compile_expression(target.obj)
+        if isinstance(target, parser_module.PropertyAccess):
+            set_property = self.interpreter.set_property
+            prop = target.prop
+
+            def assign_property(env):
+                result = value(env)
+                set_property(obj(env), prop, result)
+                return result
+            return assign_property
+
+        index = self.compile_expression(target.index)
+
+        def assign_index(env):
+            result = value(env)
+            obj(env)[index(env)] = result
+            return result
+        return assign_index
+
+    def compile_binary(self, expr):
+        left = self.compile_expression(expr.left)
+        operator_name = expr.operator
+
+        if type(expr.right) == parser_module.Literal and operator_name in CONSTANT_OPERATIONS:
+            # Right operand known at compile time, e.g. `i + 1` or `n < 2`
+            return CONSTANT_OPERATIONS[operator_name](left, expr.right.value)
+
+        right = self.compile_expression(expr.right)
+        if operator_name in BINARY_OPERATIONS:
+            return BINARY_OPERATIONS[operator_name](left, right)
+
+        # Both sides of and/or are evaluated, as in Interpreter.evaluate_binary
+        is_truthy = self.interpreter.is_truthy
+        if operator_name == 'and':
+            def logical_and(env):
+                left_value = left(env)
+                right_value = right(env)
+                return is_truthy(left_value) and is_truthy(right_value)
+            return logical_and
+        elif operator_name == 'or':
+            def logical_or(env):
+                left_value = left(env)
+                right_value = right(env)
+                return is_truthy(left_value) or is_truthy(right_value)
+            return logical_or
+        return lambda env: None
+
+    def compile_unary(self, expr):
+        operand = self.compile_expression(expr.operand)
+        if expr.operator == '-':
+            return lambda env: -operand(env)
+        elif expr.operator == 'not':
+            is_truthy = self.interpreter.is_truthy
+            return lambda env: not is_truthy(operand(env))
+        return lambda env: None
+
+    def compile_interpolated_string(self, expr):
+        # (text, None) for literal text, (name, lookup) for a ${name} reference
+        pieces = tuple((part, None) if type(part) is str else (part.name, self.compile_lookup(part))
+                       for part in expr.parts)
+
+        def interpolate(env):
+            result = []
+            for text, lookup in pieces:
+                if lookup is None:
+                    result.append(text)
+                else:
+                    try:
+                        result.append(str(lookup(env)))
+                    except NameError:
+                        # Unknown names are left in the text as written
+                        result.append("${" + text + "}")
+            return "".join(result)
+        return interpolate
+
+    def compile_property_access(self, expr):
+        get_property = self.interpreter.get_property
+        obj = self.compile_expression(expr.obj)
+        prop = expr.prop
+        # Inline cache: the field slot for the last instance shape seen here
+        cached_shape = None
+        cached_slot = None
+
+        def get_field(env):
+            nonlocal cached_shape, cached_slot
+            target = obj(env)
+            if type(target) is ShravScriptInstance:
+                shape = target.shape
+                if shape is cached_shape:
+                    return target.values[cached_slot]
+                slot = shape.index.get(prop)
+                if slot is not None:
+                    cached_shape = shape
+                    cached_slot = slot
+                    return target.values[slot]
+            return get_property(target, prop)
+        return get_field
+
+    def compile_call(self, expr):
+        interpreter = self.interpreter
+        args = tuple(self.compile_expression(arg) for arg in expr.args)
+
+        if isinstance(expr.func, parser_module.PropertyAccess):
+            return self.compile_method_call(expr.func, args)
+
+        callee = self.compile_expression(expr.func)
+        if not args:
+            def call_no_args(env):
+                function = callee(env)
+                if type(function) is ClosureFunction:
+                    return function(interpreter, [])
+                return call_value(interpreter, function, [])
+            return call_no_args
+
+        def call(env):
+            function = callee(env)
+            arguments = [arg(env) for arg in args]
+            if type(function) is ClosureFunction:
+                return function(interpreter, arguments)
+            return call_value(interpreter, function, arguments)
+        return call
+
+    def compile_method_call(self, func, args):
+        interpreter = self.interpreter
+        get_property = interpreter.get_property
+        obj = self.compile_expression(func.obj)
+        name = func.prop
+
+        # Inline cache: the method found for the last class seen at this site
+        cached_class = None
+        cached_method = None
+
+        def call_method(env):
+            nonlocal cached_class, cached_method
+            target = obj(env)
+            if type(target) is ShravScriptInstance and name not in target.shape.index:
+                klass = target.klass
+                if klass is not cached_class:
+                    cached_method = klass.find_method(name)
+                    if cached_method is None:
+                        raise AttributeError(f"Undefined property '{name}'")
+                    cached_class = klass
+                return cached_method.call_method(interpreter, target, [arg(env) for arg in args])
+
+            method = find_method(target, name)
+            if method is not None:
+                return method.call_method(interpreter, target, [arg(env) for arg in args])
+
+            function = get_property(target, name)
+            arguments = [arg(env) for arg in args]
+            if isinstance(target, ShravScriptModule):
+                # Module function: module.function()
+                return function(interpreter, arguments)
+            return call_value(interpreter, function, arguments)
+        return call_method
+
+
+def call_value(interpreter, callee, arguments):
+    if isinstance(callee, ShravScriptModule):
+        raise RuntimeError("Cannot call a module directly. Use module.function() instead.")
+    if not callable(callee):
+        raise RuntimeError(f"Can only call functions and classes, got {type(callee).__name__}")
+    return callee(interpreter, arguments)
+
+
+def make_add(left, right):
+    return lambda env: add(left(env), right(env))
+
+
+def make_add_constant(left, constant):
+    if isinstance(constant, str):
+        return lambda env: str(left(env)) + constant
+
+    def add_constant(env):
+        left_value = left(env)
+        if isinstance(left_value, str):
+            return left_value + str(constant)
+        return left_value + constant
+    return add_constant
+
+
+def make_operation(function):
+    def make(left, right):
+        return lambda env: function(left(env), right(env))
+    return make
+
+
+def make_constant_operation(function):
+    def make(left, constant):
+        return lambda env: function(left(env), constant)
+    return make
+
+
+# Closure factories for each binary operator, keyed like Interpreter.evaluate_binary
+BINARY_OPERATIONS = {
+    '+': make_add,
+    '-': lambda left, right: lambda env: left(env) - right(env),
+    '*': lambda left, right: lambda env: left(env) * right(env),
+    '/': lambda left, right: lambda env: left(env) / right(env),
+    '%': lambda left, right: lambda env: left(env) % right(env),
+    '**': make_operation(operator.pow),
+    '==': lambda left, right: lambda env: left(env) == right(env),
+    '!=': lambda left, right: lambda env: left(env) != right(env),
+    '<': lambda left, right: lambda env: left(env) < right(env),
+    '>': lambda left, right: lambda env: left(env) > right(env),
+    '<=': lambda left, right: lambda env: left(env) <= right(env),
+    '>=': lambda left, right: lambda env: left(env) >= right(env),
+}
+
+CONSTANT_OPERATIONS = {
+    '+': make_add_constant,
+    '-': lambda left, constant: lambda env: left(env) - constant,
+    '*': lambda left, constant: lambda env: left(env) * constant,
+    '/': lambda left, constant: lambda env: left(env) / constant,
+    '%': lambda left, constant: lambda env: left(env) % constant,
+    '**': make_constant_operation(operator.pow),
+    '==': lambda left, constant: lambda env: left(env) == constant,
+    '!=': lambda left, constant: lambda env: left(env) != constant,
+    '<': lambda left, constant: lambda env: left(env) < constant,
+    '>': lambda left, constant: lambda env: left(env) > constant,
+    '<=': lambda left, constant: lambda env: left(env) <= constant,
+    '>=': lambda left, constant: lambda env: left(env) >= constant,
+}
+
+
+class ClosureInterpreter(Interpreter):
+    """Runs programs by compiling them to closures with ClosureCompiler."""
+
+    def run_program(self, program):
+        try:
+            run = ClosureCompiler(self).compile(program)
+        except RecursionError:
+            raise self.nested_too_deeply() from None
+        run(self.globals)
+        return None
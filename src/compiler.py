@@ -0,0 +1,434 @@
+import parser as parser_module
+
+# Opcodes. Every instruction occupies two slots in the flat code array:
+# the opcode followed by a single integer operand (0 when unused).
+LOAD_CONST = 0
+LOAD_NAME = 1
+STORE_NAME = 2
+DEFINE_NAME = 3
+POP_TOP = 4
+BINARY_OP = 5
+UNARY_NEG = 6
+UNARY_NOT = 7
+JUMP = 8
+POP_JUMP_IF_FALSE = 9
+CALL = 10
+RETURN_VALUE = 11
+GET_INDEX = 12
+SET_INDEX = 13
+GET_ATTR = 14
+SET_ATTR = 15
+BUILD_LIST = 16
+BUILD_DICT = 17
+MAKE_FUNCTION = 18
+MAKE_CLASS = 19
+PUSH_SCOPE = 20
+POP_SCOPE = 21
+FOR_RANGE = 22
+FOR_ITER = 23
+SETUP_TRY = 24
+POP_BLOCK = 25
+SETUP_WITH = 26
+EXIT_WITH = 27
+IMPORT = 28
+PRINT = 29
+COPY_CONST = 30
+LOAD_METHOD = 31
+CALL_METHOD = 32
+INTERPOLATE = 33
+BUILD_STRING = 34
+TAIL_CALL = 35
+GET_ITER = 36
+YIELD_VALUE = 37
+
+OPNAMES = {value: name for name, value in list(globals().items())
+           if name.isupper() and isinstance(value, int)}
+
+# Operand of BINARY_OP is an index into this tuple
+BINARY_OPERATORS = ('+', '-', '*', '/', '%', '**', '==', '!=', '<', '>', '<=', '>=', 'and', 'or')
+BINARY_OPERATOR_INDEX = {op: i for i, op in enumerate(BINARY_OPERATORS)}
+
+
+class CodeObject:
+    def __init__(self, name, params, is_generator=False):
+        self.name = name
+        self.params = params
+        # Calls return a generator that runs the code up to each YIELD_VALUE
+        self.is_generator = is_generator
+        self.code = []
+        self.constants = []
+        self.names = []
+        self.constant_index = {}
+        self.name_index = {}
+
+    def __repr__(self):
+        return f"<code '{self.name}'>"
+
+
+class Compiler:
+    """Compiles a parsed Program into a CodeObject for the VM."""
+
+    def __init__(self):
+        self.code_object = None
+        self.blocks = []
+
+    def compile(self, program):
+        return self.compile_code("<main>", [], program.statements)
+
+    def compile_code(self, name, params, statements, is_generator=False):
+        previous_code, previous_blocks = self.code_object, self.blocks
+        self.code_object = CodeObject(name, params, is_generator)
+        self.blocks = []
+        try:
+            for stmt in statements:
+                self.compile_statement(stmt)
+            self.emit(LOAD_CONST, self.constant(None))
+            self.emit(RETURN_VALUE)
+            return self.code_object
+        finally:
+            self.code_object, self.blocks = previous_code, previous_blocks
+
+    # Emission helpers
+
+    def emit(self, op, arg=0):
+        code = self.code_object.code
+        code.append(op)
+        code.append(arg)
+        return len(code) - 2
+
+    def patch(self, position, target=None):
+        code = self.code_object.code
+        code[position + 1] = len(code) if target is None else target
+
+    def here(self):
+        return len(self.code_object.code)
+
+    def constant(self, value):
+        code_object = self.code_object
+        # 0.0 == -0.0, so floats are told apart by their spelling
+        key = (float, repr(value)) if type(value) is float else (type(value), value)
+        if key not in code_object.constant_index:
+            code_object.constant_index[key] = len(code_object.constants)
+            code_object.constants.append(value)
+        return code_object.constant_index[key]
+
+    def template(self, value):
+        # Mutable templates are never deduplicated; COPY_CONST copies them on use
+        code_object = self.code_object
+        code_object.constants.append(value)
+        return len(code_object.constants) - 1
+
+    def site(self, expr):
+        # Method calls and property reads use their node as an inline cache
+        code_object = self.code_object
+        code_object.constants.append(expr)
+        return len(code_object.constants) - 1
+
+    def name(self, name):
+        code_object = self.code_object
+        if name not in code_object.name_index:
+            code_object.name_index[name] = len(code_object.names)
+            code_object.names.append(name)
+        return code_object.name_index[name]
+
+    # Statements
+
+    def compile_block(self, statements):
+        self.emit(PUSH_SCOPE)
+        self.blocks.append({'kind': 'scope'})
+        for stmt in statements:
+            self.compile_statement(stmt)
+        self.blocks.pop()
+        self.emit(POP_SCOPE)
+
+    def compile_statement(self, stmt):
+        stmt_type = type(stmt)
+
+        if stmt_type == parser_module.Print:
+            self.compile_expression(stmt.value)
+            self.emit(PRINT)
+        elif stmt_type == parser_module.VariableDeclaration:
+            if stmt.value is not None:
+                self.compile_expression(stmt.value)
+            else:
+                self.emit(LOAD_CONST, self.constant(None))
+            self.emit(DEFINE_NAME, self.name(stmt.name))
+        elif stmt_type == parser_module.FunctionDeclaration:
+            self.compile_function(stmt.name, stmt.params, stmt.body, stmt.is_generator)
+            self.emit(DEFINE_NAME, self.name(stmt.name))
+        elif stmt_type == parser_module.Yield:
+            if stmt.value is not None:
+                self.compile_expression(stmt.value)
+            else:
+                self.emit(LOAD_CONST, self.constant(None))
+            self.emit(YIELD_VALUE)
+        elif stmt_type == parser_module.Return:
+            if stmt.tail_call:
+                # Replaces the current frame when the callee is compiled;
+                # otherwise pushes the result for RETURN_VALUE like CALL
+                call = stmt.value
+                self.compile_expression(call.func)
+                for arg in call.args:
+                    self.compile_expression(arg)
+                self.emit(TAIL_CALL, len(call.args))
+            elif stmt.value is not None:
+                self.compile_expression(stmt.value)
+            else:
+                self.emit(LOAD_CONST, self.constant(None))
+            self.emit(RETURN_VALUE)
+        elif stmt_type == parser_module.IfStatement:
+            self.compile_if(stmt)
+        elif stmt_type == parser_module.WhileLoop:
+            self.compile_while(stmt)
+        elif stmt_type == parser_module.ForLoop:
+            self.compile_expression(stmt.range_start)
+            self.compile_expression(stmt.range_end)
+            self.emit(FOR_RANGE)
+            self.compile_for(stmt)
+        elif stmt_type == parser_module.ForInLoop:
+            self.compile_expression(stmt.iterable)
+            self.emit(GET_ITER)
+            self.compile_for(stmt)
+        elif stmt_type == parser_module.WithStatement:
+            self.compile_with(stmt)
+        elif stmt_type == parser_module.BreakStatement:
+            self.compile_loop_exit(is_break=True)
+        elif stmt_type == parser_module.ContinueStatement:
+            self.compile_loop_exit(is_break=False)
+        elif stmt_type == parser_module.TryCatch:
+            self.compile_try_catch(stmt)
+        elif stmt_type == parser_module.ImportStatement:
+            self.emit(IMPORT, self.name(stmt.module_name))
+        elif stmt_type == parser_module.ClassDeclaration:
+            for method in stmt.methods:
+                # The receiver is passed as an implicit first parameter
+                self.compile_function(method.name, ['this'] + method.params, method.body, method.is_generator)
+            self.emit(MAKE_CLASS, self.constant((stmt.name, len(stmt.methods))))
+            self.emit(DEFINE_NAME, self.name(stmt.name))
+        elif stmt_type == parser_module.SwitchStatement:
+            # The tree-walking interpreter does not execute switch statements
+            # either; keep both engines consistent.
+            pass
+        else:
+            self.compile_expression(stmt)
+            self.emit(POP_TOP)
+
+    def compile_function(self, name, params, body, is_generator=False):
+        code = self.compile_code(name, params, body, is_generator)
+        self.emit(MAKE_FUNCTION, self.constant(code))
+
+    def compile_if(self, stmt):
+        end_jumps = []
+        conditions = [stmt.condition] + stmt.elif_conditions
+        bodies = [stmt.if_body] + stmt.elif_bodies
+
+        for i, (condition, body) in enumerate(zip(conditions, bodies)):
+            self.compile_expression(condition)
+            next_branch = self.emit(POP_JUMP_IF_FALSE)
+            self.compile_block(body)
+            if i < len(bodies) - 1 or stmt.else_body is not None:
+                end_jumps.append(self.emit(JUMP))
+            self.patch(next_branch)
+
+        if stmt.else_body is not None:
+            self.compile_block(stmt.else_body)
+
+        for jump in end_jumps:
+            self.patch(jump)
+
+    def compile_while(self, stmt):
+        loop_start = self.here()
+        self.compile_expression(stmt.condition)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+
+        loop = {'kind': 'loop', 'continue': loop_start, 'breaks': [], 'iterator': False}
+        self.blocks.append(loop)
+        self.compile_block(stmt.body)
+        self.blocks.pop()
+
+        self.emit(JUMP, loop_start)
+        self.patch(exit_jump)
+        for jump in loop['breaks']:
+            self.patch(jump)
+
+    def compile_for(self, stmt):
+        # Loop over the iterator on top of the stack (from FOR_RANGE or GET_ITER)
+        loop_start = self.here()
+        exit_jump = self.emit(FOR_ITER)
+
+        loop = {'kind': 'loop', 'continue': loop_start, 'breaks': [], 'iterator': True}
+        self.blocks.append(loop)
+        self.emit(PUSH_SCOPE)
+        self.blocks.append({'kind': 'scope'})
+        self.emit(DEFINE_NAME, self.name(stmt.var_name))
+        for body_stmt in stmt.body:
+            self.compile_statement(body_stmt)
+        self.blocks.pop()
+        self.emit(POP_SCOPE)
+        self.blocks.pop()
+
+        self.emit(JUMP, loop_start)
+        self.patch(exit_jump)
+        for jump in loop['breaks']:
+            self.patch(jump)
+
+    def compile_loop_exit(self, is_break):
+        keyword = 'break' if is_break else 'continue'
+
+        # Unwind every scope, try and with block between here and the loop
+        for block in reversed(self.blocks):
+            if block['kind'] == 'loop':
+                if is_break and block['iterator']:
+                    self.emit(POP_TOP)
+                if is_break:
+                    block['breaks'].append(self.emit(JUMP))
+                else:
+                    self.emit(JUMP, block['continue'])
+                return
+            elif block['kind'] == 'scope':
+                self.emit(POP_SCOPE)
+            elif block['kind'] == 'try':
+                self.emit(POP_BLOCK)
+            elif block['kind'] == 'with':
+                self.emit(EXIT_WITH)
+
+        raise SyntaxError(f"'{keyword}' outside loop")
+
+    def compile_try_catch(self, stmt):
+        setup = self.emit(SETUP_TRY)
+        self.blocks.append({'kind': 'try'})
+        self.compile_block(stmt.try_body)
+        self.blocks.pop()
+        self.emit(POP_BLOCK)
+        end_jump = self.emit(JUMP)
+
+        # The VM pushes the error message before jumping to the handler
+        self.patch(setup)
+        self.emit(PUSH_SCOPE)
+        self.blocks.append({'kind': 'scope'})
+        self.emit(DEFINE_NAME, self.name(stmt.catch_var))
+        for catch_stmt in stmt.catch_body:
+            self.compile_statement(catch_stmt)
+        self.blocks.pop()
+        self.emit(POP_SCOPE)
+        self.patch(end_jump)
+
+    def compile_with(self, stmt):
+        self.compile_expression(stmt.expression)
+        self.emit(SETUP_WITH)
+        self.blocks.append({'kind': 'with'})
+        self.emit(PUSH_SCOPE)
+        self.blocks.append({'kind': 'scope'})
+        self.emit(DEFINE_NAME, self.name(stmt.var_name))
+        for body_stmt in stmt.body:
+            self.compile_statement(body_stmt)
+        self.blocks.pop()
+        self.emit(POP_SCOPE)
+        self.blocks.pop()
+        self.emit(EXIT_WITH)
+
+    # Expressions
+
+    def compile_expression(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == parser_module.Literal:
+            self.emit(LOAD_CONST, self.constant(expr.value))
+        elif expr_type == parser_module.Identifier:
+            self.emit(LOAD_NAME, self.name(expr.name))
+        elif expr_type == parser_module.Assignment:
+            self.compile_assignment(expr)
+        elif expr_type == parser_module.BinaryOp:
+            self.compile_expression(expr.left)
+            self.compile_expression(expr.right)
+            self.emit(BINARY_OP, BINARY_OPERATOR_INDEX[expr.operator])
+        elif expr_type == parser_module.UnaryOp:
+            self.compile_expression(expr.operand)
+            self.emit(UNARY_NEG if expr.operator == '-' else UNARY_NOT)
+        elif expr_type == parser_module.FunctionCall and type(expr.func) == parser_module.PropertyAccess:
+            # obj.method(args): LOAD_METHOD pushes the callee and the receiver
+            # (or NO_RECEIVER), so no bound method object is created
+            self.compile_expression(expr.func.obj)
+            self.emit(LOAD_METHOD, self.site(expr))
+            for arg in expr.args:
+                self.compile_expression(arg)
+            self.emit(CALL_METHOD, len(expr.args))
+        elif expr_type == parser_module.FunctionCall:
+            self.compile_expression(expr.func)
+            for arg in expr.args:
+                self.compile_expression(arg)
+            self.emit(CALL, len(expr.args))
+        elif expr_type in (parser_module.ListLiteral, parser_module.DictLiteral) and expr.template is not None:
+            # Constant collection hoisted by the optimizer: copy the template
+            self.emit(COPY_CONST, self.template(expr.template))
+        elif expr_type == parser_module.ListLiteral:
+            for element in expr.elements:
+                self.compile_expression(element)
+            self.emit(BUILD_LIST, len(expr.elements))
+        elif expr_type == parser_module.DictLiteral:
+            for value in expr.items.values():
+                self.compile_expression(value)
+            self.emit(BUILD_DICT, self.constant(tuple(expr.items.keys())))
+        elif expr_type == parser_module.IndexAccess:
+            self.compile_expression(expr.obj)
+            self.compile_expression(expr.index)
+            self.emit(GET_INDEX)
+        elif expr_type == parser_module.PropertyAccess:
+            self.compile_expression(expr.obj)
+            self.emit(GET_ATTR, self.site(expr))
+        elif expr_type == parser_module.LambdaExpression:
+            self.compile_function("<lambda>", expr.params, expr.body, expr.is_generator)
+        elif expr_type == parser_module.InterpolatedString:
+            for part in expr.parts:
+                if type(part) is str:
+                    self.emit(LOAD_CONST, self.constant(part))
+                else:
+                    self.emit(INTERPOLATE, self.name(part.name))
+            self.emit(BUILD_STRING, len(expr.parts))
+        else:
+            raise SyntaxError(f"Cannot compile {expr_type.__name__}")
+
+    def compile_assignment(self, expr):
+        self.compile_expression(expr.value)
+        target = expr.target
+
+        if isinstance(target, parser_module.Identifier):
+            self.emit(STORE_NAME, self.name(target.name))
+        elif isinstance(target, parser_module.PropertyAccess):
+            self.compile_expression(target.obj)
+            self.emit(SET_ATTR, self.name(target.prop))
+        elif isinstance(target, parser_module.IndexAccess):
+            self.compile_expression(target.obj)
+            self.compile_expression(target.index)
+            self.emit(SET_INDEX)
+
+
+def disassemble(code_object):
+    lines = [f"Disassembly of {code_object.name}:"]
+    code = code_object.code
+    nested = []
+
+    for pc in range(0, len(code), 2):
+        op, arg = code[pc], code[pc + 1]
+        opname = OPNAMES[op]
+        detail = ""
+        if op in (LOAD_CONST, MAKE_FUNCTION, MAKE_CLASS, BUILD_DICT):
+            value = code_object.constants[arg]
+            detail = f"({value!r})"
+            if isinstance(value, CodeObject):
+                nested.append(value)
+        elif op in (LOAD_NAME, STORE_NAME, DEFINE_NAME, SET_ATTR, IMPORT, INTERPOLATE):
+            detail = f"({code_object.names[arg]})"
+        elif op == LOAD_METHOD:
+            detail = f"({code_object.constants[arg].func.prop})"
+        elif op == GET_ATTR:
+            detail = f"({code_object.constants[arg].prop})"
+        elif op == BINARY_OP:
+            detail = f"({BINARY_OPERATORS[arg]})"
+        lines.append(f"{pc:6d} {opname:<18} {arg:<4} {detail}")
+
+    for child in nested:
+        lines.append("")
+        lines.append(disassemble(child))
+
+    return "\n".join(lines)
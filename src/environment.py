@@ -1,7 +1,11 @@
+from collections import OrderedDict
+
+
 class Environment:
     def __init__(self, enclosing=None):
         self.values = {}
         self.enclosing = enclosing
+        self.globals = enclosing.globals if enclosing is not None else self
     
     def define(self, name, value):
         self.values[name] = value
@@ -25,12 +29,6 @@ class Environment:
         
         raise NameError(f"Undefined variable '{name}'")
     
-    def get_at(self, distance, name):
-        return self.ancestor(distance).values.get(name)
-    
-    def assign_at(self, distance, name, value):
-        self.ancestor(distance).values[name] = value
-    
     def ancestor(self, distance):
         environment = self
         for _ in range(distance):
@@ -38,43 +36,434 @@ class Environment:
         return environment
 
 
+class Unset:
+    """
+    Marks a slot whose variable has not been declared yet in the current run.
+    
+    FrameLayout.blank holds it, so it ends up in cached (pickled) trees;
+    unpickling returns the module's single instance, keeping `is UNSET` valid.
+    """
+    
+    __slots__ = ()
+    
+    def __reduce__(self):
+        return "UNSET"
+    
+    def __repr__(self):
+        return "<unset>"
+
+
+UNSET = Unset()
+
+
+class Completion:
+    """Signal returned by Interpreter.execute when a statement interrupts normal flow."""
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __repr__(self):
+        return f"<completion {self.name}>"
+
+
+BREAK = Completion("break")
+CONTINUE = Completion("continue")
+# The returned value is left in Interpreter.return_value
+RETURN = Completion("return")
+
+
+class FrameLayout:
+    """Slot layout of a scope, computed once by the resolver."""
+    
+    def __init__(self, names, captured=False):
+        self.names = tuple(names)
+        self.index = {name: slot for slot, name in enumerate(self.names)}
+        self.blank = [UNSET] * len(self.names)
+        # True when closures created inside the scope can outlive one execution
+        self.captured = captured
+
+
+class Frame:
+    """Local scope holding variables in a fixed-size list indexed by resolved slot."""
+    
+    __slots__ = ('slots', 'layout', 'enclosing', 'globals')
+    
+    def __init__(self, layout, enclosing):
+        self.slots = layout.blank[:]
+        self.layout = layout
+        self.enclosing = enclosing
+        self.globals = enclosing.globals
+    
+    def reset(self):
+        self.slots[:] = self.layout.blank
+    
+    def define(self, name, value):
+        self.slots[self.layout.index[name]] = value
+    
+    def assign(self, name, value):
+        slot = self.layout.index.get(name)
+        if slot is not None and self.slots[slot] is not UNSET:
+            self.slots[slot] = value
+            return True
+        
+        return self.enclosing.assign(name, value)
+    
+    def get(self, name):
+        slot = self.layout.index.get(name)
+        if slot is not None:
+            value = self.slots[slot]
+            if value is not UNSET:
+                return value
+        
+        return self.enclosing.get(name)
+    
+    def get_at(self, distance, slot, name):
+        frame = self
+        while distance:
+            frame = frame.enclosing
+            distance -= 1
+        
+        value = frame.slots[slot]
+        if value is UNSET:
+            # Not declared yet in the resolved scope; fall back to the dynamic lookup
+            return self.get(name)
+        return value
+    
+    def assign_at(self, distance, slot, name, value):
+        frame = self
+        while distance:
+            frame = frame.enclosing
+            distance -= 1
+        
+        if frame.slots[slot] is UNSET:
+            self.assign(name, value)
+        else:
+            frame.slots[slot] = value
+
+
+def loop_frames(layout, enclosing, loop_variables=0):
+    """
+    Endless supply of the frames a loop body runs in, one per iteration.
+    
+    One frame serves every iteration unless closures created in the body may
+    capture it (layout.captured); those get a fresh frame each time. A shared
+    frame is reset between iterations so the body's declarations start out
+    undeclared again, unless its only slots are the `loop_variables` the loop
+    itself overwrites. A body declaring nothing runs in the enclosing frame.
+    """
+    if layout is None:
+        while True:
+            yield enclosing
+    if layout.captured:
+        while True:
+            yield Frame(layout, enclosing)
+    shared = Frame(layout, enclosing)
+    if len(layout.names) > loop_variables:
+        while True:
+            shared.reset()
+            yield shared
+    while True:
+        yield shared
+
+
+# Calls after which a function's body is transpiled to Python (see transpiler.py)
+TIER_UP_THRESHOLD = 100
+
+
+class TailCall:
+    """
+    Left in Interpreter.return_value by `return f(...)` in tail position:
+    the call for the returning function's caller to make in its place.
+    """
+    
+    __slots__ = ('function', 'arguments')
+    
+    def __init__(self, function, arguments):
+        self.function = function
+        self.arguments = arguments
+
+
 class ShravScriptFunction:
     def __init__(self, declaration, closure, is_initializer=False):
         self.declaration = declaration
         self.closure = closure
         self.is_initializer = is_initializer
+        # Transpiled Python function; None until tier-up is tried, False if unsupported
+        self.native = None
     
     def __call__(self, interpreter, arguments):
-        environment = Environment(self.closure)
-        
-        for i, param in enumerate(self.declaration.params):
-            if i < len(arguments):
-                environment.define(param, arguments[i])
+        function = self
+        # Frame of the previous function run by this trampoline, reused by a
+        # tail call to a function with the same layout
+        frame = None
+        while True:
+            native = function.native
+            if native is None:
+                declaration = function.declaration
+                if declaration.calls < TIER_UP_THRESHOLD:
+                    declaration.calls += 1
+                elif interpreter.tier_up:
+                    # Hot function: run it as Python code from now on if possible
+                    import transpiler
+                    native = function.native = transpiler.tier_up(function, interpreter) or False
+            
+            if native:
+                # Transpiled code hands back its tail calls like execute_return
+                value = native(*arguments)
+                if type(value) is not TailCall:
+                    return value
+                function = value.function
+                arguments = value.arguments
+                continue
+            
+            declaration = function.declaration
+            layout = declaration.layout
+            if layout is None:
+                # No parameters or locals: run directly in the closure scope
+                environment = function.closure
+            else:
+                if frame is not None and frame.layout is layout and frame.enclosing is function.closure:
+                    environment = frame
+                    environment.reset()
+                else:
+                    environment = Frame(layout, function.closure)
+                # Closures created in the body may keep the frame alive
+                frame = None if layout.captured else environment
+                slots = environment.slots
+                for i, slot in enumerate(declaration.param_slots):
+                    if i < len(arguments):
+                        slots[slot] = arguments[i]
+                    else:
+                        slots[slot] = None  # Default parameter value
+            
+            profiler = interpreter.profiler
+            if profiler is None:
+                completion = interpreter.execute_block(declaration.body, environment)
             else:
-                environment.define(param, None)  # Default parameter value
+                # Each function run by the trampoline is profiled as its own call
+                completion = profiler.run(declaration, interpreter.execute_block, declaration.body, environment)
+            
+            if completion is not RETURN:
+                return None
+            value = interpreter.return_value
+            interpreter.return_value = None
+            if type(value) is not TailCall:
+                return value
+            # `return f(...)`: run f in this loop instead of nesting a call
+            function = value.function
+            arguments = value.arguments
+    
+    def call_method(self, interpreter, receiver, arguments):
+        # Methods always have a frame: `this` lives in its own slot
+        declaration = self.declaration
+        environment = Frame(declaration.layout, self.closure)
+        slots = environment.slots
+        slots[declaration.this_slot] = receiver
+        count = len(arguments)
+        for i, slot in enumerate(declaration.param_slots):
+            slots[slot] = arguments[i] if i < count else None
         
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except ReturnValue as return_value:
-            if self.is_initializer:
-                return self.closure.get_at(0, "this")
-            return return_value.value
+        profiler = interpreter.profiler
+        if profiler is None:
+            completion = interpreter.execute_block(declaration.body, environment)
+        else:
+            completion = profiler.run(declaration, interpreter.execute_block, declaration.body, environment)
         
+        value = None
+        if completion is RETURN:
+            value = interpreter.return_value
+            interpreter.return_value = None
+            if type(value) is TailCall:
+                value = value.function(interpreter, value.arguments)
         if self.is_initializer:
-            return self.closure.get_at(0, "this")
-        return None
+            return receiver
+        return value
+    
+    def bind(self, instance):
+        return ShravScriptBoundMethod(self, instance)
+
+
+class ShravScriptGeneratorFunction(ShravScriptFunction):
+    """
+    A function whose body contains `yield`. Calling it binds the arguments
+    and returns a ShravScriptGenerator; the body only starts running when
+    the generator is iterated.
+    """
+    
+    def __call__(self, interpreter, arguments):
+        declaration = self.declaration
+        environment = self.closure
+        if declaration.layout is not None:
+            environment = Frame(declaration.layout, self.closure)
+            slots = environment.slots
+            count = len(arguments)
+            for i, slot in enumerate(declaration.param_slots):
+                slots[slot] = arguments[i] if i < count else None
+        return ShravScriptGenerator(interpreter, interpreter.generator_body(declaration.body, environment))
+    
+    def call_method(self, interpreter, receiver, arguments):
+        declaration = self.declaration
+        environment = Frame(declaration.layout, self.closure)
+        slots = environment.slots
+        slots[declaration.this_slot] = receiver
+        count = len(arguments)
+        for i, slot in enumerate(declaration.param_slots):
+            slots[slot] = arguments[i] if i < count else None
+        return ShravScriptGenerator(interpreter, interpreter.generator_body(declaration.body, environment))
+
+
+class ShravScriptGenerator:
+    """
+    A suspended call of a generator function, iterated with `for x in`.
+    
+    ``body`` is the Python generator returned by Interpreter.generator_body.
+    Every step resumes it until the next `yield`; the interpreter's current
+    environment is switched to the generator's own for the duration of the
+    step and back to the caller's afterwards.
+    """
+    
+    __slots__ = ('interpreter', 'body', 'environment')
+    
+    def __init__(self, interpreter, body):
+        self.interpreter = interpreter
+        self.body = body
+        # The generator's environment while it is suspended
+        self.environment = None
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        interpreter = self.interpreter
+        caller = interpreter.environment
+        interpreter.environment = self.environment
+        try:
+            return next(self.body)
+        finally:
+            self.environment = interpreter.environment
+            interpreter.environment = caller
+    
+    def __str__(self):
+        return "<generator>"
+
+
+class ShravScriptBoundMethod:
+    """A method read from an instance without being called, e.g. `let f = obj.method`."""
+    
+    def __init__(self, method, receiver):
+        self.method = method
+        self.receiver = receiver
+    
+    def __call__(self, interpreter, arguments):
+        return self.method.call_method(interpreter, self.receiver, arguments)
+    
+    def __str__(self):
+        return f"<bound method of {self.receiver}>"
+
+
+class ShravScriptMemoizedFunction:
+    """
+    A function wrapped by the memoize() builtin: results are cached on the
+    argument values and the least recently used entry is evicted once more
+    than ``maxsize`` are held (None means no limit).
+    
+    Arguments of different types never share an entry, so f(1), f(1.0) and
+    f(true) are cached separately. Calls with an unhashable argument, such
+    as a list, run the function without touching the cache.
+    """
+    
+    def __init__(self, function, maxsize):
+        self.function = function
+        self.maxsize = maxsize
+        # Argument key -> result, least recently used first
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __call__(self, interpreter, arguments):
+        key = tuple(arguments) + tuple(type(argument) for argument in arguments)
+        cache = self.cache
+        try:
+            value = cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable argument
+            return self.function(interpreter, arguments)
+        else:
+            self.hits += 1
+            cache.move_to_end(key)
+            return value
+        
+        self.misses += 1
+        value = self.function(interpreter, arguments)
+        if self.maxsize != 0:
+            cache[key] = value
+            if self.maxsize is not None and len(cache) > self.maxsize:
+                cache.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def clear(self):
+        self.cache.clear()
+        self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.cache),
+            "maxsize": self.maxsize,
+        }
+    
+    def get(self, name):
+        # f.hits, f.misses, f.evictions, f.size, f.maxsize, f.stats(), f.clear()
+        if name == "clear":
+            return ShravScriptNativeFunction(0, self.clear)
+        if name == "stats":
+            return ShravScriptNativeFunction(0, self.stats)
+        stats = self.stats()
+        if name in stats:
+            return stats[name]
+        raise AttributeError(f"Memoized function has no property '{name}'")
+    
+    def __str__(self):
+        return "<memoized fn>"
 
 
-class ReturnValue(Exception):
-    def __init__(self, value):
-        self.value = value
-        super().__init__(self)
+class Shape:
+    """
+    Field layout shared by instances that had the same fields added in the
+    same order: field name -> index into ShravScriptInstance.values.
+    
+    Adding a field moves an instance to the next shape along a transition,
+    which is created once and then reused by every later instance.
+    """
+    
+    __slots__ = ('index', 'transitions')
+    
+    def __init__(self, index=None):
+        self.index = index or {}
+        # Field name -> Shape with that field appended
+        self.transitions = {}
+    
+    def with_field(self, name):
+        shape = self.transitions.get(name)
+        if shape is None:
+            index = dict(self.index)
+            index[name] = len(index)
+            shape = self.transitions[name] = Shape(index)
+        return shape
 
 
 class ShravScriptClass:
     def __init__(self, name, methods):
         self.name = name
         self.methods = methods
+        # Shape of a new instance, before init has set any field
+        self.shape = Shape()
     
     def __str__(self):
         return self.name
@@ -89,22 +478,27 @@ class ShravScriptClass:
         
         initializer = self.find_method("init")
         if initializer is not None:
-            initializer.bind(instance)(interpreter, arguments)
+            initializer.call_method(interpreter, instance, arguments)
         
         return instance
 
 
 class ShravScriptInstance:
+    # Field values live in a list laid out by the instance's shape
+    __slots__ = ('klass', 'shape', 'values')
+    
     def __init__(self, klass):
         self.klass = klass
-        self.fields = {}
+        self.shape = klass.shape
+        self.values = []
     
     def __str__(self):
         return f"{self.klass.name} instance"
     
     def get(self, name):
-        if name in self.fields:
-            return self.fields[name]
+        slot = self.shape.index.get(name)
+        if slot is not None:
+            return self.values[slot]
         
         method = self.klass.find_method(name)
         if method is not None:
@@ -113,7 +507,12 @@ class ShravScriptInstance:
         raise AttributeError(f"Undefined property '{name}'")
     
     def set(self, name, value):
-        self.fields[name] = value
+        slot = self.shape.index.get(name)
+        if slot is not None:
+            self.values[slot] = value
+        else:
+            self.shape = self.shape.with_field(name)
+            self.values.append(value)
 
 
 class ShravScriptCallable:
@@ -1,21 +1,30 @@
 import parser as parser_module
 from tokenizer import Tokenizer, TokenType
-from environment import Environment, ReturnValue, ShravScriptFunction, ShravScriptNativeFunction, ShravScriptModule
-import re
-import os
-import importlib
-
-# Import necessary modules for builtins
-import sys
-import os
-import math
-import random
+from resolver import Resolver
+from optimizer import Optimizer
+import cache
+from modules import registry
+import library
+import shrav_modules
+from environment import (
+    Environment, Frame, loop_frames, ShravScriptFunction, ShravScriptGeneratorFunction, ShravScriptNativeFunction,
+    ShravScriptModule, ShravScriptMemoizedFunction, ShravScriptClass, ShravScriptInstance, TailCall, BREAK, CONTINUE, RETURN,
+)
 
 class Interpreter:
     def __init__(self):
         self.globals = Environment()
         self.environment = self.globals
         self.modules = {}
+        # Run the AST optimizer (-O), optionally reporting what it changed
+        self.optimize = False
+        self.dump_optimizations = False
+        # Transpile hot functions to Python (--no-tier-up disables it)
+        self.tier_up = True
+        # Value of the most recent return statement, read by the caller on RETURN
+        self.return_value = None
+        # profiler.Profiler collecting statistics (--profile), or None
+        self.profiler = None
         
         # Initialize with native functions
         self.define_native_functions()
@@ -26,27 +35,89 @@ class Interpreter:
         self.globals.define("str", ShravScriptNativeFunction(1, str))
         self.globals.define("int", ShravScriptNativeFunction(1, lambda x: int(float(x)) if x is not None else 0))
         self.globals.define("float", ShravScriptNativeFunction(1, lambda x: float(x) if x is not None else 0.0))
+        self.globals.define("memoize", ShravScriptNativeFunction(2, memoize))
+        # filter, reduce, sort, sum, min, max, reverse, slice, join, keys, ...
+        for name, function in library.BUILTINS.items():
+            self.globals.define(name, function)
     
-    def interpret(self, source):
+    def interpret(self, source, path=None):
         try:
-            tokenizer = Tokenizer(source)
-            tokens = tokenizer.tokenize()
-            
-            parser_instance = parser_module.Parser(tokens)
-            program = parser_instance.parse()
+            if path is None:
+                program = self.parse(source)
+            else:
+                # Scripts loaded from disk reuse their cached parse tree
+                program = cache.load_program(path, source, self.parse, self.optimize)
             
-            return self.evaluate(program)
+            return self.run_program(program)
         except SyntaxError as e:
             print(f"Syntax Error: {e}")
             return None
+        except RecursionError:
+            self.runtime_error(RuntimeError(self.recursion_limit_message()))
+            return None
         except Exception as e:
             self.runtime_error(e)
             return None
     
+    def recursion_limit_message(self):
+        # Every ShravScript call nests several Python calls here, so deep
+        # recursion runs out of Python stack long before the VM's limit
+        return "Maximum call depth exceeded (run deeply recursive scripts with --vm)"
+    
+    def nested_too_deeply(self):
+        # The parser, optimizer, resolver and compilers recurse once per level
+        # of nesting, so a RecursionError there is a property of the source
+        return SyntaxError("Program is nested too deeply")
+    
+    def parse(self, source):
+        # Tokens are streamed into the parser instead of being materialized
+        tokenizer = Tokenizer(source)
+        parser_instance = parser_module.Parser(tokenizer.iter_tokens())
+        try:
+            program = parser_instance.parse()
+            if self.optimize:
+                optimizer = Optimizer()
+                optimizer.optimize(program)
+                if self.dump_optimizations:
+                    optimizer.dump()
+            Resolver().resolve(program)
+        except RecursionError:
+            raise self.nested_too_deeply() from None
+        return program
+    
+    def run_program(self, program):
+        if self.profiler is not None:
+            return self.profiler.run(None, self.evaluate, program)
+        return self.evaluate(program)
+    
+    def module_interpreter(self):
+        # A new interpreter of the same kind and engine options, for a module
+        interpreter = self.__class__()
+        interpreter.optimize = self.optimize
+        interpreter.dump_optimizations = self.dump_optimizations
+        interpreter.tier_up = self.tier_up
+        return interpreter
+    
+    def enable_profiling(self, profiler):
+        self.profiler = profiler
+        # Transpiled functions would bypass the statement and call hooks
+        self.tier_up = False
+        # Shadow execute() on this instance only, so unprofiled runs pay nothing
+        self.execute = self.execute_profiled
+    
+    def execute_profiled(self, stmt):
+        # Lines of imported modules share numbers with the script's; only
+        # count statements running in this interpreter's own globals
+        if self.environment.globals is self.globals:
+            self.profiler.hit(stmt.line)
+        return type(self).execute(self, stmt)
+    
     def runtime_error(self, error):
         print(f"Runtime Error: {error}")
     
     def execute(self, stmt):
+        # Returns None when the statement completes normally, or one of the
+        # BREAK, CONTINUE and RETURN completion signals
         stmt_type = type(stmt)
         
         if stmt_type == parser_module.Print:
@@ -56,21 +127,23 @@ class Interpreter:
         elif stmt_type == parser_module.FunctionDeclaration:
             self.execute_function_declaration(stmt)
         elif stmt_type == parser_module.Return:
-            self.execute_return(stmt)
+            return self.execute_return(stmt)
         elif stmt_type == parser_module.IfStatement:
-            self.execute_if(stmt)
+            return self.execute_if(stmt)
         elif stmt_type == parser_module.WhileLoop:
-            self.execute_while(stmt)
+            return self.execute_while(stmt)
         elif stmt_type == parser_module.ForLoop:
-            self.execute_for(stmt)
+            return self.execute_for(stmt)
+        elif stmt_type == parser_module.ForInLoop:
+            return self.execute_for_in(stmt)
         elif stmt_type == parser_module.WithStatement:
-            self.execute_with(stmt)
+            return self.execute_with(stmt)
         elif stmt_type == parser_module.BreakStatement:
-            raise BreakException()
+            return BREAK
         elif stmt_type == parser_module.ContinueStatement:
-            raise ContinueException()
+            return CONTINUE
         elif stmt_type == parser_module.TryCatch:
-            self.execute_try_catch(stmt)
+            return self.execute_try_catch(stmt)
         elif stmt_type == parser_module.ImportStatement:
             self.execute_import(stmt)
         elif stmt_type == parser_module.ClassDeclaration:
@@ -82,96 +155,150 @@ class Interpreter:
     
     def execute_program(self, program):
         for stmt in program.statements:
-            self.execute(stmt)
+            if self.execute(stmt) is not None:
+                # A top-level return ends the program
+                break
     
     def execute_block(self, statements, environment):
         previous = self.environment
         try:
             self.environment = environment
             for stmt in statements:
-                self.execute(stmt)
+                completion = self.execute(stmt)
+                if completion is not None:
+                    return completion
+            return None
         finally:
             self.environment = previous
     
+    def new_scope(self, layout):
+        # Blocks that declare nothing run in the enclosing frame
+        if layout is None:
+            return self.environment
+        return Frame(layout, self.environment)
+    
+    def declare(self, slot, name, value):
+        if slot is None:
+            self.environment.define(name, value)
+        else:
+            self.environment.slots[slot] = value
+    
     def execute_var_declaration(self, stmt):
         value = None
         if stmt.value is not None:
             value = self.evaluate(stmt.value)
         
-        self.environment.define(stmt.name, value)
+        self.declare(stmt.slot, stmt.name, value)
     
     def execute_function_declaration(self, stmt):
-        function = ShravScriptFunction(stmt, self.environment)
-        self.environment.define(stmt.name, function)
+        function_class = ShravScriptGeneratorFunction if stmt.is_generator else ShravScriptFunction
+        function = function_class(stmt, self.environment)
+        self.declare(stmt.slot, stmt.name, function)
     
     def execute_return(self, stmt):
+        if stmt.tail_call:
+            return self.execute_tail_call(stmt.value)
+        
         value = None
         if stmt.value is not None:
             value = self.evaluate(stmt.value)
         
-        raise ReturnValue(value)
+        self.return_value = value
+        return RETURN
+    
+    def execute_tail_call(self, expr):
+        # `return f(...)`: script functions are left for the calling
+        # ShravScriptFunction to run, so the stack does not grow
+        callee = self.evaluate(expr.func)
+        arguments = []
+        for arg in expr.args:
+            arguments.append(self.evaluate(arg))
+        
+        if type(callee) is ShravScriptFunction:
+            self.return_value = TailCall(callee, arguments)
+        else:
+            self.return_value = self.call_value(callee, arguments)
+        return RETURN
     
     def execute_if(self, stmt):
         if self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute_block(stmt.if_body, Environment(self.environment))
+            return self.execute_block(stmt.if_body, self.new_scope(stmt.if_layout))
         else:
-            # Check elif conditions in order
+            # Check elif conditions in order; only the first successful elif block runs
             for i in range(len(stmt.elif_conditions)):
                 if self.is_truthy(self.evaluate(stmt.elif_conditions[i])):
-                    self.execute_block(stmt.elif_bodies[i], Environment(self.environment))
-                    return  # Exit after executing the first successful elif block
+                    return self.execute_block(stmt.elif_bodies[i], self.new_scope(stmt.elif_layouts[i]))
                 
             # If no elif conditions matched, try the else block
             if stmt.else_body is not None:
-                self.execute_block(stmt.else_body, Environment(self.environment))
+                return self.execute_block(stmt.else_body, self.new_scope(stmt.else_layout))
+        return None
     
     def execute_while(self, stmt):
-        try:
-            while self.is_truthy(self.evaluate(stmt.condition)):
-                try:
-                    self.execute_block(stmt.body, Environment(self.environment))
-                except ContinueException:
-                    # Just continue with the next iteration
-                    continue
-                except BreakException:
-                    # Break out of the loop
-                    break
-        except Exception as e:
-            if not isinstance(e, (BreakException, ContinueException)):
-                raise e
+        frames = loop_frames(stmt.body_layout, self.environment)
+        while self.is_truthy(self.evaluate(stmt.condition)):
+            completion = self.execute_block(stmt.body, next(frames))
+            if completion is BREAK:
+                break
+            elif completion is RETURN:
+                return RETURN
+            # CONTINUE and normal completion both move on to the next iteration
+        return None
     
     def execute_for(self, stmt):
         range_start = int(self.evaluate(stmt.range_start))
         range_end = int(self.evaluate(stmt.range_end))
         
+        frames = loop_frames(stmt.body_layout, self.environment, 1)
+        for i, env in zip(range(range_start, range_end), frames):
+            env.slots[0] = i  # The loop variable
+            
+            completion = self.execute_block(stmt.body, env)
+            if completion is BREAK:
+                break
+            elif completion is RETURN:
+                return RETURN
+            # CONTINUE and normal completion both move on to the next iteration
+        return None
+    
+    def execute_for_in(self, stmt):
+        iterator = self.iterate(self.evaluate(stmt.iterable))
+        
+        frames = loop_frames(stmt.body_layout, self.environment, 1)
+        # Elements are pulled one at a time, so files and generators are
+        # never loaded into memory as a whole
+        for item, env in zip(iterator, frames):
+            env.slots[0] = item  # The loop variable
+            
+            completion = self.execute_block(stmt.body, env)
+            if completion is BREAK:
+                break
+            elif completion is RETURN:
+                return RETURN
+        return None
+    
+    def iterate(self, value):
+        # Iterator behind `for x in value`: list elements, dictionary keys,
+        # string characters, file lines, generator values, ...
+        if type(value) is dict:
+            # The keys are copied first, so the loop body may add or remove entries
+            return iter(list(value))
         try:
-            for i in range(range_start, range_end):
-                env = Environment(self.environment)
-                env.define(stmt.var_name, i)
-                
-                try:
-                    self.execute_block(stmt.body, env)
-                except ContinueException:
-                    # Just continue with the next iteration
-                    continue
-                except BreakException:
-                    # Break out of the loop
-                    break
-        except Exception as e:
-            if not isinstance(e, (BreakException, ContinueException)):
-                raise e
+            return iter(value)
+        except TypeError:
+            raise RuntimeError(f"Cannot iterate over a {type(value).__name__}")
     
     def execute_with(self, stmt):
         # Evaluate the resource expression
         resource = self.evaluate(stmt.expression)
         
-        # Set up the environment with the 'as' variable
-        env = Environment(self.environment)
-        env.define(stmt.var_name, resource)
+        # Set up the frame with the 'as' variable in slot 0
+        env = Frame(stmt.body_layout, self.environment)
+        env.slots[0] = resource
         
         try:
             # Execute the with block
-            self.execute_block(stmt.body, env)
+            return self.execute_block(stmt.body, env)
         finally:
             # Close the resource if it has a close method
             if hasattr(resource, 'close') and callable(resource.close):
@@ -179,58 +306,49 @@ class Interpreter:
     
     def execute_try_catch(self, stmt):
         try:
-            self.execute_block(stmt.try_body, Environment(self.environment))
+            return self.execute_block(stmt.try_body, self.new_scope(stmt.try_layout))
         except Exception as e:
-            catch_env = Environment(self.environment)
-            catch_env.define(stmt.catch_var, str(e))
-            self.execute_block(stmt.catch_body, catch_env)
+            catch_env = Frame(stmt.catch_layout, self.environment)
+            catch_env.slots[0] = str(e)  # The catch variable
+            return self.execute_block(stmt.catch_body, catch_env)
     
     def execute_import(self, stmt):
         module_name = stmt.module_name
+        self.declare(stmt.slot, module_name, self.import_module(module_name))
+    
+    def import_module(self, module_name):
         if module_name in self.modules:
-            module = self.modules[module_name]
-        else:
+            return self.modules[module_name]
+        
+        # Builtin modules are bound to this interpreter
+        if module_name in shrav_modules.__all__:
             module = self.load_module(module_name)
             self.modules[module_name] = module
+            return module
         
-        self.environment.define(module_name, module)
+        # User-defined modules are loaded once per process and shared
+        return registry.import_module(self, module_name)
     
     def load_module(self, module_name):
-        # Check for builtin modules first
-        if module_name in ["netgear", "sysops", "mathex", "fileio"]:
-            module_path = f"shrav_modules.{module_name}"
-            try:
-                module = importlib.import_module(module_path)
-                return module.create_module(self)
-            except ImportError as e:
-                raise RuntimeError(f"Failed to load builtin module: {module_name} - {e}")
-        
-        # Try to load as a user-defined module
+        # Builtin modules (and their dependencies) are only imported on first use
+        import importlib
+        module_path = f"shrav_modules.{module_name}"
         try:
-            with open(f"{module_name}.shs", "r") as f:
-                source = f.read()
-            
-            # Create a new interpreter to evaluate the module
-            mod_interpreter = Interpreter()
-            mod_interpreter.interpret(source)
-            
-            # Create and return a module with the module's environment
-            module = ShravScriptModule(module_name)
-            for name, value in mod_interpreter.environment.values.items():
-                if callable(value):
-                    module.add_function(name, value)
-            
-            return module
-        except FileNotFoundError:
-            raise RuntimeError(f"Module not found: {module_name}")
+            module = importlib.import_module(module_path)
+            return module.create_module(self)
+        except ImportError as e:
+            raise RuntimeError(f"Failed to load builtin module: {module_name} - {e}")
     
     def execute_class_declaration(self, stmt):
         methods = {}
         for method in stmt.methods:
-            function = ShravScriptFunction(method, self.environment)
+            if method.is_generator:
+                function = ShravScriptGeneratorFunction(method, self.environment)
+            else:
+                function = ShravScriptFunction(method, self.environment, is_initializer=(method.name == "init"))
             methods[method.name] = function
         
-        self.environment.define(stmt.name, ShravScriptClass(stmt.name, methods))
+        self.declare(stmt.slot, stmt.name, ShravScriptClass(stmt.name, methods))
     
     def execute_print(self, stmt):
         value = self.evaluate(stmt.value)
@@ -261,25 +379,28 @@ class Interpreter:
             return self.evaluate_property_access(expr)
         elif expr_type == parser_module.LambdaExpression:
             return self.evaluate_lambda(expr)
+        elif expr_type == parser_module.InterpolatedString:
+            return self.evaluate_interpolated_string(expr)
         elif expr_type == parser_module.Program:
             return self.execute_program(expr)
     
     def lookup_variable(self, expr):
-        name = expr.name
-        return self.environment.get(name)
+        if expr.slot is None:
+            return self.environment.globals.get(expr.name)
+        return self.environment.get_at(expr.depth, expr.slot, expr.name)
     
     def evaluate_assignment(self, expr):
         value = self.evaluate(expr.value)
         
         if isinstance(expr.target, parser_module.Identifier):
             name = expr.target.name
-            self.environment.assign(name, value)
+            if expr.slot is None:
+                self.environment.globals.assign(name, value)
+            else:
+                self.environment.assign_at(expr.depth, expr.slot, name, value)
         elif isinstance(expr.target, parser_module.PropertyAccess):
             obj = self.evaluate(expr.target.obj)
-            if hasattr(obj, 'set'):
-                obj.set(expr.target.prop, value)
-            else:
-                setattr(obj, expr.target.prop, value)
+            self.set_property(obj, expr.target.prop, value)
         elif isinstance(expr.target, parser_module.IndexAccess):
             obj = self.evaluate(expr.target.obj)
             index = self.evaluate(expr.target.index)
@@ -292,10 +413,7 @@ class Interpreter:
         right = self.evaluate(expr.right)
         
         if expr.operator == '+':
-            # Handle string concatenation
-            if isinstance(left, str) or isinstance(right, str):
-                return str(left) + str(right)
-            return left + right
+            return library.add(left, right)
         elif expr.operator == '-':
             return left - right
         elif expr.operator == '*':
@@ -332,48 +450,80 @@ class Interpreter:
             return not self.is_truthy(right)
     
     def evaluate_call(self, expr):
+        if type(expr.func) == parser_module.PropertyAccess:
+            return self.evaluate_method_call(expr)
+        
         callee = self.evaluate(expr.func)
         
         arguments = []
         for arg in expr.args:
             arguments.append(self.evaluate(arg))
         
-        # Handle module functions and methods
+        return self.call_value(callee, arguments)
+    
+    def evaluate_method_call(self, expr):
+        # obj.method(): the object is evaluated once, and methods of script
+        # classes are called with their receiver instead of a bound method
+        obj = self.evaluate(expr.func.obj)
+        name = expr.func.prop
+        
+        if type(obj) is ShravScriptInstance and name not in obj.shape.index:
+            klass = obj.klass
+            if expr.cached_class is klass:
+                method = expr.cached_method
+            else:
+                method = self.cache_method(expr, klass, name)
+            
+            arguments = []
+            for arg in expr.args:
+                arguments.append(self.evaluate(arg))
+            return method.call_method(self, obj, arguments)
+        
+        method = library.find_method(obj, name)
+        if method is not None:
+            # Native list, dictionary and string methods: xs.filter(f), ...
+            return method.call_method(self, obj, [self.evaluate(arg) for arg in expr.args])
+        
+        callee = self.get_property(obj, name)
+        arguments = []
+        for arg in expr.args:
+            arguments.append(self.evaluate(arg))
+        
+        if isinstance(obj, ShravScriptModule):
+            # This is a module method call: module.function()
+            return callee(self, arguments)
+        return self.call_value(callee, arguments)
+    
+    def cache_method(self, site, klass, name):
+        # Inline cache miss: look the method up on the class and remember it
+        # on the call site (a FunctionCall or PropertyAccess node)
+        method = klass.find_method(name)
+        if method is None:
+            raise AttributeError(f"Undefined property '{name}'")
+        site.cached_class = klass
+        site.cached_method = method
+        return method
+    
+    def call_value(self, callee, arguments):
         if isinstance(callee, ShravScriptModule):
             # This is just a module reference, not a call
             raise RuntimeError("Cannot call a module directly. Use module.function() instead.")
-        elif isinstance(expr.func, parser_module.PropertyAccess):
-            # This is a method call: obj.method()
-            obj = self.evaluate(expr.func.obj)
-            
-            if isinstance(obj, ShravScriptModule):
-                # This is a module method call: module.function()
-                method_name = expr.func.prop
-                method = obj.get_function(method_name)
-                return method(self, arguments)
-            elif isinstance(obj, list):
-                method_name = expr.func.prop
-                if method_name == "map":
-                    # Handle built-in list.map() method
-                    if not arguments or not callable(arguments[0]):
-                        raise RuntimeError("map() requires a function argument")
-                    lambda_func = arguments[0]
-                    return [lambda_func(self, [item]) for item in obj]
-            
-            # For other method calls, proceed normally
-        
         if not callable(callee):
             raise RuntimeError(f"Can only call functions and classes, got {type(callee).__name__}")
         
         return callee(self, arguments)
     
     def evaluate_list(self, expr):
+        if expr.template is not None:
+            return expr.template.copy()
         elements = []
         for element in expr.elements:
             elements.append(self.evaluate(element))
         return elements
     
     def evaluate_dict(self, expr):
+        if expr.template is not None:
+            return expr.template.copy()
         result = {}
         for key, value in expr.items.items():
             result[key] = self.evaluate(value)
@@ -382,63 +532,202 @@ class Interpreter:
     def evaluate_index_access(self, expr):
         obj = self.evaluate(expr.obj)
         index = self.evaluate(expr.index)
-        
+        return self.get_index(obj, index)
+    
+    def get_index(self, obj, index):
         if isinstance(obj, (list, dict, str)):
             return obj[index]
+        elif hasattr(type(obj), '__getitem__'):
+            # Sequences provided by builtin modules, such as ndarr arrays
+            return obj[index]
         else:
             raise RuntimeError(f"Cannot index into a {type(obj).__name__}")
     
     def evaluate_property_access(self, expr):
         obj = self.evaluate(expr.obj)
         
-        if isinstance(obj, ShravScriptModule):
+        if type(obj) is ShravScriptInstance:
+            if expr.cached_shape is obj.shape:
+                return obj.values[expr.cached_slot]
+            return self.get_instance_property(expr, obj)
+        return self.get_property(obj, expr.prop)
+    
+    def get_instance_property(self, site, obj):
+        # Field inline cache miss, or a method read without calling it
+        name = site.prop
+        shape = obj.shape
+        slot = shape.index.get(name)
+        if slot is not None:
+            # Instances with the same shape keep the field in the same slot
+            site.cached_shape = shape
+            site.cached_slot = slot
+            return obj.values[slot]
+        
+        klass = obj.klass
+        if site.cached_class is klass:
+            method = site.cached_method
+        else:
+            method = self.cache_method(site, klass, name)
+        return method.bind(obj)
+    
+    def get_property(self, obj, name):
+        if type(obj) is ShravScriptInstance:
+            return obj.get(name)
+        elif isinstance(obj, ShravScriptModule):
             try:
-                return obj.get_function(expr.prop)
+                return obj.get_function(name)
             except AttributeError:
                 # Better error handling for module functions
                 functions_list = ", ".join(obj.functions.keys())
-                raise AttributeError(f"Module '{obj.name}' has no function '{expr.prop}'. Available functions: {functions_list}")
+                raise AttributeError(f"Module '{obj.name}' has no function '{name}'. Available functions: {functions_list}")
         elif hasattr(obj, 'get'):
-            return obj.get(expr.prop)
-        elif hasattr(obj, expr.prop):
-            return getattr(obj, expr.prop)
+            return obj.get(name)
+        elif hasattr(obj, name):
+            return getattr(obj, name)
         else:
-            raise AttributeError(f"'{type(obj).__name__}' has no attribute '{expr.prop}'")
+            raise AttributeError(f"'{type(obj).__name__}' has no attribute '{name}'")
     
-    def evaluate_lambda(self, expr):
-        # Create a function from the lambda
-        return lambda interpreter, args: self.execute_lambda(expr, args)
+    def set_property(self, obj, name, value):
+        if type(obj) is ShravScriptInstance or hasattr(obj, 'set'):
+            obj.set(name, value)
+        else:
+            setattr(obj, name, value)
     
-    def execute_lambda(self, expr, args):
-        # Set up the environment
-        env = Environment(self.environment)
-        
-        # Bind parameters
-        for i, param in enumerate(expr.params):
-            if i < len(args):
-                env.define(param, args[i])
+    def evaluate_interpolated_string(self, expr):
+        pieces = []
+        for part in expr.parts:
+            if type(part) is str:
+                pieces.append(part)
             else:
-                env.define(param, None)
+                try:
+                    pieces.append(str(self.lookup_variable(part)))
+                except NameError:
+                    # Unknown names are left in the text as written
+                    pieces.append("${" + part.name + "}")
+        return "".join(pieces)
+    
+    def evaluate_lambda(self, expr):
+        # A lambda carries the same params/body/layout as a declaration
+        if expr.is_generator:
+            return ShravScriptGeneratorFunction(expr, self.environment)
+        return ShravScriptFunction(expr, self.environment)
+    
+    # Generators
+    #
+    # The body of a generator function runs as a Python generator, so that a
+    # `yield` can suspend it in the middle of nested loops and blocks. Plain
+    # statements still go through execute(); only the statements that may
+    # contain a `yield` have generator versions below.
+    
+    def generator_body(self, body, environment):
+        completion = yield from self.generator_block(body, environment)
+        if completion is RETURN:
+            # `return` only ends the generator; its value is discarded
+            self.return_value = None
+    
+    def generator_block(self, statements, environment):
+        # Like execute_block, but without try/finally: a suspended generator
+        # that is garbage collected must not reset the current environment.
+        # ShravScriptGenerator restores the caller's environment after each step.
+        previous = self.environment
+        self.environment = environment
+        for stmt in statements:
+            if type(stmt) in GENERATOR_STATEMENTS:
+                completion = yield from self.generator_statement(stmt)
+            else:
+                completion = self.execute(stmt)
+            if completion is not None:
+                self.environment = previous
+                return completion
+        self.environment = previous
+        return None
+    
+    def generator_statement(self, stmt):
+        stmt_type = type(stmt)
         
-        # Execute body
-        try:
-            self.execute_block(expr.body, env)
+        if stmt_type == parser_module.Yield:
+            yield None if stmt.value is None else self.evaluate(stmt.value)
             return None
-        except ReturnValue as return_value:
-            return return_value.value
+        elif stmt_type == parser_module.IfStatement:
+            return (yield from self.generator_if(stmt))
+        elif stmt_type == parser_module.WhileLoop:
+            return (yield from self.generator_while(stmt))
+        elif stmt_type == parser_module.ForLoop:
+            return (yield from self.generator_for(stmt))
+        elif stmt_type == parser_module.ForInLoop:
+            return (yield from self.generator_for_in(stmt))
+        elif stmt_type == parser_module.WithStatement:
+            return (yield from self.generator_with(stmt))
+        elif stmt_type == parser_module.TryCatch:
+            return (yield from self.generator_try_catch(stmt))
     
-    def is_truthy(self, value):
-        if value is None:
-            return False
-        if isinstance(value, bool):
-            return value
-        if isinstance(value, (int, float)):
-            return value != 0
-        if isinstance(value, str):
-            return len(value) > 0
-        if isinstance(value, (list, dict)):
-            return len(value) > 0
-        return True
+    def generator_if(self, stmt):
+        if self.is_truthy(self.evaluate(stmt.condition)):
+            return (yield from self.generator_block(stmt.if_body, self.new_scope(stmt.if_layout)))
+        for i in range(len(stmt.elif_conditions)):
+            if self.is_truthy(self.evaluate(stmt.elif_conditions[i])):
+                return (yield from self.generator_block(stmt.elif_bodies[i], self.new_scope(stmt.elif_layouts[i])))
+        if stmt.else_body is not None:
+            return (yield from self.generator_block(stmt.else_body, self.new_scope(stmt.else_layout)))
+        return None
+    
+    def generator_while(self, stmt):
+        frames = loop_frames(stmt.body_layout, self.environment)
+        while self.is_truthy(self.evaluate(stmt.condition)):
+            completion = yield from self.generator_block(stmt.body, next(frames))
+            if completion is BREAK:
+                break
+            elif completion is RETURN:
+                return RETURN
+        return None
+    
+    def generator_for(self, stmt):
+        range_start = int(self.evaluate(stmt.range_start))
+        range_end = int(self.evaluate(stmt.range_end))
+        frames = loop_frames(stmt.body_layout, self.environment, 1)
+        for i, env in zip(range(range_start, range_end), frames):
+            env.slots[0] = i
+            completion = yield from self.generator_block(stmt.body, env)
+            if completion is BREAK:
+                break
+            elif completion is RETURN:
+                return RETURN
+        return None
+    
+    def generator_for_in(self, stmt):
+        frames = loop_frames(stmt.body_layout, self.environment, 1)
+        for item, env in zip(self.iterate(self.evaluate(stmt.iterable)), frames):
+            env.slots[0] = item
+            completion = yield from self.generator_block(stmt.body, env)
+            if completion is BREAK:
+                break
+            elif completion is RETURN:
+                return RETURN
+        return None
+    
+    def generator_with(self, stmt):
+        resource = self.evaluate(stmt.expression)
+        env = Frame(stmt.body_layout, self.environment)
+        env.slots[0] = resource
+        try:
+            return (yield from self.generator_block(stmt.body, env))
+        finally:
+            # Also runs when a generator suspended inside the block is discarded
+            if hasattr(resource, 'close') and callable(resource.close):
+                resource.close()
+    
+    def generator_try_catch(self, stmt):
+        environment = self.environment
+        try:
+            return (yield from self.generator_block(stmt.try_body, self.new_scope(stmt.try_layout)))
+        except Exception as e:
+            # The failing statement may have left a nested block's frame current
+            self.environment = environment
+            catch_env = Frame(stmt.catch_layout, environment)
+            catch_env.slots[0] = str(e)
+            return (yield from self.generator_block(stmt.catch_body, catch_env))
+    
+    is_truthy = staticmethod(library.is_truthy)
     
     def stringify(self, value):
         if value is None:
@@ -455,17 +744,7 @@ class Interpreter:
             return text
         
         if isinstance(value, str):
-            # Handle string interpolation
-            if "${" in value:
-                def replace_var(match):
-                    var_name = match.group(1)
-                    try:
-                        var_value = self.environment.get(var_name)
-                        return str(var_value)
-                    except:
-                        return match.group(0)
-                
-                value = re.sub(r'\${([a-zA-Z_][a-zA-Z0-9_]*)}', replace_var, value)
+            # "${name}" references were already filled in by InterpolatedString
             return value
         
         if isinstance(value, list):
@@ -479,12 +758,26 @@ class Interpreter:
         return str(value)
 
 
-def import_time():
-    import time
-    return time 
+# Statements that run through Interpreter.generator_statement inside generators
+GENERATOR_STATEMENTS = frozenset([
+    parser_module.Yield, parser_module.IfStatement, parser_module.WhileLoop, parser_module.ForLoop,
+    parser_module.ForInLoop, parser_module.WithStatement, parser_module.TryCatch,
+])
 
-class BreakException(Exception):
-    pass
 
-class ContinueException(Exception):
-    pass 
\ No newline at end of file
+# Cache size used by memoize(f) when no maxsize is given
+DEFAULT_MEMO_SIZE = 128
+
+
+def memoize(function, maxsize=DEFAULT_MEMO_SIZE):
+    # memoize(f) / memoize(f, maxsize): null for an unbounded cache
+    if not callable(function) or isinstance(function, ShravScriptModule):
+        raise RuntimeError("memoize() expects a function")
+    if maxsize is not None and (type(maxsize) is not int or maxsize < 0):
+        raise RuntimeError("memoize() maxsize must be a non-negative integer or null")
+    return ShravScriptMemoizedFunction(function, maxsize)
+
+
+def import_time():
+    import time
+    return time 
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""
+Native functions on lists, dictionaries and strings.
+
+Every function here takes the interpreter and the collection first, so it
+serves both as a global builtin, ``sum(numbers)``, and as a method,
+``numbers.sum()``. The loops run in Python's built-ins (sorted, sum, min,
+list slicing, str.join, ...); only callbacks such as the function given to
+map() go back into the interpreter.
+
+add() and is_truthy() define the + operator and truthiness once for every
+backend: the tree walker, the VM, the closure compiler, transpiled code and
+the optimizer's constant folding.
+"""
+import functools
+
+
+def add(left, right):
+    # String concatenation if either operand is a string
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+
+def is_truthy(value):
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str):
+        return len(value) > 0
+    if isinstance(value, (list, dict)):
+        return len(value) > 0
+    return True
+
+
+class NativeMethod:
+    """A library function callable as name(receiver, ...) or receiver.name(...)."""
+
+    __slots__ = ('name', 'function')
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+
+    def __call__(self, interpreter, arguments):
+        return self.function(interpreter, *arguments)
+
+    def call_method(self, interpreter, receiver, arguments):
+        return self.function(interpreter, receiver, *arguments)
+
+    def __str__(self):
+        return f"<native fn {self.name}>"
+
+
+def check_callable(name, function):
+    if not callable(function):
+        raise RuntimeError(f"{name}() requires a function argument")
+
+
+def key_function(interpreter, key):
+    # Python key function calling a ShravScript function, or None
+    if key is None:
+        return None
+    check_callable("key", key)
+    return lambda item: key(interpreter, [item])
+
+
+def list_map(interpreter, items, function=None):
+    check_callable("map", function)
+    return [function(interpreter, [item]) for item in items]
+
+
+def list_filter(interpreter, items, function=None):
+    check_callable("filter", function)
+    is_truthy = interpreter.is_truthy
+    return [item for item in items if is_truthy(function(interpreter, [item]))]
+
+
+# Distinguishes reduce(xs, f) from reduce(xs, f, null)
+NO_INITIAL = object()
+
+
+def list_reduce(interpreter, items, function=None, initial=NO_INITIAL):
+    check_callable("reduce", function)
+
+    def combine(total, item):
+        return function(interpreter, [total, item])
+
+    if initial is NO_INITIAL:
+        if not items:
+            raise RuntimeError("reduce() of an empty list needs an initial value")
+        return functools.reduce(combine, items)
+    return functools.reduce(combine, items, initial)
+
+
+def list_sort(interpreter, items, key=None):
+    # Returns a new list; the original is left in place
+    return sorted(items, key=key_function(interpreter, key))
+
+
+def list_sum(interpreter, items):
+    return sum(items)
+
+
+def list_min(interpreter, items, key=None):
+    if not items:
+        raise RuntimeError("min() of an empty list")
+    return min(items, key=key_function(interpreter, key))
+
+
+def list_max(interpreter, items, key=None):
+    if not items:
+        raise RuntimeError("max() of an empty list")
+    return max(items, key=key_function(interpreter, key))
+
+
+def sequence_reverse(interpreter, sequence):
+    return sequence[::-1]
+
+
+def slice_position(value):
+    # Arithmetic yields floats (n / 2), so whole numbers are truncated like range()
+    if value is None:
+        return None
+    if type(value) not in (int, float, bool):
+        raise RuntimeError("slice() positions must be numbers")
+    try:
+        return int(value)
+    except (ValueError, OverflowError):
+        raise RuntimeError(f"slice() position {value} is not finite") from None
+
+
+def sequence_slice(interpreter, sequence, start=None, end=None):
+    # Negative positions count from the end, as in Python
+    return sequence[slice_position(start):slice_position(end)]
+
+
+def list_join(interpreter, items, separator=""):
+    stringify = interpreter.stringify
+    return str(separator).join([item if type(item) is str else stringify(item) for item in items])
+
+
+def dict_keys(interpreter, mapping):
+    return list(mapping)
+
+
+def dict_values(interpreter, mapping):
+    return list(mapping.values())
+
+
+def dict_items(interpreter, mapping):
+    return [[key, value] for key, value in mapping.items()]
+
+
+def make_range(interpreter, start, end=None, step=1):
+    # range(n) counts 0 .. n - 1; range(start, end[, step]) as in Python
+    if end is None:
+        start, end = 0, start
+    return list(range(int(start), int(end), int(step)))
+
+
+def to_list(interpreter, iterable):
+    # list(x): the elements a for-in loop over x would visit
+    return list(interpreter.iterate(iterable))
+
+
+def table(**functions):
+    return {name: NativeMethod(name, function) for name, function in functions.items()}
+
+
+# Python type of the receiver -> method name -> NativeMethod
+METHODS = {
+    list: table(
+        map=list_map, filter=list_filter, reduce=list_reduce, sort=list_sort, sum=list_sum,
+        min=list_min, max=list_max, reverse=sequence_reverse, slice=sequence_slice, join=list_join,
+    ),
+    dict: table(keys=dict_keys, values=dict_values, items=dict_items),
+    str: table(reverse=sequence_reverse, slice=sequence_slice),
+}
+
+# Global builtins: every method above under its own name, plus range() and list()
+BUILTINS = {}
+for methods in METHODS.values():
+    BUILTINS.update(methods)
+BUILTINS["range"] = NativeMethod("range", make_range)
+BUILTINS["list"] = NativeMethod("list", to_list)
+
+
+def find_method(obj, name):
+    """The NativeMethod for obj.name(...), or None when obj has no such method."""
+    methods = METHODS.get(type(obj))
+    if methods is None:
+        return None
+    if type(obj) is dict and name in obj:
+        # A dictionary's own entries win over its methods
+        return None
+    return methods.get(name)
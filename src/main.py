@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import sys
 import os
+import threading
 
 # Add the src directory to path when running directly
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -9,14 +10,64 @@ if script_dir not in sys.path:
 
 # Import using absolute imports
 from interpreter import Interpreter
+import cache
+from modules import registry
 
-def run_file(path):
+# The tree walker and --closures nest about five Python calls per ShravScript
+# call; Python's default limit of 1000 would stop recursion at ~200 levels.
+# Scripts run on a thread whose C stack is large enough for the raised limit,
+# so hitting it is a clean RecursionError rather than a crash.
+PYTHON_RECURSION_LIMIT = 200000
+THREAD_STACK_SIZE = 512 * 1024 * 1024
+
+def run_on_large_stack(function, *args):
+    result = []
+    previous = threading.stack_size(THREAD_STACK_SIZE)
+    try:
+        # A daemon thread, so Ctrl+C in the waiting main thread still ends the program
+        thread = threading.Thread(target=lambda: result.append(function(*args)), daemon=True)
+        thread.start()
+    finally:
+        threading.stack_size(previous)
+    thread.join()
+    return result[0] if result else None
+
+def run_file(path, use_vm=False, use_cache=True, optimize=False, dump_optimizations=False, use_closures=False,
+             tier_up=True, profile=False, max_depth=None, collapsed_path=None):
     try:
         with open(path, 'r', encoding='utf-8') as file:
             source = file.read()
         
-        interpreter = Interpreter()
-        interpreter.interpret(source)
+        if use_vm:
+            from vm import VM
+            interpreter = VM()
+            if max_depth is not None:
+                interpreter.max_call_depth = max_depth
+        elif use_closures:
+            from closures import ClosureInterpreter
+            interpreter = ClosureInterpreter()
+        else:
+            interpreter = Interpreter()
+        interpreter.optimize = optimize or dump_optimizations
+        interpreter.dump_optimizations = dump_optimizations
+        interpreter.tier_up = tier_up
+        # A cached tree would skip the optimizer and leave nothing to report
+        cache.enabled = use_cache and not dump_optimizations
+        if profile:
+            from profiler import Profiler
+            profiler = Profiler()
+            interpreter.enable_profiling(profiler)
+        # User modules are looked up next to the script first
+        registry.set_script_dir(os.path.dirname(os.path.abspath(path)))
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), PYTHON_RECURSION_LIMIT))
+        run_on_large_stack(interpreter.interpret, source, path)
+        if profile:
+            profiler.stop()
+            profiler.report(source=source)
+            if collapsed_path is not None:
+                # Collapsed stacks for flamegraph tools, only where asked for
+                profiler.write_collapsed(collapsed_path)
+                print(f"\nCollapsed stacks written to {collapsed_path}", file=sys.stderr)
         return 0
     except FileNotFoundError:
         print(f"Error: Could not find file '{path}'")
@@ -28,8 +79,26 @@ def run_file(path):
 def print_usage():
     print("ShravScript Interpreter")
     print("Usage:")
-    print("  shrav [script.shs]")
+    print("  shrav [options] [script.shs]")
     print("  shrav --repl")
+    print("  shrav bench [options] [script.shs ...]")
+    print()
+    print("Options:")
+    print("  -O            Optimize the AST (constant folding, dead branch removal)")
+    print("  --dump-opt    Optimize and print every change the optimizer made")
+    print("  --vm          Compile the script to bytecode and run it on the stack VM")
+    print("  --closures    Compile the script to Python closures before running it")
+    print("  --no-cache    Parse from source instead of using __shravcache__")
+    print("  --no-tier-up  Never transpile hot functions to Python")
+    print("  --profile     Report time per function and hits per line on stderr")
+    print("  --collapsed PATH")
+    print("                Profile and also write the call stacks to PATH in the")
+    print("                collapsed format read by flamegraph tools")
+    print("  --max-depth N Limit --vm to N nested function calls (default 100000)")
+    print()
+    print("Deep (non-tail) recursion needs --vm; the default interpreter and --closures")
+    print("stop with a 'Maximum call depth exceeded' error after roughly 15,000 to")
+    print("30,000 nested calls, depending on the script.")
 
 def main():
     if len(sys.argv) < 2:
@@ -40,10 +109,73 @@ def main():
         # Launch the REPL
         import repl
         return repl.start_repl()
-    else:
-        # Run a script file
-        script_path = sys.argv[1]
-        return run_file(script_path)
+    
+    if sys.argv[1] == "bench":
+        # Time the tokenizer, parser and interpreter on the benchmark suite
+        import bench
+        return bench.main(sys.argv[2:])
+    
+    # Parse options preceding the script path
+    use_vm = False
+    use_closures = False
+    tier_up = True
+    use_cache = True
+    optimize = False
+    dump_optimizations = False
+    profile = False
+    collapsed_path = None
+    max_depth = None
+    args = sys.argv[1:]
+    while args and args[0].startswith("-"):
+        option = args.pop(0)
+        if option == "--vm":
+            use_vm = True
+        elif option == "--closures":
+            use_closures = True
+        elif option == "--no-cache":
+            use_cache = False
+        elif option == "--no-tier-up":
+            tier_up = False
+        elif option == "-O":
+            optimize = True
+        elif option == "--dump-opt":
+            dump_optimizations = True
+        elif option == "--profile":
+            profile = True
+        elif option == "--collapsed":
+            if not args:
+                print("Error: --collapsed needs a file path")
+                return 1
+            collapsed_path = args.pop(0)
+            profile = True
+        elif option == "--max-depth":
+            if not args or not args[0].isdigit() or int(args[0]) < 1:
+                print("Error: --max-depth needs a positive number")
+                return 1
+            max_depth = int(args.pop(0))
+        else:
+            print(f"Error: Unknown option '{option}'")
+            print_usage()
+            return 1
+    
+    if not args:
+        print_usage()
+        return 1
+    
+    # Run a script file
+    script_path = args[0]
+    if use_vm and use_closures:
+        print("Error: --vm and --closures cannot be combined")
+        return 1
+    if profile and (use_vm or use_closures):
+        print("Error: --profile is only supported by the default interpreter")
+        return 1
+    if max_depth is not None and not use_vm:
+        print("Error: --max-depth is only supported with --vm")
+        return 1
+    
+    return run_file(script_path, use_vm, use_cache, optimize, dump_optimizations, use_closures, tier_up,
+                    profile, max_depth, collapsed_path)
 
 # Entry point for the command-line tool
 def entry_point():
@@ -0,0 +1,127 @@
+import os
+
+import cache
+from environment import ShravScriptModule
+
+MODULE_SUFFIX = ".shs"
+
+
+class ModuleEntry:
+    def __init__(self, module, stat):
+        self.module = module
+        # (mtime, size) of the source when it was loaded
+        self.stat = stat
+
+
+class ModuleRegistry:
+    """
+    Process-wide table of loaded user modules.
+
+    A module is looked up on the search path (the main script's directory,
+    or the working directory when there is none, followed by the entries of
+    the SHRAV_PATH environment variable), executed once, and the resulting
+    ShravScriptModule is shared by every interpreter that imports it.
+
+    Long-running hosts that edit scripts in place can set ``check_mtime``
+    so that a module whose file changed on disk is reloaded on its next
+    import instead of being served from the registry.
+    """
+
+    def __init__(self):
+        self.script_dir = None
+        self.check_mtime = False
+        # (interpreter class, path) -> ModuleEntry
+        self.modules = {}
+        # Module name -> resolved path
+        self.paths = {}
+        # Modules currently executing, outermost first: (key, name)
+        self.loading = []
+
+    def set_script_dir(self, script_dir):
+        self.script_dir = script_dir
+        self.paths.clear()
+
+    def search_path(self):
+        paths = [self.script_dir or os.getcwd()]
+        for entry in os.environ.get("SHRAV_PATH", "").split(os.pathsep):
+            if entry:
+                paths.append(entry)
+        return paths
+
+    def find_module(self, module_name):
+        path = self.paths.get(module_name)
+        if path is not None and (not self.check_mtime or os.path.isfile(path)):
+            return path
+
+        filename = module_name + MODULE_SUFFIX
+        for directory in self.search_path():
+            candidate = os.path.abspath(os.path.join(directory, filename))
+            if os.path.isfile(candidate):
+                self.paths[module_name] = candidate
+                return candidate
+        return None
+
+    def import_module(self, interpreter, module_name):
+        path = self.find_module(module_name)
+        if path is None:
+            raise RuntimeError(f"Module not found: {module_name}")
+
+        # Functions are only callable by the kind of interpreter that created them
+        key = (interpreter.__class__, path)
+        entry = self.modules.get(key)
+        if entry is not None and (not self.check_mtime or entry.stat == self.stat(path)):
+            return entry.module
+
+        for loading_key, _ in self.loading:
+            if loading_key == key:
+                chain = [name for _, name in self.loading] + [module_name]
+                raise RuntimeError(f"Circular import: {' -> '.join(chain)}")
+
+        self.loading.append((key, module_name))
+        try:
+            stat = self.stat(path)
+            module = self.load_module(interpreter, module_name, path)
+        finally:
+            self.loading.pop()
+
+        self.modules[key] = ModuleEntry(module, stat)
+        return module
+
+    def load_module(self, interpreter, module_name, path):
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+
+        # Run the module in a new interpreter of the same kind and with the
+        # same engine options; errors propagate to the importing script
+        mod_interpreter = interpreter.module_interpreter()
+        program = cache.load_program(path, source, mod_interpreter.parse, interpreter.optimize)
+        mod_interpreter.run_program(program)
+
+        # Create and return a module with the module's environment
+        module = ShravScriptModule(module_name)
+        for name, value in mod_interpreter.globals.values.items():
+            if callable(value):
+                module.add_function(name, value)
+        return module
+
+    def stat(self, path):
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
+
+    def invalidate(self, module_name=None):
+        # Forget one module (by name) or all of them
+        if module_name is None:
+            self.modules.clear()
+            self.paths.clear()
+            return
+
+        path = self.paths.pop(module_name, None)
+        for key in [key for key in self.modules if key[1] == path]:
+            del self.modules[key]
+
+
+# Shared by every interpreter in the process
+registry = ModuleRegistry()
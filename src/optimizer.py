@@ -0,0 +1,306 @@
+import operator
+import sys
+
+import parser as parser_module
+from library import add, is_truthy
+
+# Folded strings longer than this are left to be built at runtime
+MAX_FOLDED_SIZE = 4096
+
+
+# Same semantics as Interpreter.evaluate_binary
+BINARY_OPERATIONS = {
+    '+': add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+    '**': operator.pow,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    'and': lambda left, right: is_truthy(left) and is_truthy(right),
+    'or': lambda left, right: is_truthy(left) or is_truthy(right),
+}
+
+UNARY_OPERATIONS = {
+    '-': operator.neg,
+    'not': lambda operand: not is_truthy(operand),
+}
+
+
+def is_cheap(operator_name, left, right):
+    # Refuse folds that could take long or produce a huge value
+    if operator_name == '**':
+        return not isinstance(right, (int, float)) or right <= 128
+    if operator_name == '*':
+        for sequence, count in ((left, right), (right, left)):
+            if isinstance(sequence, str) and isinstance(count, int) and len(sequence) * count > MAX_FOLDED_SIZE:
+                return False
+    return True
+
+
+def declares_names(statements):
+    # Whether a block needs its own scope for the names declared directly in it
+    for stmt in statements:
+        if type(stmt) in (parser_module.VariableDeclaration, parser_module.FunctionDeclaration,
+                          parser_module.ClassDeclaration, parser_module.ImportStatement):
+            return True
+    return False
+
+
+def describe(expr):
+    # Short source-like rendering of an expression for the change report
+    expr_type = type(expr)
+    if expr_type == parser_module.Literal:
+        value = expr.value
+        if value is None:
+            return "null"
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, str):
+            return '"' + value + '"'
+        return str(value)
+    if expr_type == parser_module.Identifier:
+        return expr.name
+    if expr_type == parser_module.BinaryOp:
+        return f"({describe(expr.left)} {expr.operator} {describe(expr.right)})"
+    if expr_type == parser_module.UnaryOp:
+        operand = describe(expr.operand)
+        if expr.operator == 'not':
+            return f"not {operand}"
+        if operand.startswith('-'):
+            operand = f"({operand})"
+        return f"{expr.operator}{operand}"
+    if expr_type == parser_module.ListLiteral:
+        return "[" + ", ".join(describe(element) for element in expr.elements) + "]"
+    if expr_type == parser_module.DictLiteral:
+        return "{" + ", ".join(f"{key}: {describe(value)}" for key, value in expr.items.items()) + "}"
+    return f"<{expr_type.__name__}>"
+
+
+class Optimizer:
+    """
+    Optional AST rewriting pass run between Parser.parse and the resolver
+    when a script is started with -O.
+
+    Folds arithmetic, comparisons and logical operators whose operands are
+    all literals, removes if/elif/else branches and while loops whose
+    conditions are constant, and gives list and dict literals made only of
+    literals a template value that is copied instead of rebuilt on every
+    evaluation. Every rewrite is recorded in ``changes`` for dump().
+
+    Folding uses the interpreter's own operator semantics, and operations
+    that would raise (such as division by zero) are left in place so the
+    error still happens at runtime.
+    """
+
+    def __init__(self):
+        self.changes = []
+
+    def optimize(self, program):
+        program.statements = self.optimize_statements(program.statements)
+        return program
+
+    def record(self, message):
+        self.changes.append(message)
+
+    def dump(self, file=None):
+        file = file or sys.stderr
+        print(f"Optimizer: {len(self.changes)} change(s)", file=file)
+        for change in self.changes:
+            print(f"  {change}", file=file)
+
+    # Statements
+
+    def optimize_statements(self, statements):
+        optimized = []
+        for stmt in statements:
+            result = self.optimize_statement(stmt)
+            if result is None:
+                continue
+            if type(result) is list:
+                optimized.extend(result)
+            else:
+                optimized.append(result)
+        return optimized
+
+    def optimize_statement(self, stmt):
+        # Returns the replacement statement, a list of statements to splice
+        # into the enclosing block, or None to remove the statement
+        stmt_type = type(stmt)
+
+        if stmt_type == parser_module.Print:
+            stmt.value = self.optimize_expression(stmt.value)
+        elif stmt_type == parser_module.VariableDeclaration:
+            if stmt.value is not None:
+                stmt.value = self.optimize_expression(stmt.value)
+        elif stmt_type == parser_module.FunctionDeclaration:
+            stmt.body = self.optimize_statements(stmt.body)
+        elif stmt_type == parser_module.Return:
+            if stmt.value is not None:
+                stmt.value = self.optimize_expression(stmt.value)
+        elif stmt_type == parser_module.IfStatement:
+            return self.optimize_if(stmt)
+        elif stmt_type == parser_module.WhileLoop:
+            stmt.condition = self.optimize_expression(stmt.condition)
+            if type(stmt.condition) == parser_module.Literal and not is_truthy(stmt.condition.value):
+                self.record(f"removed while loop with condition {describe(stmt.condition)}")
+                return None
+            stmt.body = self.optimize_statements(stmt.body)
+        elif stmt_type == parser_module.ForInLoop:
+            stmt.iterable = self.optimize_expression(stmt.iterable)
+            stmt.body = self.optimize_statements(stmt.body)
+        elif stmt_type == parser_module.Yield:
+            if stmt.value is not None:
+                stmt.value = self.optimize_expression(stmt.value)
+        elif stmt_type == parser_module.ForLoop:
+            stmt.range_start = self.optimize_expression(stmt.range_start)
+            stmt.range_end = self.optimize_expression(stmt.range_end)
+            stmt.body = self.optimize_statements(stmt.body)
+        elif stmt_type == parser_module.WithStatement:
+            stmt.expression = self.optimize_expression(stmt.expression)
+            stmt.body = self.optimize_statements(stmt.body)
+        elif stmt_type == parser_module.TryCatch:
+            stmt.try_body = self.optimize_statements(stmt.try_body)
+            stmt.catch_body = self.optimize_statements(stmt.catch_body)
+        elif stmt_type == parser_module.ClassDeclaration:
+            for method in stmt.methods:
+                method.body = self.optimize_statements(method.body)
+        elif stmt_type == parser_module.SwitchStatement:
+            stmt.expression = self.optimize_expression(stmt.expression)
+            stmt.values = [self.optimize_expression(value) for value in stmt.values]
+            stmt.bodies = [self.optimize_statements(body) for body in stmt.bodies]
+            if stmt.default_body is not None:
+                stmt.default_body = self.optimize_statements(stmt.default_body)
+        elif stmt_type in (parser_module.ImportStatement, parser_module.BreakStatement,
+                           parser_module.ContinueStatement):
+            pass
+        else:
+            return self.optimize_expression(stmt)
+        return stmt
+
+    def optimize_if(self, stmt):
+        branches = [(stmt.condition, stmt.if_body)]
+        branches.extend(zip(stmt.elif_conditions, stmt.elif_bodies))
+
+        kept = []
+        else_body = stmt.else_body
+        for index, (condition, body) in enumerate(branches):
+            condition = self.optimize_expression(condition)
+            if type(condition) != parser_module.Literal:
+                kept.append((condition, self.optimize_statements(body)))
+                continue
+
+            if not is_truthy(condition.value):
+                self.record(f"pruned branch with condition {describe(condition)}")
+                continue
+
+            # This branch always runs, so nothing after it is reachable
+            skipped = len(branches) - index - 1 + (else_body is not None)
+            if skipped:
+                self.record(f"pruned {skipped} branch(es) after condition {describe(condition)}")
+            else_body = body
+            break
+
+        if else_body is not None:
+            else_body = self.optimize_statements(else_body)
+
+        if not kept:
+            if else_body is None:
+                self.record("removed if statement with no reachable branch")
+                return None
+            return self.unconditional_block(else_body)
+
+        stmt.condition, stmt.if_body = kept[0]
+        stmt.elif_conditions = [condition for condition, _ in kept[1:]]
+        stmt.elif_bodies = [body for _, body in kept[1:]]
+        stmt.else_body = else_body
+        return stmt
+
+    def unconditional_block(self, body):
+        if not declares_names(body):
+            # No scope of its own needed: splice the statements in place
+            self.record("inlined the only reachable branch of an if statement")
+            return body
+        # Keep a block so its declarations stay local to it
+        return parser_module.IfStatement(parser_module.Literal(True), body)
+
+    # Expressions
+
+    def optimize_expression(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == parser_module.BinaryOp:
+            expr.left = self.optimize_expression(expr.left)
+            expr.right = self.optimize_expression(expr.right)
+            return self.fold_binary(expr)
+        elif expr_type == parser_module.UnaryOp:
+            expr.operand = self.optimize_expression(expr.operand)
+            return self.fold_unary(expr)
+        elif expr_type == parser_module.Assignment:
+            expr.value = self.optimize_expression(expr.value)
+            target = expr.target
+            if type(target) == parser_module.IndexAccess:
+                target.obj = self.optimize_expression(target.obj)
+                target.index = self.optimize_expression(target.index)
+            elif type(target) == parser_module.PropertyAccess:
+                target.obj = self.optimize_expression(target.obj)
+        elif expr_type == parser_module.FunctionCall:
+            expr.func = self.optimize_expression(expr.func)
+            expr.args = [self.optimize_expression(arg) for arg in expr.args]
+        elif expr_type == parser_module.ListLiteral:
+            expr.elements = [self.optimize_expression(element) for element in expr.elements]
+            if all(type(element) == parser_module.Literal for element in expr.elements):
+                expr.template = [element.value for element in expr.elements]
+                self.record(f"hoisted constant list {describe(expr)}")
+        elif expr_type == parser_module.DictLiteral:
+            for key, value in expr.items.items():
+                expr.items[key] = self.optimize_expression(value)
+            if all(type(value) == parser_module.Literal for value in expr.items.values()):
+                expr.template = {key: value.value for key, value in expr.items.items()}
+                self.record(f"hoisted constant dict {describe(expr)}")
+        elif expr_type == parser_module.IndexAccess:
+            expr.obj = self.optimize_expression(expr.obj)
+            expr.index = self.optimize_expression(expr.index)
+        elif expr_type == parser_module.PropertyAccess:
+            expr.obj = self.optimize_expression(expr.obj)
+        elif expr_type == parser_module.LambdaExpression:
+            expr.body = self.optimize_statements(expr.body)
+        return expr
+
+    def fold_binary(self, expr):
+        left, right = expr.left, expr.right
+        operation = BINARY_OPERATIONS.get(expr.operator)
+        if (operation is None or type(left) != parser_module.Literal
+                or type(right) != parser_module.Literal
+                or not is_cheap(expr.operator, left.value, right.value)):
+            return expr
+
+        try:
+            value = operation(left.value, right.value)
+        except Exception:
+            # Leave the error to be raised at runtime
+            return expr
+        return self.folded(expr, value)
+
+    def fold_unary(self, expr):
+        operation = UNARY_OPERATIONS.get(expr.operator)
+        if operation is None or type(expr.operand) != parser_module.Literal:
+            return expr
+
+        try:
+            value = operation(expr.operand.value)
+        except Exception:
+            return expr
+        return self.folded(expr, value)
+
+    def folded(self, expr, value):
+        if isinstance(value, str) and len(value) > MAX_FOLDED_SIZE:
+            return expr
+        literal = parser_module.Literal(value)
+        self.record(f"folded {describe(expr)} -> {describe(literal)}")
+        return literal
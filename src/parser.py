@@ -1,7 +1,10 @@
 from tokenizer import TokenType
 
 class Node:
-    pass
+    # Source position of the first token; the parser sets it on statements
+    # and functions, for the profiler
+    line = None
+    column = None
 
 class Program(Node):
     def __init__(self, statements=None):
@@ -28,31 +31,62 @@ class Literal(Node):
 class Identifier(Node):
     def __init__(self, name):
         self.name = name
+        # Filled in by the resolver: scopes to walk up and slot in that scope
+        self.depth = None
+        self.slot = None
+
+class InterpolatedString(Node):
+    def __init__(self, parts):
+        # Literal text (str) and Identifier nodes, in order, for "...${name}..."
+        self.parts = parts
 
 class VariableDeclaration(Node):
     def __init__(self, name, value):
         self.name = name
         self.value = value
+        self.slot = None  # Filled in by the resolver; None for globals
 
 class Assignment(Node):
     def __init__(self, target, value):
         self.target = target
         self.value = value
+        # Filled in by the resolver for identifier targets
+        self.depth = None
+        self.slot = None
 
 class FunctionDeclaration(Node):
-    def __init__(self, name, params, body):
+    def __init__(self, name, params, body, is_generator=False):
         self.name = name
         self.params = params
         self.body = body
+        # True when the body contains `yield`: calls return a generator
+        self.is_generator = is_generator
+        # Filled in by the resolver; this_slot is only set for class methods
+        self.slot = None
+        self.layout = None
+        self.param_slots = []
+        self.this_slot = None
+        # Updated at runtime by ShravScriptFunction's tier-up
+        self.calls = 0
+        self.native_factory = None
 
 class FunctionCall(Node):
     def __init__(self, func, args):
         self.func = func
         self.args = args
+        # Inline cache of method calls (obj.method()), updated at runtime
+        self.cached_class = None
+        self.cached_method = None
+
+class Yield(Node):
+    def __init__(self, value):
+        self.value = value
 
 class Return(Node):
     def __init__(self, value):
         self.value = value
+        # Set by the resolver when the value is a plain call in tail position
+        self.tail_call = False
 
 class IfStatement(Node):
     def __init__(self, condition, if_body, elif_conditions=None, elif_bodies=None, else_body=None):
@@ -61,11 +95,16 @@ class IfStatement(Node):
         self.elif_conditions = elif_conditions or []
         self.elif_bodies = elif_bodies or []
         self.else_body = else_body
+        # Filled in by the resolver
+        self.if_layout = None
+        self.elif_layouts = [None] * len(self.elif_bodies)
+        self.else_layout = None
 
 class WhileLoop(Node):
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
+        self.body_layout = None  # Filled in by the resolver
 
 class ForLoop(Node):
     def __init__(self, var_name, range_start, range_end, body):
@@ -73,14 +112,25 @@ class ForLoop(Node):
         self.range_start = range_start
         self.range_end = range_end
         self.body = body
+        self.body_layout = None  # Filled in by the resolver
+
+class ForInLoop(Node):
+    # for x in <list, dict, string, file, generator, ...> { ... }
+    def __init__(self, var_name, iterable, body):
+        self.var_name = var_name
+        self.iterable = iterable
+        self.body = body
+        self.body_layout = None  # Filled in by the resolver
 
 class ListLiteral(Node):
     def __init__(self, elements):
         self.elements = elements
+        self.template = None  # Filled in by the optimizer when every element is a literal
 
 class DictLiteral(Node):
     def __init__(self, items):
         self.items = items
+        self.template = None  # Filled in by the optimizer when every value is a literal
 
 class IndexAccess(Node):
     def __init__(self, obj, index):
@@ -91,26 +141,44 @@ class PropertyAccess(Node):
     def __init__(self, obj, prop):
         self.obj = obj
         self.prop = prop
+        # Inline caches of field slots and method lookups, updated at runtime
+        self.cached_shape = None
+        self.cached_slot = None
+        self.cached_class = None
+        self.cached_method = None
 
 class LambdaExpression(Node):
-    def __init__(self, params, body):
+    def __init__(self, params, body, is_generator=False):
         self.params = params
         self.body = body
+        self.is_generator = is_generator
+        # Filled in by the resolver
+        self.layout = None
+        self.param_slots = []
+        self.this_slot = None
+        # Updated at runtime by ShravScriptFunction's tier-up
+        self.calls = 0
+        self.native_factory = None
 
 class TryCatch(Node):
     def __init__(self, try_body, catch_var, catch_body):
         self.try_body = try_body
         self.catch_var = catch_var
         self.catch_body = catch_body
+        # Filled in by the resolver
+        self.try_layout = None
+        self.catch_layout = None
 
 class ImportStatement(Node):
     def __init__(self, module_name):
         self.module_name = module_name
+        self.slot = None  # Filled in by the resolver; None for globals
 
 class ClassDeclaration(Node):
     def __init__(self, name, methods):
         self.name = name
         self.methods = methods
+        self.slot = None  # Filled in by the resolver; None for globals
 
 class Print(Node):
     def __init__(self, value):
@@ -127,6 +195,7 @@ class WithStatement(Node):
         self.expression = expression
         self.var_name = var_name
         self.body = body
+        self.body_layout = None  # Filled in by the resolver
 
 class SwitchStatement(Node):
     def __init__(self, expression, cases, values, bodies, default_body=None):
@@ -138,16 +207,34 @@ class SwitchStatement(Node):
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.current = 0
+        # Tokens are pulled on demand from any iterable ending in an EOF token,
+        # such as Tokenizer.iter_tokens(). The grammar needs at most two tokens
+        # of lookahead: the current token and, lazily, the one after it.
+        self.tokens = iter(tokens)
+        self.current_token = next(self.tokens)
+        self.next_token = None
+        self.previous_token = None
+        # One flag per function body being parsed, set when it contains `yield`
+        self.generator_flags = []
     
     def parse(self):
-        statements = []
+        return Program(list(self.iter_statements()))
+    
+    def iter_statements(self):
+        """Yield top-level statements one at a time as they are parsed."""
         while not self.is_at_end():
-            statements.append(self.statement())
-        return Program(statements)
+            yield self.statement()
     
     def statement(self):
+        start = self.current_token
+        return self.located(self.statement_node(), start)
+    
+    def located(self, node, token):
+        node.line = token.line
+        node.column = token.column
+        return node
+    
+    def statement_node(self):
         if self.match(TokenType.KEYWORD, 'let'):
             return self.variable_declaration()
         elif self.match(TokenType.KEYWORD, 'fn'):
@@ -178,8 +265,8 @@ class Parser:
             # Parse function body
             self.consume(TokenType.DELIMITER, '{', "Expected '{' before function body")
             
-            body = self.block()
-            return FunctionDeclaration(name, params, body)
+            body, is_generator = self.function_body()
+            return FunctionDeclaration(name, params, body, is_generator)
         elif self.match(TokenType.KEYWORD, 'if'):
             return self.if_statement()
         elif self.match(TokenType.KEYWORD, 'switch'):
@@ -198,6 +285,8 @@ class Parser:
             return ContinueStatement()
         elif self.match(TokenType.KEYWORD, 'return'):
             return self.return_statement()
+        elif self.match(TokenType.KEYWORD, 'yield'):
+            return self.yield_statement()
         elif self.match(TokenType.KEYWORD, 'try'):
             return self.try_catch()
         elif self.match(TokenType.KEYWORD, 'import'):
@@ -300,12 +389,12 @@ class Parser:
         
         range_start = self.expression()
         
-        # Handle both '..' and '...' range operators
-        if self.match(TokenType.OPERATOR, '..'):
-            range_end = self.expression()
-        else:
-            self.error(self.peek(), "Expected '..' operator in range")
-            return None
+        if not self.match(TokenType.OPERATOR, '..'):
+            # for x in <iterable>
+            self.consume(TokenType.DELIMITER, '{', "Expected '{' or '..' after for loop iterable")
+            body = self.block()
+            return ForInLoop(var_name, range_start, body)
+        range_end = self.expression()
         
         self.consume(TokenType.DELIMITER, '{', "Expected '{' after for loop range")
         body = self.block()
@@ -320,6 +409,18 @@ class Parser:
         self.consume_optional(TokenType.DELIMITER, ';')
         return Return(value)
     
+    def yield_statement(self):
+        if not self.generator_flags:
+            self.error(self.previous(), "'yield' outside function")
+        self.generator_flags[-1] = True
+        
+        value = None
+        if not self.check(TokenType.DELIMITER, ';') and not self.check(TokenType.DELIMITER, '}'):
+            value = self.expression()
+        
+        self.consume_optional(TokenType.DELIMITER, ';')
+        return Yield(value)
+    
     def try_catch(self):
         self.consume(TokenType.DELIMITER, '{', "Expected '{' after try")
         try_body = self.block()
@@ -357,7 +458,7 @@ class Parser:
         return ImportStatement(module_name)
     
     def class_declaration(self):
-        name = self.consume(TokenType.IDENTIFIER, "Expected class name").value
+        name = self.consume(TokenType.IDENTIFIER, error_message="Expected class name").value
         
         self.consume(TokenType.DELIMITER, '{', "Expected '{' after class name")
         
@@ -365,6 +466,7 @@ class Parser:
         while not self.check(TokenType.DELIMITER, '}') and not self.is_at_end():
             # Parse method declarations within the class
             if self.match(TokenType.KEYWORD, 'fn'):
+                start = self.previous()
                 # Get method name directly
                 if not self.check(TokenType.IDENTIFIER):
                     self.error(self.peek(), "Expected method name")
@@ -391,8 +493,10 @@ class Parser:
                 # Parse method body
                 self.consume(TokenType.DELIMITER, '{', "Expected '{' before method body")
                 
-                body = self.block()
-                methods.append(FunctionDeclaration(method_name, params, body))
+                body, is_generator = self.function_body()
+                if is_generator and method_name == "init":
+                    self.error(start, "'init' cannot contain 'yield'")
+                methods.append(self.located(FunctionDeclaration(method_name, params, body, is_generator), start))
             else:
                 # Skip invalid tokens
                 self.error(self.peek(), "Expected method declaration starting with 'fn'")
@@ -558,13 +662,34 @@ class Parser:
             return Literal(self.previous().value)
         
         if self.match(TokenType.STRING):
-            return Literal(self.previous().value)
+            return self.string_literal(self.previous().value)
         
         if self.match(TokenType.IDENTIFIER):
             return Identifier(self.previous().value)
         
+        if self.match(TokenType.KEYWORD, 'this'):
+            # The receiver is an implicit local of every method
+            return Identifier('this')
+        
+        if self.match(TokenType.KEYWORD, 'new'):
+            # `new Class(args)` is a plain call of the class
+            return self.call()
+        
         if self.match(TokenType.DELIMITER, '('):
+            # Either a parenthesized expression or the parameters of a lambda;
+            # the two only differ once ',' or ') =>' is reached
+            start = self.previous()
+            if self.check(TokenType.DELIMITER, ')'):
+                return self.located(self.lambda_expression([]), start)
+            
             expr = self.expression()
+            if type(expr) is Identifier and (self.check(TokenType.DELIMITER, ',') or
+                    (self.check(TokenType.DELIMITER, ')') and self.check_next(TokenType.OPERATOR, '=>'))):
+                params = [expr.name]
+                while self.match(TokenType.DELIMITER, ','):
+                    params.append(self.consume(TokenType.IDENTIFIER, error_message="Expected parameter name").value)
+                return self.located(self.lambda_expression(params), start)
+            
             self.consume(TokenType.DELIMITER, ')', "Expected ')' after expression")
             return expr
         
@@ -576,32 +701,57 @@ class Parser:
             if self.check(TokenType.IDENTIFIER) and self.check_next(TokenType.OPERATOR, ':'):
                 return self.dict_literal()
             else:
-                self.current -= 1  # Put back the '{' token
-                return self.error(self.peek(), "Unexpected '{'")
-        
-        if self.match(TokenType.DELIMITER, '('):
-            # Lambda expression
-            params = []
-            
-            if not self.check(TokenType.DELIMITER, ')'):
-                while True:
-                    params.append(self.consume(TokenType.IDENTIFIER, "Expected parameter name").value)
-                    
-                    if not self.match(TokenType.DELIMITER, ','):
-                        break
-            
-            self.consume(TokenType.DELIMITER, ')', "Expected ')' after parameters")
-            self.consume(TokenType.OPERATOR, '=>', "Expected '=>' in lambda expression")
-            
-            if self.match(TokenType.DELIMITER, '{'):
-                body = self.block()
-                return LambdaExpression(params, body)
-            else:
-                body = [Return(self.expression())]
-                return LambdaExpression(params, body)
+                return self.error(self.previous(), "Unexpected '{'")
         
         return self.error(self.peek(), "Expected expression")
     
+    def string_literal(self, text):
+        # Split "Hello, ${name}!" into text and variable references once,
+        # instead of scanning the string each time it is used
+        if "${" not in text:
+            return Literal(text)
+        
+        parts = []
+        start = 0
+        while True:
+            begin = text.find("${", start)
+            if begin == -1:
+                break
+            end = text.find("}", begin + 2)
+            if end == -1:
+                break
+            name = text[begin + 2:end]
+            if not name.isidentifier() or not name.isascii():
+                # Not a reference: keep "${" as text and look further on
+                parts.append(text[start:begin + 2])
+                start = begin + 2
+                continue
+            parts.append(text[start:begin])
+            parts.append(Identifier(name))
+            start = end + 1
+        parts.append(text[start:])
+        
+        merged = []
+        for part in parts:
+            if type(part) is str and merged and type(merged[-1]) is str:
+                merged[-1] += part
+            elif part != "":
+                merged.append(part)
+        if not any(type(part) is Identifier for part in merged):
+            return Literal(text)
+        return InterpolatedString(merged)
+    
+    def lambda_expression(self, params):
+        self.consume(TokenType.DELIMITER, ')', "Expected ')' after parameters")
+        self.consume(TokenType.OPERATOR, '=>', "Expected '=>' in lambda expression")
+        
+        if self.match(TokenType.DELIMITER, '{'):
+            body, is_generator = self.function_body()
+            return LambdaExpression(params, body, is_generator)
+        else:
+            body = [Return(self.expression())]
+            return LambdaExpression(params, body)
+    
     def list_literal(self):
         elements = []
         
@@ -620,7 +770,7 @@ class Parser:
         
         if not self.check(TokenType.DELIMITER, '}'):
             while True:
-                key = self.consume(TokenType.IDENTIFIER, "Expected property name").value
+                key = self.consume(TokenType.IDENTIFIER, error_message="Expected property name").value
                 self.consume(TokenType.OPERATOR, ':', "Expected ':' after property name")
                 value = self.expression()
                 
@@ -632,6 +782,12 @@ class Parser:
         self.consume(TokenType.DELIMITER, '}', "Expected '}' after object properties")
         return DictLiteral(items)
     
+    def function_body(self):
+        # (statements, is_generator) for a body whose '{' was just consumed
+        self.generator_flags.append(False)
+        body = self.block()
+        return body, self.generator_flags.pop()
+    
     def block(self):
         statements = []
         
@@ -656,32 +812,41 @@ class Parser:
         return WithStatement(expression, var_name, body)
     
     def is_at_end(self):
-        return self.peek().type == TokenType.EOF
+        return self.current_token.type is TokenType.EOF
     
     def peek(self):
-        return self.tokens[self.current]
+        return self.current_token
     
     def peek_next(self):
-        if self.current + 1 >= len(self.tokens):
-            return None
-        return self.tokens[self.current + 1]
+        if self.next_token is None:
+            if self.is_at_end():
+                return None
+            self.next_token = next(self.tokens, None)
+        return self.next_token
     
     def previous(self):
-        return self.tokens[self.current - 1]
+        return self.previous_token
     
     def advance(self):
-        if not self.is_at_end():
-            self.current += 1
+        if self.current_token.type is not TokenType.EOF:
+            self.previous_token = self.current_token
+            if self.next_token is not None:
+                self.current_token = self.next_token
+                self.next_token = None
+            else:
+                self.current_token = next(self.tokens)
         return self.previous()
     
     def check(self, token_type, value=None):
-        if self.is_at_end():
+        # Hot path: read the current token's slots directly
+        token = self.current_token
+        if token.type is TokenType.EOF:
             return False
         
         if value is not None:
-            return self.peek().type == token_type and self.peek().value == value
+            return token.type is token_type and token.value == value
         else:
-            return self.peek().type == token_type
+            return token.type is token_type
     
     def check_next(self, token_type, value=None):
         next_token = self.peek_next()
@@ -694,16 +859,20 @@ class Parser:
             return next_token.type == token_type
     
     def match(self, token_type, value=None):
-        if self.check(token_type, value):
-            self.advance()
-            return True
-        return False
+        token = self.current_token
+        if token.type is not token_type or token_type is TokenType.EOF:
+            return False
+        if value is not None and token.value != value:
+            return False
+        
+        self.advance()
+        return True
     
     def match_any(self, token_type, values):
-        for value in values:
-            if self.check(token_type, value):
-                self.advance()
-                return True
+        token = self.current_token
+        if token.type is token_type and token_type is not TokenType.EOF and token.value in values:
+            self.advance()
+            return True
         return False
     
     def consume(self, token_type, value=None, error_message=None):
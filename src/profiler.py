@@ -0,0 +1,129 @@
+import sys
+import time
+
+# Name of the pseudo-function covering top-level statements
+MAIN = "<main>"
+
+
+class FunctionStats:
+    __slots__ = ('name', 'line', 'calls', 'inclusive', 'exclusive', 'active')
+
+    def __init__(self, name, line):
+        self.name = name
+        self.line = line
+        self.calls = 0
+        # Seconds spent in the function including / excluding its callees
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        # Activations currently on the stack; recursive calls only add their
+        # inclusive time once, when the outermost one returns
+        self.active = 0
+
+    def label(self):
+        if self.line is None:
+            return self.name
+        return f"{self.name}:{self.line}"
+
+
+class Profiler:
+    """
+    Per-function and per-line statistics for one run of a script
+    (shrav --profile).
+
+    The interpreter reports every statement it executes to hit(), and
+    every ShravScript function call goes through run(), which times it.
+    Time spent in native functions is counted as the caller's own time.
+
+    Besides the report, the time of every distinct call stack is kept in
+    ``stacks`` and can be written in the collapsed-stack format read by
+    flamegraph tools (one "main;caller;callee microseconds" line per stack).
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        # Declaration node (None for top-level code) -> FunctionStats
+        self.functions = {}
+        # Source line -> times a statement starting on it was executed
+        self.lines = {}
+        # Tuple of function labels, outermost first -> exclusive seconds
+        self.stacks = {}
+        # Active calls: [stats, stack labels, start time, time spent in callees]
+        self.stack = []
+        self.total = 0.0
+
+    def stats_for(self, declaration):
+        stats = self.functions.get(declaration)
+        if stats is None:
+            if declaration is None:
+                stats = FunctionStats(MAIN, None)
+            else:
+                stats = FunctionStats(getattr(declaration, "name", "<lambda>"), declaration.line)
+            self.functions[declaration] = stats
+        return stats
+
+    def stop(self):
+        # Unwind calls left open by an error
+        while self.stack:
+            self.exit()
+
+    def hit(self, line):
+        if line is not None:
+            lines = self.lines
+            lines[line] = lines.get(line, 0) + 1
+
+    def enter(self, declaration):
+        stats = self.stats_for(declaration)
+        stats.calls += 1
+        stats.active += 1
+        path = (self.stack[-1][1] if self.stack else ()) + (stats.label(),)
+        self.stack.append([stats, path, self.clock(), 0.0])
+
+    def exit(self):
+        stats, path, start, callees = self.stack.pop()
+        elapsed = self.clock() - start
+        own = elapsed - callees
+        stats.exclusive += own
+        stats.active -= 1
+        if not stats.active:
+            stats.inclusive += elapsed
+        self.stacks[path] = self.stacks.get(path, 0.0) + own
+        if self.stack:
+            self.stack[-1][3] += elapsed
+        else:
+            self.total += elapsed
+
+    def run(self, declaration, function, *arguments):
+        # Call function(*arguments) as the body of the given ShravScript function
+        self.enter(declaration)
+        try:
+            return function(*arguments)
+        finally:
+            self.exit()
+
+    def report(self, file=None, source=None, limit=20):
+        file = file or sys.stderr
+        print(f"Profile: {self.total * 1000:.3f} ms total", file=file)
+        print(file=file)
+        print(f"{'calls':>8} {'total ms':>10} {'self ms':>10} {'self %':>7}  function", file=file)
+        functions = sorted(self.functions.values(), key=lambda stats: stats.exclusive, reverse=True)
+        for stats in functions:
+            share = stats.exclusive / self.total * 100 if self.total else 0.0
+            print(f"{stats.calls:>8} {stats.inclusive * 1000:>10.3f} {stats.exclusive * 1000:>10.3f} "
+                  f"{share:>6.1f}%  {stats.label()}", file=file)
+
+        if not self.lines:
+            return
+        source_lines = source.splitlines() if source is not None else []
+        print(file=file)
+        print(f"{'line':>8} {'hits':>10}  source", file=file)
+        hottest = sorted(self.lines.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        for line, hits in hottest:
+            text = source_lines[line - 1].strip() if 0 < line <= len(source_lines) else ""
+            print(f"{line:>8} {hits:>10}  {text}", file=file)
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                microseconds = round(seconds * 1_000_000)
+                if microseconds:
+                    f.write(f"{';'.join(stack)} {microseconds}\n")
@@ -0,0 +1,246 @@
+import parser as parser_module
+from environment import FrameLayout
+
+
+class Resolver:
+    """
+    Static scope resolution pass run between Parser.parse and execution.
+
+    Every frame the interpreter creates at runtime (function calls, block
+    bodies, loop iterations, catch clauses, ...) has a matching scope here.
+    Each Identifier and Assignment is annotated with the number of frames
+    between the reference and the frame that declares it (``depth``) and its
+    index in that frame's slot list (``slot``). Names that no local scope
+    declares resolve to the global scope with a ``slot`` of None.
+
+    Declarations are hoisted to the top of their scope so that functions can
+    refer to helpers declared after them in the same block. Blocks that
+    declare nothing get no frame and share their parent's; the owning nodes
+    carry a FrameLayout (or None) describing each frame to allocate.
+    """
+
+    def __init__(self):
+        self.scopes = []
+        # Number of closures (functions, lambdas, classes) resolved so far
+        self.closures = 0
+        # Number of loops enclosing the current statement within its function
+        self.loop_depth = 0
+        # True where a returned call can replace the current call: in a
+        # function body, outside try and with blocks that must still run
+        # their handlers after the call
+        self.tail_position = False
+
+    def resolve(self, program):
+        self.resolve_statements(program.statements)
+        return program
+
+    def resolve_statements(self, statements):
+        for stmt in statements:
+            self.resolve_statement(stmt)
+
+    # Scope handling
+
+    def begin_scope(self, names=(), statements=()):
+        scope = {}
+        for name in names:
+            self.declare_in(scope, name)
+        for name in self.declared_names(statements):
+            self.declare_in(scope, name)
+        
+        if not scope:
+            # Nothing declared: the block reuses the enclosing frame
+            return None
+        self.scopes.append(scope)
+        return scope
+
+    def end_scope(self, scope, closures_before):
+        if scope is None:
+            return None
+        self.scopes.pop()
+        return FrameLayout(scope, captured=self.closures != closures_before)
+
+    def declare_in(self, scope, name):
+        if name not in scope:
+            scope[name] = len(scope)
+
+    def declared_names(self, statements):
+        names = []
+        for stmt in statements:
+            stmt_type = type(stmt)
+            if stmt_type in (parser_module.VariableDeclaration, parser_module.FunctionDeclaration,
+                             parser_module.ClassDeclaration):
+                names.append(stmt.name)
+            elif stmt_type == parser_module.ImportStatement:
+                names.append(stmt.module_name)
+        return names
+
+    def resolve_block(self, statements, names=()):
+        closures_before = self.closures
+        scope = self.begin_scope(names, statements)
+        self.resolve_statements(statements)
+        return self.end_scope(scope, closures_before)
+
+    def slot_for(self, name):
+        # Slot of a name declared in the innermost frame, None at global level
+        if not self.scopes:
+            return None
+        return self.scopes[-1][name]
+
+    def resolve_local(self, node, name):
+        for i in range(len(self.scopes) - 1, -1, -1):
+            scope = self.scopes[i]
+            if name in scope:
+                node.depth = len(self.scopes) - 1 - i
+                node.slot = scope[name]
+                return
+
+        # Global
+        node.depth = len(self.scopes)
+        node.slot = None
+
+    # Statements
+
+    def resolve_statement(self, stmt):
+        stmt_type = type(stmt)
+
+        if stmt_type == parser_module.Print:
+            self.resolve_expression(stmt.value)
+        elif stmt_type == parser_module.VariableDeclaration:
+            if stmt.value is not None:
+                self.resolve_expression(stmt.value)
+            stmt.slot = self.slot_for(stmt.name)
+        elif stmt_type == parser_module.FunctionDeclaration:
+            stmt.slot = self.slot_for(stmt.name)
+            self.resolve_function(stmt)
+        elif stmt_type == parser_module.Return:
+            if stmt.value is not None:
+                self.resolve_expression(stmt.value)
+                stmt.tail_call = (self.tail_position and type(stmt.value) == parser_module.FunctionCall
+                                  and type(stmt.value.func) != parser_module.PropertyAccess)
+        elif stmt_type == parser_module.IfStatement:
+            self.resolve_expression(stmt.condition)
+            stmt.if_layout = self.resolve_block(stmt.if_body)
+            stmt.elif_layouts = []
+            for condition, body in zip(stmt.elif_conditions, stmt.elif_bodies):
+                self.resolve_expression(condition)
+                stmt.elif_layouts.append(self.resolve_block(body))
+            if stmt.else_body is not None:
+                stmt.else_layout = self.resolve_block(stmt.else_body)
+        elif stmt_type == parser_module.WhileLoop:
+            self.resolve_expression(stmt.condition)
+            self.loop_depth += 1
+            stmt.body_layout = self.resolve_block(stmt.body)
+            self.loop_depth -= 1
+        elif stmt_type == parser_module.ForLoop:
+            self.resolve_expression(stmt.range_start)
+            self.resolve_expression(stmt.range_end)
+            # The loop variable always occupies slot 0
+            self.loop_depth += 1
+            stmt.body_layout = self.resolve_block(stmt.body, [stmt.var_name])
+            self.loop_depth -= 1
+        elif stmt_type == parser_module.ForInLoop:
+            self.resolve_expression(stmt.iterable)
+            # The loop variable always occupies slot 0
+            self.loop_depth += 1
+            stmt.body_layout = self.resolve_block(stmt.body, [stmt.var_name])
+            self.loop_depth -= 1
+        elif stmt_type == parser_module.Yield:
+            if stmt.value is not None:
+                self.resolve_expression(stmt.value)
+        elif stmt_type == parser_module.WithStatement:
+            self.resolve_expression(stmt.expression)
+            enclosing_tail_position, self.tail_position = self.tail_position, False
+            stmt.body_layout = self.resolve_block(stmt.body, [stmt.var_name])
+            self.tail_position = enclosing_tail_position
+        elif stmt_type == parser_module.TryCatch:
+            enclosing_tail_position, self.tail_position = self.tail_position, False
+            stmt.try_layout = self.resolve_block(stmt.try_body)
+            self.tail_position = enclosing_tail_position
+            stmt.catch_layout = self.resolve_block(stmt.catch_body, [stmt.catch_var])
+        elif stmt_type == parser_module.ImportStatement:
+            stmt.slot = self.slot_for(stmt.module_name)
+        elif stmt_type == parser_module.ClassDeclaration:
+            stmt.slot = self.slot_for(stmt.name)
+            for method in stmt.methods:
+                self.resolve_function(method, is_method=True)
+        elif stmt_type == parser_module.SwitchStatement:
+            self.resolve_expression(stmt.expression)
+            for value, body in zip(stmt.values, stmt.bodies):
+                self.resolve_expression(value)
+                self.resolve_block(body)
+            if stmt.default_body is not None:
+                self.resolve_block(stmt.default_body)
+        elif stmt_type in (parser_module.BreakStatement, parser_module.ContinueStatement):
+            if self.loop_depth == 0:
+                keyword = 'break' if stmt_type == parser_module.BreakStatement else 'continue'
+                raise SyntaxError(f"'{keyword}' outside loop")
+        else:
+            self.resolve_expression(stmt)
+
+    def resolve_function(self, function, is_method=False):
+        # Parameters and body locals share the call frame; methods also get
+        # a slot for their receiver, `this`
+        self.closures += 1
+        closures_before = self.closures
+        enclosing_loop_depth, self.loop_depth = self.loop_depth, 0
+        # A generator's return value is discarded, so its returned calls
+        # must still be made in place
+        enclosing_tail_position, self.tail_position = self.tail_position, not function.is_generator
+        
+        names = ['this'] + function.params if is_method else function.params
+        scope = self.begin_scope(names, function.body)
+        function.param_slots = [scope[param] for param in function.params] if scope else []
+        if is_method:
+            function.this_slot = scope['this']
+        self.resolve_statements(function.body)
+        function.layout = self.end_scope(scope, closures_before)
+        
+        self.loop_depth = enclosing_loop_depth
+        self.tail_position = enclosing_tail_position
+
+    # Expressions
+
+    def resolve_expression(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == parser_module.Literal:
+            pass
+        elif expr_type == parser_module.Identifier:
+            self.resolve_local(expr, expr.name)
+        elif expr_type == parser_module.Assignment:
+            self.resolve_expression(expr.value)
+            target = expr.target
+            if isinstance(target, parser_module.Identifier):
+                self.resolve_local(target, target.name)
+                expr.depth = target.depth
+                expr.slot = target.slot
+            else:
+                self.resolve_expression(target.obj)
+                if isinstance(target, parser_module.IndexAccess):
+                    self.resolve_expression(target.index)
+        elif expr_type == parser_module.BinaryOp:
+            self.resolve_expression(expr.left)
+            self.resolve_expression(expr.right)
+        elif expr_type == parser_module.UnaryOp:
+            self.resolve_expression(expr.operand)
+        elif expr_type == parser_module.FunctionCall:
+            self.resolve_expression(expr.func)
+            for arg in expr.args:
+                self.resolve_expression(arg)
+        elif expr_type == parser_module.ListLiteral:
+            for element in expr.elements:
+                self.resolve_expression(element)
+        elif expr_type == parser_module.DictLiteral:
+            for value in expr.items.values():
+                self.resolve_expression(value)
+        elif expr_type == parser_module.IndexAccess:
+            self.resolve_expression(expr.obj)
+            self.resolve_expression(expr.index)
+        elif expr_type == parser_module.PropertyAccess:
+            self.resolve_expression(expr.obj)
+        elif expr_type == parser_module.LambdaExpression:
+            self.resolve_function(expr)
+        elif expr_type == parser_module.InterpolatedString:
+            for part in expr.parts:
+                if type(part) is parser_module.Identifier:
+                    self.resolve_local(part, part.name)
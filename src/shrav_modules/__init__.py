@@ -1,9 +1,8 @@
 # ShravScript built-in modules
 # This file marks the directory as a Python package
 
-__all__ = ["netgear", "sysops", "mathex", "fileio"]
+__all__ = ["netgear", "sysops", "mathex", "fileio", "ndarr"]
 
-from . import netgear
-from . import sysops
-from . import mathex
-from . import fileio 
\ No newline at end of file
+# The builtin module names. The modules are not imported here:
+# Interpreter.load_module imports each one the first time a script imports
+# it, keeping interpreter startup small 
\ No newline at end of file
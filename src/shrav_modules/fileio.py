@@ -1,19 +1,233 @@
 import os
+import mmap
+import weakref
 from environment import ShravScriptModule, ShravScriptNativeFunction
 
+# Default size in bytes of the read buffer of open()/lines() and of the
+# write buffer of writer(), and of the pieces returned by chunks()
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+def bound_method(obj, methods, name, kind):
+    # obj.name for the file classes below: a native function calling
+    # methods[name] with obj as its first argument
+    function = methods.get(name)
+    if function is None:
+        raise AttributeError(f"{kind} has no property '{name}'")
+    arity = function.__code__.co_argcount - 1
+    return ShravScriptNativeFunction(arity, lambda *arguments: function(obj, *arguments))
+
+
+def strip_newline(line):
+    return line[:-1] if line.endswith("\n") else line
+
+
 class ShravScriptFile:
+    """
+    A file opened by fileio.open() or fileio.writer().
+    
+    Reading in a for loop, or with readline() and read(size), goes through
+    the file's buffer, so only one line or chunk is held in memory at a time.
+    """
+    
     def __init__(self, file_obj):
         self.file = file_obj
     
-    def read(self):
-        return self.file.read()
+    def read(self, size=None):
+        # The rest of the file, or at most `size` characters ("" at the end)
+        return self.file.read(-1 if size is None else int(size))
+    
+    def readline(self):
+        # The next line without its line ending, or null at the end of the file
+        line = self.file.readline()
+        if not line:
+            return None
+        return strip_newline(line)
     
     def write(self, content):
-        self.file.write(content)
+        self.file.write(content if type(content) is str else str(content))
+        return True
+    
+    def writeline(self, content):
+        self.file.write(f"{content}\n")
         return True
     
+    def flush(self):
+        self.file.flush()
+        return True
+    
+    def chunks(self, size=DEFAULT_BUFFER_SIZE):
+        # Successive pieces of at most `size` characters
+        size = int(size)
+        if size <= 0:
+            raise RuntimeError("fileio: chunk size must be positive")
+        read = self.file.read
+        chunk = read(size)
+        while chunk:
+            yield chunk
+            chunk = read(size)
+    
     def close(self):
         self.file.close()
+    
+    def __iter__(self):
+        # for line in file: one line at a time, without its line ending
+        for line in self.file:
+            yield strip_newline(line)
+    
+    def get(self, name):
+        if name == "closed":
+            return self.file.closed
+        if name == "name":
+            return self.file.name
+        return bound_method(self, FILE_METHODS, name, "file")
+    
+    def __str__(self):
+        return f"<file {self.file.name}>"
+
+
+FILE_METHODS = {
+    "read": ShravScriptFile.read, "readline": ShravScriptFile.readline,
+    "write": ShravScriptFile.write, "writeline": ShravScriptFile.writeline,
+    "flush": ShravScriptFile.flush, "chunks": ShravScriptFile.chunks,
+    "close": ShravScriptFile.close,
+}
+
+
+class ShravScriptMappedFile:
+    """
+    A read-only memory-mapped view of a file, from fileio.mmap().
+    
+    find(), count() and iteration work on the mapped pages directly, so a
+    multi-gigabyte file can be searched without reading it into a string;
+    only slices and lines that are asked for are copied out and decoded.
+    Positions and lengths are byte offsets.
+    """
+    
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        # An empty file cannot be mapped; it is viewed as empty bytes
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+    
+    def __len__(self):
+        return len(self.data)
+    
+    def __getitem__(self, index):
+        if type(index) is not int:
+            raise RuntimeError("fileio: index must be an integer")
+        return chr(self.data[index])
+    
+    def find(self, text, start=0, end=None):
+        # Byte offset of the first occurrence of text at or after start, or -1
+        data = self.data
+        return data.find(encode(text), int(start), len(data) if end is None else int(end))
+    
+    def rfind(self, text, start=0, end=None):
+        data = self.data
+        return data.rfind(encode(text), int(start), len(data) if end is None else int(end))
+    
+    def count(self, text):
+        # Non-overlapping occurrences of text
+        needle = encode(text)
+        if not needle:
+            raise RuntimeError("fileio: cannot count an empty string")
+        find = self.data.find
+        total = 0
+        position = find(needle)
+        while position != -1:
+            total += 1
+            position = find(needle, position + len(needle))
+        return total
+    
+    def slice(self, start=None, end=None):
+        # Bytes start .. end decoded as text; negative positions count from the end
+        return self.data[byte_offset(start):byte_offset(end)].decode("utf-8", errors="replace")
+    
+    def __iter__(self):
+        # Lines without their line endings
+        data = self.data
+        find = data.find
+        size = len(data)
+        start = 0
+        while start < size:
+            end = find(b"\n", start)
+            if end == -1:
+                end = size
+            line = data[start:end]
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            yield line.decode("utf-8", errors="replace")
+            start = end + 1
+    
+    def close(self):
+        if type(self.data) is mmap.mmap:
+            self.data.close()
+        self.file.close()
+    
+    def get(self, name):
+        if name == "length":
+            return len(self.data)
+        return bound_method(self, MAPPED_METHODS, name, "mapped file")
+    
+    def __str__(self):
+        return f"<mmap {self.file.name}>"
+
+
+MAPPED_METHODS = {
+    "find": ShravScriptMappedFile.find, "rfind": ShravScriptMappedFile.rfind,
+    "count": ShravScriptMappedFile.count, "slice": ShravScriptMappedFile.slice,
+    "close": ShravScriptMappedFile.close,
+}
+
+
+def encode(text):
+    if type(text) is not str:
+        raise RuntimeError("fileio: search text must be a string")
+    return text.encode("utf-8")
+
+
+def byte_offset(value):
+    # Positions computed with arithmetic are floats (size / 2); truncate them
+    if value is None:
+        return None
+    if type(value) not in (int, float, bool):
+        raise RuntimeError("fileio: positions must be numbers")
+    try:
+        return int(value)
+    except (ValueError, OverflowError):
+        raise RuntimeError(f"fileio: position {value} is not finite") from None
+
+
+def buffer_size(value):
+    size = DEFAULT_BUFFER_SIZE if value is None else int(value)
+    if size <= 1:
+        # Text files are line buffered with 1 and unbuffered text is not allowed
+        raise RuntimeError("fileio: buffer size must be greater than 1")
+    return size
+
+
+def open_text(path, mode, size):
+    # The handle-returning functions raise instead of returning an error string,
+    # which a for loop would otherwise iterate one character at a time
+    try:
+        return open(path, mode, buffering=buffer_size(size), encoding='utf-8')
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"fileio: {e}") from None
+
+
+def iter_lines(file_obj):
+    # fileio.lines(): the file is closed once the loop has seen every line
+    with file_obj:
+        for line in file_obj:
+            yield strip_newline(line)
+
+
+def close_writer(file_obj):
+    # Writers that are never closed still reach the disk when the program ends
+    if not file_obj.closed:
+        file_obj.close()
+
 
 def create_module(interpreter):
     module = ShravScriptModule("fileio")
@@ -59,18 +273,35 @@ def create_module(interpreter):
             return f"Error: {str(e)}"
     
     # Open file function
-    def open_fn(path, mode='r'):
+    def open_fn(path, mode='r', size=None):
+        return ShravScriptFile(open_text(path, mode, size))
+    
+    # Iterate over the lines of a file without loading it
+    def lines_fn(path, size=None):
+        return iter_lines(open_text(path, 'r', size))
+    
+    # Read-only memory-mapped view of a file
+    def mmap_fn(path):
         try:
-            file_obj = open(path, mode, encoding='utf-8')
-            return ShravScriptFile(file_obj)
-        except Exception as e:
-            return f"Error: {str(e)}"
+            return ShravScriptMappedFile(path)
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"fileio: {e}") from None
+    
+    # Persistent buffered writer for frequent appends
+    def writer_fn(path, size=None):
+        file_obj = open_text(path, 'a', size)
+        writer = ShravScriptFile(file_obj)
+        weakref.finalize(writer, close_writer, file_obj)
+        return writer
     
     module.add_function("read", ShravScriptNativeFunction(1, read_fn))
     module.add_function("write", ShravScriptNativeFunction(2, write_fn))
     module.add_function("exists", ShravScriptNativeFunction(1, exists_fn))
     module.add_function("append", ShravScriptNativeFunction(2, append_fn))
     module.add_function("delete", ShravScriptNativeFunction(1, delete_fn))
-    module.add_function("open", ShravScriptNativeFunction(2, open_fn))
+    module.add_function("open", ShravScriptNativeFunction(3, open_fn))
+    module.add_function("lines", ShravScriptNativeFunction(2, lines_fn))
+    module.add_function("mmap", ShravScriptNativeFunction(1, mmap_fn))
+    module.add_function("writer", ShravScriptNativeFunction(2, writer_fn))
     
-    return module 
\ No newline at end of file
+    return module
\ No newline at end of file
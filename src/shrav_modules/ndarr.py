@@ -0,0 +1,301 @@
+import math
+import operator
+import random
+from array import array
+from itertools import repeat
+from environment import ShravScriptModule, ShravScriptNativeFunction
+
+# ShravScript dtype name -> array.array typecode
+TYPECODES = {"float64": "d", "int64": "q"}
+DTYPES = {code: name for name, code in TYPECODES.items()}
+
+# Arrays longer than this print only their first and last few elements
+PRINT_LIMIT = 1000
+PRINT_EDGE = 3
+
+
+def typecode_for(dtype):
+    if dtype is None:
+        return "d"
+    if dtype not in TYPECODES:
+        raise RuntimeError(f"ndarr: unknown dtype '{dtype}' (expected float64 or int64)")
+    return TYPECODES[dtype]
+
+
+def format_number(value):
+    # Same spelling as Interpreter.stringify: 2.0 prints as 2
+    text = str(value)
+    return text[:-2] if text.endswith(".0") else text
+
+
+class NdArray:
+    """
+    A one-dimensional float64 or int64 array stored in an array.array.
+
+    Arithmetic operators work element-wise between two arrays of the same
+    length or between an array and a number, so `a * 2 + b` runs in
+    Python's C loops (map over operator functions) instead of one
+    interpreted step per element. Results of int64 arrays stay int64
+    except for `/` and negative powers, which give float64.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def dtype(self):
+        return DTYPES[self.data.typecode]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        if type(index) is not int:
+            raise RuntimeError("ndarr: index must be an integer")
+        return self.data[index]
+
+    def __setitem__(self, index, value):
+        if type(index) is not int:
+            raise RuntimeError("ndarr: index must be an integer")
+        if self.data.typecode == "q" and type(value) is float:
+            raise RuntimeError("ndarr: cannot store a float in an int64 array")
+        self.data[index] = value
+
+    def __str__(self):
+        data = self.data
+        if len(data) > PRINT_LIMIT:
+            items = ([format_number(x) for x in data[:PRINT_EDGE]] + ["..."]
+                     + [format_number(x) for x in data[-PRINT_EDGE:]])
+        else:
+            items = [format_number(x) for x in data]
+        return f"ndarr([{', '.join(items)}], {self.dtype})"
+
+    # Element-wise arithmetic
+
+    def __add__(self, other):
+        return elementwise(operator.add, self, other)
+
+    def __radd__(self, other):
+        return elementwise(operator.add, other, self)
+
+    def __sub__(self, other):
+        return elementwise(operator.sub, self, other)
+
+    def __rsub__(self, other):
+        return elementwise(operator.sub, other, self)
+
+    def __mul__(self, other):
+        return elementwise(operator.mul, self, other)
+
+    def __rmul__(self, other):
+        return elementwise(operator.mul, other, self)
+
+    def __truediv__(self, other):
+        return elementwise(operator.truediv, self, other, "d")
+
+    def __rtruediv__(self, other):
+        return elementwise(operator.truediv, other, self, "d")
+
+    def __mod__(self, other):
+        return elementwise(operator.mod, self, other)
+
+    def __rmod__(self, other):
+        return elementwise(operator.mod, other, self)
+
+    def __pow__(self, other):
+        return elementwise(operator.pow, self, other)
+
+    def __rpow__(self, other):
+        return elementwise(operator.pow, other, self)
+
+    def __neg__(self):
+        return NdArray(array(self.data.typecode, map(operator.neg, self.data)))
+
+    # Methods: a.sum(), a.tolist(), a.length, ...
+
+    def get(self, name):
+        if name == "length":
+            return len(self.data)
+        if name == "dtype":
+            return self.dtype
+        function = METHODS.get(name)
+        if function is None:
+            raise AttributeError(f"ndarr array has no property '{name}'")
+        arity = function.__code__.co_argcount - 1
+        return ShravScriptNativeFunction(arity, lambda *arguments: function(self, *arguments))
+
+
+def operand(value):
+    # (iterable of elements, typecode, length or None for a scalar)
+    if type(value) is NdArray:
+        return value.data, value.data.typecode, len(value.data)
+    if type(value) in (int, bool):
+        return repeat(int(value)), "q", None
+    if type(value) is float:
+        return repeat(value), "d", None
+    raise RuntimeError(f"ndarr: unsupported operand of type {type(value).__name__}")
+
+
+def elementwise(function, left, right, typecode=None):
+    left_items, left_code, left_length = operand(left)
+    right_items, right_code, right_length = operand(right)
+    if left_length is not None and right_length is not None and left_length != right_length:
+        raise RuntimeError(f"ndarr: arrays have different lengths ({left_length} and {right_length})")
+    if typecode is None:
+        typecode = "q" if left_code == right_code == "q" else "d"
+    if typecode == "q":
+        try:
+            return NdArray(array("q", map(function, left_items, right_items)))
+        except TypeError:
+            # An int64 power with a negative exponent produced floats
+            left_items, right_items = operand(left)[0], operand(right)[0]
+        except OverflowError:
+            raise RuntimeError("ndarr: int64 result out of range")
+    return NdArray(array("d", map(function, left_items, right_items)))
+
+
+def as_array(value):
+    if type(value) is not NdArray:
+        raise RuntimeError(f"ndarr: expected an array, got {type(value).__name__}")
+    return value.data
+
+
+# Reductions
+
+def sum_of(values):
+    data = as_array(values)
+    return math.fsum(data) if data.typecode == "d" else sum(data)
+
+
+def mean_of(values):
+    data = as_array(values)
+    if not data:
+        raise RuntimeError("ndarr: mean of an empty array")
+    return sum_of(values) / len(data)
+
+
+def min_of(values):
+    data = as_array(values)
+    if not data:
+        raise RuntimeError("ndarr: min of an empty array")
+    return min(data)
+
+
+def max_of(values):
+    data = as_array(values)
+    if not data:
+        raise RuntimeError("ndarr: max of an empty array")
+    return max(data)
+
+
+def dot(left, right):
+    left_data, right_data = as_array(left), as_array(right)
+    if len(left_data) != len(right_data):
+        raise RuntimeError(f"ndarr: arrays have different lengths ({len(left_data)} and {len(right_data)})")
+    return sum(map(operator.mul, left_data, right_data))
+
+
+def to_list(values):
+    return as_array(values).tolist()
+
+
+def as_type(values, dtype):
+    data = as_array(values)
+    typecode = typecode_for(dtype)
+    if typecode == "q":
+        return NdArray(array("q", map(int, data)))
+    return NdArray(array("d", data))
+
+
+def copy(values):
+    return NdArray(array(as_array(values).typecode, as_array(values)))
+
+
+# Batch versions of the mathex functions
+
+def apply(function):
+    def batch(values):
+        return NdArray(array("d", map(function, as_array(values))))
+    return batch
+
+
+def power(values, exponent):
+    return elementwise(math.pow, values, exponent, "d")
+
+
+METHODS = {
+    "sum": sum_of, "mean": mean_of, "min": min_of, "max": max_of, "dot": dot,
+    "tolist": to_list, "astype": as_type, "copy": copy,
+    "sqrt": apply(math.sqrt), "sin": apply(math.sin), "cos": apply(math.cos),
+    "tan": apply(math.tan), "pow": power,
+}
+
+
+def create_module(interpreter):
+    module = ShravScriptModule("ndarr")
+
+    # Constructors
+    def array_fn(values, dtype=None):
+        typecode = typecode_for(dtype)
+        if type(values) is NdArray:
+            values = values.data
+        elif not isinstance(values, list):
+            raise RuntimeError("ndarr.array() expects a list")
+        try:
+            return NdArray(array(typecode, values))
+        except TypeError:
+            raise RuntimeError(f"ndarr.array(): elements must be numbers of dtype {DTYPES[typecode]}")
+
+    def zeros_fn(length, dtype=None):
+        typecode = typecode_for(dtype)
+        return NdArray(array(typecode, [0]) * int(length))
+
+    def ones_fn(length, dtype=None):
+        typecode = typecode_for(dtype)
+        return NdArray(array(typecode, [1]) * int(length))
+
+    def full_fn(length, value, dtype=None):
+        typecode = typecode_for(dtype)
+        return NdArray(array(typecode, [value]) * int(length))
+
+    def arange_fn(start, end=None, step=1, dtype=None):
+        # arange(n) or arange(start, end[, step]); int64 unless a bound is a float
+        if end is None:
+            start, end = 0, start
+        if dtype is None and all(type(x) is int for x in (start, end, step)):
+            return NdArray(array("q", range(start, end, step)))
+        typecode = typecode_for(dtype)
+        count = max(0, math.ceil((end - start) / step))
+        if typecode == "q":
+            return NdArray(array("q", (int(start + i * step) for i in range(count))))
+        return NdArray(array("d", (start + i * step for i in range(count))))
+
+    def linspace_fn(start, stop, count):
+        # `count` evenly spaced float64 values from start to stop inclusive
+        count = int(count)
+        if count < 2:
+            return NdArray(array("d", [start] * count))
+        step = (stop - start) / (count - 1)
+        return NdArray(array("d", (start + i * step for i in range(count))))
+
+    def random_fn(length):
+        return NdArray(array("d", (random.random() for _ in range(int(length)))))
+
+    module.add_function("array", ShravScriptNativeFunction(2, array_fn))
+    module.add_function("zeros", ShravScriptNativeFunction(2, zeros_fn))
+    module.add_function("ones", ShravScriptNativeFunction(2, ones_fn))
+    module.add_function("full", ShravScriptNativeFunction(3, full_fn))
+    module.add_function("arange", ShravScriptNativeFunction(4, arange_fn))
+    module.add_function("linspace", ShravScriptNativeFunction(3, linspace_fn))
+    module.add_function("random", ShravScriptNativeFunction(1, random_fn))
+
+    # Reductions, conversions and batch math: ndarr.sum(a) or a.sum()
+    for name, function in METHODS.items():
+        module.add_function(name, ShravScriptNativeFunction(function.__code__.co_argcount, function))
+
+    return module
@@ -1,4 +1,3 @@
-import requests
 from environment import ShravScriptModule, ShravScriptNativeFunction
 
 def create_module(interpreter):
@@ -7,6 +6,8 @@ def create_module(interpreter):
     # HTTP GET function
     def get_fn(url):
         try:
+            # requests is slow to import, so defer it until a request is made
+            import requests
             response = requests.get(url)
             return response.text
         except Exception as e:
@@ -15,6 +16,7 @@ def create_module(interpreter):
     # HTTP POST function
     def post_fn(url, body=None):
         try:
+            import requests
             response = requests.post(url, json=body)
             return response.text
         except Exception as e:
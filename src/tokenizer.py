@@ -11,6 +11,9 @@ class TokenType(Enum):
     EOF = auto()
     
 class Token:
+    # Tokens are created in bulk; __slots__ drops the per-instance __dict__
+    __slots__ = ('type', 'value', 'line', 'column')
+    
     def __init__(self, token_type, value, line, column):
         self.type = token_type
         self.value = value
@@ -79,178 +82,113 @@ class Tokenizer:
         '(', ')', '{', '}', '[', ']', ',', ';'
     }
     
+    # Leading horizontal whitespace and a comment are skipped as part of each
+    # match, followed by at most one token. Operators are listed longest first
+    # so that e.g. '**' wins over '*'.
+    TOKEN_PATTERN = re.compile(
+        r'[^\S\n]*(?:#[^\n]*)?(?:' + '|'.join([
+            r'(?P<newline>\n)',
+            r'(?P<name>[^\W\d]\w*)',
+            '(?P<operator>' + '|'.join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True)) + ')',
+            '(?P<delimiter>[' + re.escape(''.join(sorted(DELIMITERS))) + '])',
+            r'(?P<number>\d+(?:\.\d*)?)',
+            r'(?P<string>"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')',
+        ]) + ')?',
+        re.DOTALL
+    )
+    
+    ESCAPE_PATTERN = re.compile(r'\\(.)', re.DOTALL)
+    
     def __init__(self, source_code):
         self.source = source_code
         self.tokens = []
-        self.position = 0
         self.line = 1
-        self.column = 1
-        self.current_char = self.source[0] if self.source else None
-    
-    def advance(self):
-        self.position += 1
-        self.column += 1
-        
-        if self.position >= len(self.source):
-            self.current_char = None
-        else:
-            self.current_char = self.source[self.position]
-            
-            if self.current_char == '\n':
-                self.line += 1
-                self.column = 0
-    
-    def peek(self, offset=1):
-        peek_pos = self.position + offset
-        if peek_pos >= len(self.source):
-            return None
-        return self.source[peek_pos]
+        # Index of the newline that started the current line (-1 on the first line)
+        self.line_start = -1
     
     def tokenize(self):
-        while self.current_char is not None:
-            # Skip whitespace
-            if self.current_char.isspace():
-                self.advance()
-                continue
-            
-            # Skip comments
-            if self.current_char == '#':
-                self.skip_comment()
-                continue
-            
-            # Tokenize strings
-            if self.current_char == '"' or self.current_char == "'":
-                self.tokens.append(self.tokenize_string())
-                continue
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+    
+    def iter_tokens(self):
+        """Lazily yield tokens, ending with an EOF token."""
+        source = self.source
+        match = self.TOKEN_PATTERN.match
+        keywords = self.KEYWORDS
+        end = len(source)
+        line = self.line
+        line_start = self.line_start
+        pos = 0
+        
+        while True:
+            m = match(source, pos)
+            kind = m.lastgroup
             
-            # Tokenize numbers
-            if self.current_char.isdigit():
-                self.tokens.append(self.tokenize_number())
-                continue
+            if kind is None:
+                pos = m.end()
+                if pos >= end:
+                    break
+                
+                column = pos - line_start if line_start >= 0 else pos + 1
+                char = source[pos]
+                if char == '"' or char == "'":
+                    raise SyntaxError(f"Unterminated string at line {line}, column {column}")
+                # If we get here, we have an unrecognized character
+                raise SyntaxError(f"Unrecognized character: '{char}' at line {line}, column {column}")
             
-            # Tokenize identifiers and keywords
-            if self.current_char.isalpha() or self.current_char == '_':
-                self.tokens.append(self.tokenize_identifier())
-                continue
+            start, pos = m.span(kind)
             
-            # Tokenize operators
-            if self.is_operator_start():
-                self.tokens.append(self.tokenize_operator())
+            if kind == 'newline':
+                # A newline at index 0 does not start a new line
+                if start:
+                    line += 1
+                    line_start = start
                 continue
             
-            # Tokenize delimiters
-            if self.current_char in self.DELIMITERS:
-                self.tokens.append(Token(
-                    TokenType.DELIMITER, 
-                    self.current_char,
-                    self.line,
-                    self.column
-                ))
-                self.advance()
-                continue
+            column = start - line_start if line_start >= 0 else start + 1
             
-            # If we get here, we have an unrecognized character
-            raise SyntaxError(f"Unrecognized character: '{self.current_char}' at line {self.line}, column {self.column}")
-        
-        # Add EOF token
-        self.tokens.append(Token(TokenType.EOF, 'EOF', self.line, self.column))
-        return self.tokens
-    
-    def skip_comment(self):
-        while self.current_char is not None and self.current_char != '\n':
-            self.advance()
-    
-    def tokenize_string(self):
-        quote_type = self.current_char
-        start_line, start_column = self.line, self.column
-        self.advance()  # Skip the opening quote
-        
-        string_value = ""
-        while self.current_char is not None and self.current_char != quote_type:
-            if self.current_char == '\\' and self.peek() is not None:
-                self.advance()  # Skip the backslash
-                if self.current_char == 'n':
-                    string_value += '\n'
-                elif self.current_char == 't':
-                    string_value += '\t'
-                elif self.current_char == quote_type:
-                    string_value += quote_type
-                else:
-                    string_value += '\\' + self.current_char
+            if kind == 'name':
+                text = source[start:pos]
+                token_type = TokenType.KEYWORD if text in keywords else TokenType.IDENTIFIER
+                yield Token(token_type, text, line, column)
+            elif kind == 'operator':
+                yield Token(TokenType.OPERATOR, source[start:pos], line, column)
+            elif kind == 'delimiter':
+                yield Token(TokenType.DELIMITER, source[start:pos], line, column)
+            elif kind == 'number':
+                text = source[start:pos]
+                value = float(text) if '.' in text else int(text)
+                yield Token(TokenType.NUMBER, value, line, column)
             else:
-                string_value += self.current_char
-            self.advance()
-        
-        if self.current_char is None:
-            raise SyntaxError(f"Unterminated string at line {start_line}, column {start_column}")
-        
-        self.advance()  # Skip the closing quote
-        return Token(TokenType.STRING, string_value, start_line, start_column)
-    
-    def tokenize_number(self):
-        start_line, start_column = self.line, self.column
-        
-        num_str = ""
-        is_float = False
-        
-        while self.current_char is not None and (self.current_char.isdigit() or self.current_char == '.'):
-            if self.current_char == '.':
-                if is_float:  # Already found a decimal point
-                    break
-                is_float = True
-            num_str += self.current_char
-            self.advance()
+                text = source[start:pos]
+                yield Token(TokenType.STRING, self.decode_string(text), line, column)
+                # Strings may span lines
+                newlines = text.count('\n')
+                if newlines:
+                    line += newlines
+                    line_start = start + text.rfind('\n')
         
-        if is_float:
-            value = float(num_str)
-        else:
-            value = int(num_str)
-        
-        return Token(TokenType.NUMBER, value, start_line, start_column)
-    
-    def tokenize_identifier(self):
-        start_line, start_column = self.line, self.column
-        
-        identifier = ""
-        while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
-            identifier += self.current_char
-            self.advance()
-        
-        # Check if it's a keyword
-        if identifier in self.KEYWORDS:
-            token_type = TokenType.KEYWORD
-        else:
-            token_type = TokenType.IDENTIFIER
+        self.line = line
+        self.line_start = line_start
         
-        return Token(token_type, identifier, start_line, start_column)
-    
-    def is_operator_start(self):
-        for op in self.OPERATORS:
-            if self.source[self.position:self.position + len(op)] == op:
-                # Make sure we're not matching a prefix of a longer operator
-                longer_op = False
-                for long_op in self.OPERATORS:
-                    if len(long_op) > len(op) and long_op.startswith(op) and self.source[self.position:self.position + len(long_op)] == long_op:
-                        longer_op = True
-                        break
-                if not longer_op:
-                    return True
-        return False
+        # Add EOF token
+        column = end - line_start if line_start >= 0 else end + 1
+        yield Token(TokenType.EOF, 'EOF', line, column)
     
-    def tokenize_operator(self):
-        start_line, start_column = self.line, self.column
-        
-        # Find the longest matching operator
-        matched_op = None
-        for op in sorted(self.OPERATORS, key=len, reverse=True):
-            if self.position + len(op) <= len(self.source) and self.source[self.position:self.position + len(op)] == op:
-                matched_op = op
-                break
-        
-        if matched_op:
-            for _ in range(len(matched_op)):
-                self.advance()
-            return Token(TokenType.OPERATOR, matched_op, start_line, start_column)
-        
-        # If we get here, there's an error
-        raise SyntaxError(f"Unrecognized operator at line {start_line}, column {start_column}") 
\ No newline at end of file
+    def decode_string(self, text):
+        quote_type = text[0]
+        body = text[1:-1]
+        if '\\' not in body:
+            return body
+        
+        def replace_escape(match):
+            char = match.group(1)
+            if char == 'n':
+                return '\n'
+            elif char == 't':
+                return '\t'
+            elif char == quote_type:
+                return quote_type
+            return '\\' + char
+        
+        return self.ESCAPE_PATTERN.sub(replace_escape, body)
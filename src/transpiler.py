@@ -0,0 +1,377 @@
+import math
+import parser as parser_module
+from environment import ShravScriptFunction, ShravScriptModule, TailCall
+from library import add
+
+# Marks a declaration whose body cannot be transpiled
+UNSUPPORTED = object()
+
+# Python spelling of the binary operators that map directly onto Python's
+DIRECT_OPERATORS = {
+    '-': '-', '*': '*', '/': '/', '%': '%', '**': '**',
+    '==': '==', '!=': '!=', '<': '<', '>': '>', '<=': '<=', '>=': '>=',
+}
+
+# Operators whose result is always a Python bool
+BOOLEAN_OPERATORS = frozenset(['==', '!=', '<', '>', '<=', '>=', 'and', 'or'])
+
+
+class Unsupported(Exception):
+    """Raised for constructs the transpiler does not translate."""
+
+
+class Transpiler:
+    """
+    Translates the body of a resolved function into Python source.
+
+    Only functions that use literals, parameters and locals, globals,
+    arithmetic, comparisons, logical operators, if/while/for, break,
+    continue, return, indexing and plain calls are supported. Anything else
+    (closures, printing, classes, try/with, method calls, ...) raises
+    Unsupported and the function keeps running on the interpreter.
+
+    Locals become Python locals named after the scope that declares them,
+    so shadowing in nested blocks is preserved. A local that could be read
+    before its `let` has run (where the interpreter falls back to a
+    dynamic lookup) is also rejected.
+
+    Calls to script functions in tail position are returned as TailCall
+    objects for ShravScriptFunction's trampoline to make. A function that
+    returns a call to itself outside of loops gets its body wrapped in
+    `while True:` instead, and such a call rebinds the parameters and
+    starts the next iteration.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        # Enclosing frames of the function, innermost last: (scope id, FrameLayout)
+        self.scopes = []
+        self.scope_count = 0
+        # Python names of the locals declared so far, in source order
+        self.declared = set()
+        self.lines = []
+        self.temporaries = 0
+        # Loops enclosing the current statement; self tail calls inside them
+        # are left to the trampoline, since `continue` would resume the loop
+        self.loop_depth = 0
+        # Python names of the parameters, for tail calls to rebind
+        self.parameters = []
+
+    def transpile(self):
+        function = self.function
+        parameters = []
+        if function.layout is not None:
+            scope_id = self.push_scope(function.layout)
+            for param in function.params:
+                name = self.local_name(scope_id, param)
+                self.declared.add(name)
+                self.parameters.append(name)
+                parameters.append(f"{name}=None")
+        elif function.params:
+            raise Unsupported("parameters without a frame")
+        parameters.append("*_")
+
+        self.emit(0, "def make(G, _add, _call, _tail, _index, _undefined, _assign_global, _truthy):")
+        self.emit(1, f"def {self.python_name(function)}({', '.join(parameters)}):")
+        indent = 2
+        if self.calls_itself_in_tail_position(function.body):
+            self.emit(2, "while True:")
+            indent = 3
+        self.transpile_block(function.body, indent)
+        self.emit(indent, "return None")
+        self.emit(1, f"return {self.python_name(function)}")
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def is_self_tail_call(self, stmt):
+        call = stmt.value
+        return (stmt.tail_call and type(call.func) == parser_module.Identifier
+                and call.func.name == getattr(self.function, "name", None))
+
+    def calls_itself_in_tail_position(self, statements):
+        # Looks through if/elif/else but not loops, where the call stays a call
+        for stmt in statements:
+            stmt_type = type(stmt)
+            if stmt_type == parser_module.Return and self.is_self_tail_call(stmt):
+                return True
+            if stmt_type == parser_module.IfStatement:
+                bodies = [stmt.if_body] + stmt.elif_bodies
+                if stmt.else_body is not None:
+                    bodies.append(stmt.else_body)
+                if any(self.calls_itself_in_tail_position(body) for body in bodies):
+                    return True
+        return False
+
+    def python_name(self, function):
+        return "shrav_" + getattr(function, "name", "lambda")
+
+    def push_scope(self, layout):
+        scope_id = self.scope_count
+        self.scope_count += 1
+        self.scopes.append((scope_id, layout))
+        return scope_id
+
+    def local_name(self, scope_id, name):
+        return f"v{scope_id}_{name}"
+
+    def resolve(self, node, name):
+        # Python name of a resolved local, or None for a global
+        if node.slot is None:
+            return None
+        if node.depth >= len(self.scopes):
+            raise Unsupported(f"'{name}' is captured from an enclosing function")
+        scope_id, _ = self.scopes[-1 - node.depth]
+        return self.local_name(scope_id, name)
+
+    # Statements
+
+    def transpile_block(self, statements, indent, layout=None):
+        pushed = layout is not None
+        if pushed:
+            self.push_scope(layout)
+
+        for stmt in statements:
+            self.transpile_statement(stmt, indent)
+        if not statements:
+            self.emit(indent, "pass")
+
+        if pushed:
+            self.scopes.pop()
+
+    def transpile_statement(self, stmt, indent):
+        stmt_type = type(stmt)
+
+        if stmt_type == parser_module.VariableDeclaration:
+            value = self.expression(stmt.value) if stmt.value is not None else "None"
+            scope_id, _ = self.scopes[-1]
+            name = self.local_name(scope_id, stmt.name)
+            self.emit(indent, f"{name} = {value}")
+            self.declared.add(name)
+        elif stmt_type == parser_module.Return:
+            if stmt.tail_call:
+                if self.loop_depth == 0 and self.is_self_tail_call(stmt):
+                    self.self_tail_call(stmt.value, indent)
+                else:
+                    callee, arguments = self.call_parts(stmt.value)
+                    self.emit(indent, f"return _tail({callee}, [{arguments}])")
+                return
+            value = self.expression(stmt.value) if stmt.value is not None else "None"
+            self.emit(indent, f"return {value}")
+        elif stmt_type == parser_module.IfStatement:
+            self.emit(indent, f"if {self.condition(stmt.condition)}:")
+            self.transpile_block(stmt.if_body, indent + 1, stmt.if_layout)
+            for condition, body, layout in zip(stmt.elif_conditions, stmt.elif_bodies, stmt.elif_layouts):
+                self.emit(indent, f"elif {self.condition(condition)}:")
+                self.transpile_block(body, indent + 1, layout)
+            if stmt.else_body is not None:
+                self.emit(indent, "else:")
+                self.transpile_block(stmt.else_body, indent + 1, stmt.else_layout)
+        elif stmt_type == parser_module.WhileLoop:
+            self.emit(indent, f"while {self.condition(stmt.condition)}:")
+            self.loop_depth += 1
+            self.transpile_block(stmt.body, indent + 1, stmt.body_layout)
+            self.loop_depth -= 1
+        elif stmt_type == parser_module.ForLoop:
+            start = self.expression(stmt.range_start)
+            end = self.expression(stmt.range_end)
+            scope_id = self.push_scope(stmt.body_layout)
+            variable = self.local_name(scope_id, stmt.var_name)
+            self.declared.add(variable)
+            self.emit(indent, f"for {variable} in range(int({start}), int({end})):")
+            # The loop frame was pushed above so the variable is in scope
+            self.loop_depth += 1
+            self.transpile_block(stmt.body, indent + 1)
+            self.loop_depth -= 1
+            self.scopes.pop()
+        elif stmt_type == parser_module.BreakStatement:
+            self.emit(indent, "break")
+        elif stmt_type == parser_module.ContinueStatement:
+            self.emit(indent, "continue")
+        elif stmt_type in (parser_module.Assignment, parser_module.BinaryOp, parser_module.UnaryOp,
+                           parser_module.FunctionCall, parser_module.Identifier,
+                           parser_module.Literal, parser_module.IndexAccess):
+            self.emit(indent, self.expression(stmt))
+        else:
+            raise Unsupported(type(stmt).__name__)
+
+    def self_tail_call(self, call, indent):
+        # `return f(...)` inside f: if the name still refers to this
+        # function, rebind the parameters and loop; otherwise hand it over
+        callee, arguments = self.temporary(), self.temporary()
+        callee_code, arguments_code = self.call_parts(call)
+        self.emit(indent, f"{callee} = {callee_code}")
+        self.emit(indent, f"{arguments} = [{arguments_code}]")
+        self.emit(indent, f"if type({callee}) is _Function and {callee}.declaration is _declaration:")
+        if self.parameters:
+            values = [f"{arguments}[{i}]" if i < len(call.args) else "None"
+                      for i in range(len(self.parameters))]
+            self.emit(indent + 1, f"{', '.join(self.parameters)} = {', '.join(values)}")
+        self.emit(indent + 1, "continue")
+        self.emit(indent, f"return _tail({callee}, {arguments})")
+
+    def call_parts(self, call):
+        # Python code for the callee and the comma-separated arguments
+        return self.expression(call.func), ", ".join(self.expression(arg) for arg in call.args)
+
+    # Expressions
+
+    def expression(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == parser_module.Literal:
+            value = expr.value
+            if not isinstance(value, (int, float, str, bool, type(None))):
+                raise Unsupported("literal")
+            if type(value) is float and not math.isfinite(value):
+                # repr() gives the undefined names inf and nan
+                if math.isnan(value):
+                    return "_nan"
+                return "_inf" if value > 0 else "(-_inf)"
+            return repr(value)
+        elif expr_type == parser_module.Identifier:
+            return self.lookup(expr)
+        elif expr_type == parser_module.Assignment:
+            return self.assignment(expr)
+        elif expr_type == parser_module.BinaryOp:
+            if expr.operator == 'and':
+                # Both operands are evaluated, as in Interpreter.evaluate_binary
+                return f"({self.condition(expr.left)} & {self.condition(expr.right)})"
+            elif expr.operator == 'or':
+                return f"({self.condition(expr.left)} | {self.condition(expr.right)})"
+            left = self.expression(expr.left)
+            right = self.expression(expr.right)
+            if expr.operator == '+':
+                return self.addition(expr, left, right)
+            elif expr.operator in DIRECT_OPERATORS:
+                return f"({left} {DIRECT_OPERATORS[expr.operator]} {right})"
+        elif expr_type == parser_module.UnaryOp:
+            if expr.operator == '-':
+                return f"(-{self.expression(expr.operand)})"
+            elif expr.operator == 'not':
+                return f"(not {self.condition(expr.operand)})"
+        elif expr_type == parser_module.FunctionCall:
+            if isinstance(expr.func, parser_module.PropertyAccess):
+                raise Unsupported("method call")
+            callee, arguments = self.call_parts(expr)
+            return f"_call({callee}, [{arguments}])"
+        elif expr_type == parser_module.IndexAccess:
+            return f"_index({self.expression(expr.obj)}, {self.expression(expr.index)})"
+        raise Unsupported(expr_type.__name__)
+
+    def condition(self, expr):
+        # Python code for is_truthy(expr) as a bool. Python's own truthiness
+        # differs for values such as ndarr arrays (empty ones are truthy in
+        # ShravScript), so only results known to be bools skip _truthy
+        code = self.expression(expr)
+        expr_type = type(expr)
+        if expr_type == parser_module.BinaryOp and expr.operator in BOOLEAN_OPERATORS:
+            return code
+        if expr_type == parser_module.UnaryOp and expr.operator == 'not':
+            return code
+        if expr_type == parser_module.Literal and type(expr.value) is bool:
+            return code
+        return f"_truthy({code})"
+
+    def temporary(self):
+        self.temporaries += 1
+        return f"_t{self.temporaries}"
+
+    def addition(self, expr, left, right):
+        # '+' concatenates as soon as either side is a string; the common
+        # numeric case is inlined with a type check instead of calling _add
+        if type(expr.right) == parser_module.Literal:
+            if isinstance(expr.right.value, str):
+                return f"(str({left}) + {right})"
+            value = self.temporary()
+            return f"({value} + {right} if type({value} := {left}) is not str else _add({value}, {right}))"
+
+        first, second = self.temporary(), self.temporary()
+        # '&' rather than 'and' so both operands are always evaluated, in order
+        return (f"({first} + {second} if (type({first} := {left}) is not str) & "
+                f"(type({second} := {right}) is not str) else _add({first}, {second}))")
+
+    def lookup(self, expr):
+        name = self.resolve(expr, expr.name)
+        if name is None:
+            key = repr(expr.name)
+            return f"(G[{key}] if {key} in G else _undefined({key}))"
+        if name not in self.declared:
+            raise Unsupported(f"'{expr.name}' may be read before it is declared")
+        return name
+
+    def assignment(self, expr):
+        target = expr.target
+        if not isinstance(target, parser_module.Identifier):
+            raise Unsupported("assignment to a property or index")
+
+        value = self.expression(expr.value)
+        name = self.resolve(expr, target.name)
+        if name is None:
+            return f"_assign_global({target.name!r}, {value})"
+        if name not in self.declared:
+            raise Unsupported(f"'{target.name}' may be assigned before it is declared")
+        return f"({name} := {value})"
+
+
+def undefined(name):
+    raise NameError(f"Undefined variable '{name}'")
+
+
+def compile_declaration(declaration):
+    # Returns the factory building the Python function, or UNSUPPORTED
+    try:
+        source = Transpiler(declaration).transpile()
+    except Unsupported:
+        return UNSUPPORTED
+
+    name = getattr(declaration, "name", "lambda")
+    # Self tail calls compare the callee against the function being run
+    namespace = {"_Function": ShravScriptFunction, "_declaration": declaration,
+                 "_inf": math.inf, "_nan": math.nan}
+    exec(compile(source, f"<shravscript function {name}>", "exec"), namespace)
+    return namespace["make"]
+
+
+def tier_up(function, interpreter):
+    """
+    Return a Python function running ``function`` natively for
+    ``interpreter``, or None when its body cannot be transpiled.
+    """
+    declaration = function.declaration
+    if function.is_initializer:
+        return None
+
+    factory = declaration.native_factory
+    if factory is None:
+        factory = declaration.native_factory = compile_declaration(declaration)
+    if factory is UNSUPPORTED:
+        return None
+
+    globals_environment = function.closure.globals
+
+    def call(callee, arguments):
+        if type(callee) is ShravScriptFunction and callee.native:
+            value = callee.native(*arguments)
+            if type(value) is TailCall:
+                # Finish the chain of tail calls on the function's trampoline
+                return value.function(interpreter, value.arguments)
+            return value
+        if isinstance(callee, ShravScriptModule):
+            raise RuntimeError("Cannot call a module directly. Use module.function() instead.")
+        if not callable(callee):
+            raise RuntimeError(f"Can only call functions and classes, got {type(callee).__name__}")
+        return callee(interpreter, arguments)
+
+    def tail(callee, arguments):
+        if type(callee) is ShravScriptFunction:
+            return TailCall(callee, arguments)
+        return call(callee, arguments)
+
+    def assign_global(name, value):
+        globals_environment.assign(name, value)
+        return value
+
+    return factory(globals_environment.values, add, call, tail, interpreter.get_index, undefined, assign_global,
+                   interpreter.is_truthy)
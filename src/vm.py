@@ -0,0 +1,484 @@
+from compiler import (
+    Compiler, LOAD_CONST, LOAD_NAME, STORE_NAME, DEFINE_NAME, POP_TOP, BINARY_OP,
+    UNARY_NEG, UNARY_NOT, JUMP, POP_JUMP_IF_FALSE, CALL, RETURN_VALUE, GET_INDEX,
+    SET_INDEX, GET_ATTR, SET_ATTR, BUILD_LIST, BUILD_DICT, MAKE_FUNCTION, MAKE_CLASS,
+    PUSH_SCOPE, POP_SCOPE, FOR_RANGE, FOR_ITER, SETUP_TRY, POP_BLOCK, SETUP_WITH,
+    EXIT_WITH, IMPORT, PRINT, COPY_CONST, LOAD_METHOD, CALL_METHOD, INTERPOLATE, BUILD_STRING,
+    TAIL_CALL, GET_ITER, YIELD_VALUE, BINARY_OPERATORS,
+)
+from environment import (
+    Environment, ShravScriptBoundMethod, ShravScriptClass, ShravScriptInstance, ShravScriptModule,
+)
+from interpreter import Interpreter
+from library import add, find_method
+import operator
+
+_EXHAUSTED = object()
+
+
+class CompiledFunction:
+    def __init__(self, code, closure):
+        self.code = code
+        self.closure = closure
+
+    def __call__(self, interpreter, arguments):
+        return interpreter.call_compiled(self, arguments)
+
+    def call_method(self, interpreter, receiver, arguments):
+        # Methods are compiled with `this` as their first parameter
+        return interpreter.call_compiled(self, [receiver] + arguments)
+
+    def bind(self, instance):
+        return ShravScriptBoundMethod(self, instance)
+
+    def __str__(self):
+        return f"<fn {self.code.name}>"
+
+
+class CompiledGeneratorFunction(CompiledFunction):
+    """A compiled function containing `yield`; calls return a CompiledGenerator."""
+
+    def __call__(self, interpreter, arguments):
+        return CompiledGenerator(interpreter, self.code, interpreter.call_environment(self, arguments))
+
+    def call_method(self, interpreter, receiver, arguments):
+        return self(interpreter, [receiver] + arguments)
+
+
+class CompiledGenerator:
+    """
+    A suspended run of a generator's code object.
+
+    Each step resumes run_code with the program counter, value stack,
+    blocks and scope saved by the last YIELD_VALUE.
+    """
+
+    __slots__ = ('vm', 'code', 'environment', 'pc', 'stack', 'blocks', 'finished')
+
+    def __init__(self, vm, code, environment):
+        self.vm = vm
+        self.code = code
+        self.environment = environment
+        self.pc = 0
+        self.stack = []
+        self.blocks = []
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.finished:
+            raise StopIteration
+        vm = self.vm
+        vm.enter_call()
+        try:
+            value = vm.run_code(self.code, self.environment, self)
+        except Exception:
+            self.finished = True
+            raise
+        finally:
+            vm.call_depth -= 1
+        if self.finished:
+            raise StopIteration
+        return value
+
+    def __str__(self):
+        return "<generator>"
+
+
+# Pushed by LOAD_METHOD in place of the receiver when the callee is not a method
+NO_RECEIVER = object()
+
+
+# ShravScript calls that may be active at once before the VM gives up
+DEFAULT_MAX_CALL_DEPTH = 100000
+
+
+class VM(Interpreter):
+    """
+    Runs programs compiled to bytecode by compiler.Compiler on a stack machine.
+
+    Calls from bytecode to compiled functions do not recurse on the Python
+    stack: run_code saves the caller's state on a list of frames and keeps
+    looping in the callee, so the depth of ShravScript recursion is limited
+    only by ``max_call_depth``. Calls made from Python code (constructors
+    running init, list.map callbacks, native functions) still start a
+    nested run_code.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.max_call_depth = DEFAULT_MAX_CALL_DEPTH
+        # Compiled function calls currently active, across nested run_code loops
+        self.call_depth = 0
+
+        is_truthy = self.is_truthy
+        operations = {
+            '+': add,
+            '-': operator.sub,
+            '*': operator.mul,
+            '/': operator.truediv,
+            '%': operator.mod,
+            '**': operator.pow,
+            '==': operator.eq,
+            '!=': operator.ne,
+            '<': operator.lt,
+            '>': operator.gt,
+            '<=': operator.le,
+            '>=': operator.ge,
+            'and': lambda left, right: is_truthy(left) and is_truthy(right),
+            'or': lambda left, right: is_truthy(left) or is_truthy(right),
+        }
+        self.binary_operations = tuple(operations[op] for op in BINARY_OPERATORS)
+
+    def run_program(self, program):
+        try:
+            code = Compiler().compile(program)
+        except RecursionError:
+            raise self.nested_too_deeply() from None
+        self.run_code(code, self.globals)
+        return None
+
+    def call_compiled(self, function, arguments):
+        self.enter_call()
+        try:
+            return self.run_code(function.code, self.call_environment(function, arguments))
+        finally:
+            self.call_depth -= 1
+
+    def call_environment(self, function, arguments):
+        environment = Environment(function.closure)
+
+        for i, param in enumerate(function.code.params):
+            if i < len(arguments):
+                environment.define(param, arguments[i])
+            else:
+                environment.define(param, None)  # Default parameter value
+
+        return environment
+
+    def module_interpreter(self):
+        interpreter = super().module_interpreter()
+        interpreter.max_call_depth = self.max_call_depth
+        return interpreter
+
+    def recursion_limit_message(self):
+        # Only reachable through nested native callbacks (map, sort keys, ...)
+        return "Maximum call depth exceeded"
+
+    def enter_call(self):
+        if self.call_depth >= self.max_call_depth:
+            raise RuntimeError(f"Maximum call depth of {self.max_call_depth} exceeded")
+        self.call_depth += 1
+
+    def run_code(self, code_object, environment, generator=None):
+        # `generator` is the CompiledGenerator being resumed, if any
+        code = code_object.code
+        constants = code_object.constants
+        names = code_object.names
+        binary_operations = self.binary_operations
+        is_truthy = self.is_truthy
+
+        # One value stack is shared by all frames; `base` is where the
+        # current frame's values start
+        stack = []
+        # Active try/with blocks: (opcode, handler or resource, stack depth, environment)
+        blocks = []
+        env = environment
+        pc = 0
+        if generator is not None:
+            # Continue after the YIELD_VALUE that suspended the generator
+            stack = generator.stack
+            blocks = generator.blocks
+            env = generator.environment
+            pc = generator.pc
+        push = stack.append
+        pop = stack.pop
+        base = 0
+        # Suspended callers: (code object, pc, env, blocks, base)
+        frames = []
+
+        while True:
+            try:
+                while True:
+                    op = code[pc]
+                    arg = code[pc + 1]
+                    pc += 2
+
+                    if op == LOAD_NAME:
+                        name = names[arg]
+                        scope = env
+                        while scope is not None:
+                            values = scope.values
+                            if name in values:
+                                push(values[name])
+                                break
+                            scope = scope.enclosing
+                        else:
+                            raise NameError(f"Undefined variable '{name}'")
+                    elif op == LOAD_CONST:
+                        push(constants[arg])
+                    elif op == BINARY_OP:
+                        right = pop()
+                        stack[-1] = binary_operations[arg](stack[-1], right)
+                    elif op == STORE_NAME:
+                        env.assign(names[arg], stack[-1])
+                    elif op == POP_JUMP_IF_FALSE:
+                        value = pop()
+                        if value is not True and (value is False or not is_truthy(value)):
+                            pc = arg
+                    elif op == JUMP:
+                        pc = arg
+                    elif op == CALL:
+                        if arg:
+                            arguments = stack[-arg:]
+                            del stack[-arg:]
+                        else:
+                            arguments = []
+                        callee = pop()
+
+                        if type(callee) is CompiledFunction:
+                            # Switch to the callee without recursing in Python
+                            self.enter_call()
+                            frames.append((code_object, pc, env, blocks, base))
+                            env = self.call_environment(callee, arguments)
+                            code_object = callee.code
+                            code = code_object.code
+                            constants = code_object.constants
+                            names = code_object.names
+                            blocks = []
+                            base = len(stack)
+                            pc = 0
+                        elif isinstance(callee, ShravScriptModule):
+                            raise RuntimeError("Cannot call a module directly. Use module.function() instead.")
+                        elif not callable(callee):
+                            raise RuntimeError(f"Can only call functions and classes, got {type(callee).__name__}")
+                        else:
+                            push(callee(self, arguments))
+                    elif op == LOAD_METHOD:
+                        site = constants[arg]
+                        obj = stack[-1]
+                        name = site.func.prop
+                        if type(obj) is ShravScriptInstance and name not in obj.shape.index:
+                            klass = obj.klass
+                            if site.cached_class is klass:
+                                stack[-1] = site.cached_method
+                            else:
+                                stack[-1] = self.cache_method(site, klass, name)
+                            push(obj)
+                        else:
+                            # Native collection methods take the object as their receiver
+                            method = find_method(obj, name)
+                            if method is not None:
+                                stack[-1] = method
+                                push(obj)
+                            else:
+                                stack[-1] = self.get_property(obj, name)
+                                push(NO_RECEIVER)
+                    elif op == CALL_METHOD:
+                        if arg:
+                            arguments = stack[-arg:]
+                            del stack[-arg:]
+                        else:
+                            arguments = []
+                        receiver = pop()
+                        callee = pop()
+
+                        if type(callee) is CompiledFunction and receiver is not NO_RECEIVER:
+                            # Method: the receiver is the first parameter
+                            self.enter_call()
+                            frames.append((code_object, pc, env, blocks, base))
+                            env = self.call_environment(callee, [receiver] + arguments)
+                            code_object = callee.code
+                            code = code_object.code
+                            constants = code_object.constants
+                            names = code_object.names
+                            blocks = []
+                            base = len(stack)
+                            pc = 0
+                        elif receiver is not NO_RECEIVER:
+                            push(callee.call_method(self, receiver, arguments))
+                        elif type(callee) is CompiledFunction:
+                            push(self.call_compiled(callee, arguments))
+                        else:
+                            push(self.call_value(callee, arguments))
+                    elif op == POP_TOP:
+                        pop()
+                    elif op == DEFINE_NAME:
+                        env.values[names[arg]] = pop()
+                    elif op == PUSH_SCOPE:
+                        env = Environment(env)
+                    elif op == POP_SCOPE:
+                        env = env.enclosing
+                    elif op == FOR_ITER:
+                        value = next(stack[-1], _EXHAUSTED)
+                        if value is _EXHAUSTED:
+                            pop()
+                            pc = arg
+                        else:
+                            push(value)
+                    elif op == RETURN_VALUE:
+                        for block in reversed(blocks):
+                            if block[0] == SETUP_WITH:
+                                self.close_resource(block[1])
+                        value = pop()
+                        if not frames:
+                            if generator is not None:
+                                generator.finished = True
+                            return value
+                        # Resume the caller; loop iterators may be left above base
+                        del stack[base:]
+                        code_object, pc, env, blocks, base = frames.pop()
+                        code = code_object.code
+                        constants = code_object.constants
+                        names = code_object.names
+                        self.call_depth -= 1
+                        push(value)
+                    elif op == GET_INDEX:
+                        index = pop()
+                        stack[-1] = self.get_index(stack[-1], index)
+                    elif op == SET_INDEX:
+                        index = pop()
+                        obj = pop()
+                        obj[index] = stack[-1]
+                    elif op == GET_ATTR:
+                        site = constants[arg]
+                        obj = stack[-1]
+                        if type(obj) is ShravScriptInstance:
+                            if obj.shape is site.cached_shape:
+                                stack[-1] = obj.values[site.cached_slot]
+                            else:
+                                stack[-1] = self.get_instance_property(site, obj)
+                        else:
+                            stack[-1] = self.get_property(obj, site.prop)
+                    elif op == SET_ATTR:
+                        obj = pop()
+                        self.set_property(obj, names[arg], stack[-1])
+                    elif op == UNARY_NEG:
+                        stack[-1] = -stack[-1]
+                    elif op == UNARY_NOT:
+                        stack[-1] = not is_truthy(stack[-1])
+                    elif op == BUILD_LIST:
+                        if arg:
+                            elements = stack[-arg:]
+                            del stack[-arg:]
+                        else:
+                            elements = []
+                        push(elements)
+                    elif op == COPY_CONST:
+                        push(constants[arg].copy())
+                    elif op == BUILD_DICT:
+                        keys = constants[arg]
+                        if keys:
+                            values = stack[-len(keys):]
+                            del stack[-len(keys):]
+                        else:
+                            values = []
+                        push(dict(zip(keys, values)))
+                    elif op == GET_ITER:
+                        stack[-1] = self.iterate(stack[-1])
+                    elif op == YIELD_VALUE:
+                        # Generator code runs in its own run_code, so no caller
+                        # frames are active here
+                        generator.pc = pc
+                        generator.environment = env
+                        return pop()
+                    elif op == FOR_RANGE:
+                        range_end = int(pop())
+                        range_start = int(pop())
+                        push(iter(range(range_start, range_end)))
+                    elif op == PRINT:
+                        print(self.stringify(pop()))
+                    elif op == INTERPOLATE:
+                        # Like LOAD_NAME, but pushes text; unknown names stay as written
+                        name = names[arg]
+                        scope = env
+                        while scope is not None:
+                            values = scope.values
+                            if name in values:
+                                push(str(values[name]))
+                                break
+                            scope = scope.enclosing
+                        else:
+                            push("${" + name + "}")
+                    elif op == BUILD_STRING:
+                        pieces = stack[-arg:]
+                        del stack[-arg:]
+                        push("".join(pieces))
+                    elif op == MAKE_FUNCTION:
+                        function_code = constants[arg]
+                        if function_code.is_generator:
+                            push(CompiledGeneratorFunction(function_code, env))
+                        else:
+                            push(CompiledFunction(function_code, env))
+                    elif op == MAKE_CLASS:
+                        class_name, method_count = constants[arg]
+                        methods = {}
+                        if method_count:
+                            for method in stack[-method_count:]:
+                                methods[method.code.name] = method
+                            del stack[-method_count:]
+                        push(ShravScriptClass(class_name, methods))
+                    elif op == SETUP_TRY:
+                        blocks.append((SETUP_TRY, arg, len(stack), env))
+                    elif op == POP_BLOCK:
+                        blocks.pop()
+                    elif op == SETUP_WITH:
+                        blocks.append((SETUP_WITH, stack[-1], len(stack) - 1, env))
+                    elif op == EXIT_WITH:
+                        self.close_resource(blocks.pop()[1])
+                    elif op == TAIL_CALL:
+                        if arg:
+                            arguments = stack[-arg:]
+                            del stack[-arg:]
+                        else:
+                            arguments = []
+                        callee = pop()
+
+                        if type(callee) is CompiledFunction and not blocks:
+                            # Run the callee in place of the current function:
+                            # no frame is saved and the call depth stays the same
+                            del stack[base:]
+                            env = self.call_environment(callee, arguments)
+                            code_object = callee.code
+                            code = code_object.code
+                            constants = code_object.constants
+                            names = code_object.names
+                            pc = 0
+                        else:
+                            push(self.call_value(callee, arguments))
+                    elif op == IMPORT:
+                        module_name = names[arg]
+                        env.define(module_name, self.import_module(module_name))
+                    else:
+                        raise RuntimeError(f"Unknown opcode {op}")
+            except Exception as error:
+                # Unwind to the innermost try block, closing with-resources on
+                # the way and leaving callers' frames until one catches it
+                while True:
+                    while blocks:
+                        kind, target, depth, block_env = blocks.pop()
+                        del stack[depth:]
+                        env = block_env
+                        if kind == SETUP_WITH:
+                            self.close_resource(target)
+                        else:
+                            push(str(error))
+                            pc = target
+                            break
+                    else:
+                        if not frames:
+                            raise
+                        del stack[base:]
+                        code_object, pc, env, blocks, base = frames.pop()
+                        code = code_object.code
+                        constants = code_object.constants
+                        names = code_object.names
+                        self.call_depth -= 1
+                        continue
+                    break
+
+    def close_resource(self, resource):
+        if hasattr(resource, 'close') and callable(resource.close):
+            resource.close()
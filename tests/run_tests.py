@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""Run every tests/test_*.py module: python tests/run_tests.py"""
+import os
+import sys
+import unittest
+
+
+def main():
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    suite = unittest.defaultTestLoader.discover(tests_dir, pattern="test_*.py", top_level_dir=tests_dir)
+    result = unittest.TextTestRunner(verbosity=1).run(suite)
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
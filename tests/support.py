@@ -0,0 +1,43 @@
+"""Helpers shared by the test modules: run scripts through src/main.py."""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+MAIN = os.path.join(SRC_DIR, "main.py")
+
+# Command line flags selecting each execution engine
+ENGINES = {"tree": [], "vm": ["--vm"], "closures": ["--closures"]}
+
+
+def run_script(path, *flags):
+    """Run a script file with the given main.py flags and return its stdout."""
+    result = subprocess.run(
+        [sys.executable, MAIN, *flags, path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=os.path.dirname(path),
+    )
+    return result.stdout
+
+
+class ScriptTestCase(unittest.TestCase):
+    """A test case whose scripts (and their __shravcache__) live in a fresh temporary directory."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, source):
+        """Write a script into the test's directory and return its path."""
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(source)
+        return path
+
+    def assert_prints(self, source, lines, *flags):
+        """Run source on every engine (plus the given flags) and compare the lines it prints."""
+        path = self.write("script.shs", source)
+        for engine, engine_flags in ENGINES.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(run_script(path, *engine_flags, *flags).splitlines(), lines)
@@ -0,0 +1,23 @@
+import json
+import os
+import unittest
+
+from support import ScriptTestCase, run_script
+
+
+class BenchTest(ScriptTestCase):
+    def test_failing_benchmark_is_recorded_and_others_still_run(self):
+        broken = self.write("broken.shs", "print([1][5])\n")
+        working = self.write("working.shs", "let total = 0\nfor i in 0 .. 10 { total = total + i }\n")
+        output = os.path.join(os.path.dirname(broken), "results.json")
+        run_script(working, "bench", "--warmup", "0", "--repeat", "1", "--output", output, broken)
+
+        with open(output, encoding="utf-8") as file:
+            results = json.load(file)["benchmarks"]
+        self.assertEqual(results["broken"], {"failed": True, "error": "Runtime Error: list index out of range"})
+        self.assertNotIn("failed", results["working"])
+        self.assertEqual(results["working"]["execute"]["runs"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
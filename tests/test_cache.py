@@ -0,0 +1,66 @@
+import os
+import pickle
+import sys
+import unittest
+
+from support import SRC_DIR, ScriptTestCase, run_script
+
+sys.path.insert(0, SRC_DIR)
+
+import cache  # noqa: E402
+from environment import UNSET, Frame, FrameLayout  # noqa: E402
+
+# Reads `x` before the function's own `let x`, which must fall back to the global
+SHADOWED_READ = """
+let x = "outer"
+fn f() {
+    print(x)
+    let x = "inner"
+    print(x)
+}
+f()
+for i in 0 .. 3 {
+    let total = i * 2
+    print(total)
+}
+"""
+
+
+class CacheRoundTripTest(ScriptTestCase):
+    def cached_script(self):
+        # Padded past MIN_CACHED_SIZE so the second run loads the pickled tree
+        padding = "# padding\n" * (cache.MIN_CACHED_SIZE // 10 + 1)
+        return self.write("shadow.shs", SHADOWED_READ + padding)
+
+    def test_cached_run_matches_first_run(self):
+        path = self.cached_script()
+        first = run_script(path)
+        self.assertTrue(os.path.exists(cache.cache_path(path)))
+        second = run_script(path)
+        self.assertEqual(first, "outer\ninner\n0\n2\n4\n")
+        self.assertEqual(second, first)
+        self.assertEqual(run_script(path, "--no-cache"), first)
+
+    def test_cached_optimized_run_matches_first_run(self):
+        path = self.cached_script()
+        first = run_script(path, "-O")
+        self.assertTrue(os.path.exists(cache.cache_path(path, optimized=True)))
+        self.assertEqual(run_script(path, "-O"), first)
+        self.assertEqual(first, "outer\ninner\n0\n2\n4\n")
+
+    def test_unset_survives_pickling(self):
+        self.assertIs(pickle.loads(pickle.dumps(UNSET, pickle.HIGHEST_PROTOCOL)), UNSET)
+        layout = pickle.loads(pickle.dumps(FrameLayout(["a", "b"]), pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(all(value is UNSET for value in layout.blank))
+
+    def test_unpickled_layout_falls_back_to_enclosing_binding(self):
+        from environment import Environment
+        globals_env = Environment()
+        globals_env.define("a", 1)
+        layout = pickle.loads(pickle.dumps(FrameLayout(["a"]), pickle.HIGHEST_PROTOCOL))
+        frame = Frame(layout, globals_env)
+        self.assertEqual(frame.get_at(0, 0, "a"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from support import ScriptTestCase
+
+SHAPES = """
+class Circle {
+    fn init(r) { this.r = r }
+    fn area() { return 3 * this.r * this.r }
+    fn describe() { return "circle " + this.area() }
+}
+class Square {
+    fn init(side) { this.side = side }
+    fn area() { return this.side * this.side }
+}
+"""
+
+
+class MethodCallTest(ScriptTestCase):
+    def test_one_call_site_sees_several_classes(self):
+        self.assert_prints(SHAPES + """
+let shapes = [Circle(1), Square(2), new Circle(3), Square(4)]
+let areas = []
+for i in 0 .. 8 {
+    areas = areas + [shapes[i % 4].area()]
+}
+print(areas)
+""", ["[3, 4, 27, 16, 3, 4, 27, 16]"])
+
+    def test_methods_use_this_and_can_be_taken_as_values(self):
+        self.assert_prints(SHAPES + """
+let c = Circle(2)
+print(c.describe())
+let area = c.area
+print(area())
+""", ["circle 12", "12"])
+
+    def test_fields_shadow_methods_after_the_cache_is_warm(self):
+        self.assert_prints(SHAPES + """
+let c = Circle(1)
+let other = Circle(1)
+for i in 0 .. 3 {
+    if i == 1 { c.area = () => 42 }
+    print(c.area() + other.area())
+}
+""", ["6", "45", "45"])
+
+    def test_lambdas_and_list_methods(self):
+        self.assert_prints("""
+let double = (x) => x * 2
+print(double(4))
+print([1, 2, 3].map(double))
+""", ["8", "[2, 4, 6]"])
+
+
+POINT = """
+class Point {
+    fn init(x, y) {
+        this.x = x
+        this.y = y
+    }
+    fn sum() { return this.x + this.y }
+}
+"""
+
+
+class ShapeTest(ScriptTestCase):
+    """Instances built by the same init share a shape until one gains a field."""
+
+    def test_fields_added_after_init(self):
+        self.assert_prints(POINT + """
+let a = Point(1, 2)
+let b = Point(3, 4)
+b.z = 10
+a.y = 20
+print(a.sum())
+print(b.sum() + b.z)
+print(Point(5, 6).sum())
+""", ["21", "17", "11"])
+
+    def test_one_read_site_sees_several_shapes(self):
+        self.assert_prints(POINT + """
+let b = Point(3, 4)
+b.z = 10
+let c = Point(0, 0)
+c.w = 1
+let total = 0
+for p in [Point(1, 2), b, c, Point(5, 6), b] {
+    total = total + p.x + p.y
+}
+print(total)
+""", ["28"])
+
+    def test_missing_field(self):
+        self.assert_prints(POINT + """
+let b = Point(3, 4)
+b.z = 10
+for p in [b, Point(1, 2)] {
+    try { print(p.z) } catch (e) { print(e) }
+}
+""", ["10", "Undefined property 'z'"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from support import ENGINES, ScriptTestCase, run_script
+
+STREAMING = """
+import "fileio"
+let out = fileio.writer("events.log", 16)
+for i in 0 .. 3 {
+    out.writeline("event " + i)
+}
+out.write("ERROR last")
+out.close()
+for line in fileio.lines("events.log") {
+    print(line)
+}
+let view = fileio.mmap("events.log")
+print(view.length)
+print(view.count("event"))
+print(view.find("ERROR"))
+print(view.slice(view.find("ERROR")))
+let lines = 0
+for line in view {
+    lines = lines + 1
+}
+print(lines)
+view.close()
+"""
+
+FAILURES = """
+import "fileio"
+try {
+    for line in fileio.lines("missing.txt") { print(line) }
+} catch (e) {
+    print("lines: " + e)
+}
+try { fileio.mmap("missing.txt") } catch (e) { print("mmap: " + e) }
+try { fileio.open("missing.txt", "r") } catch (e) { print("open: " + e) }
+try { fileio.writer("missing/events.log") } catch (e) { print("writer: " + e) }
+try { fileio.writer("events.log", 1) } catch (e) { print("size: " + e) }
+"""
+
+
+class FileioTest(ScriptTestCase):
+    def test_writer_lines_and_mmap(self):
+        path = self.write("streaming.shs", STREAMING)
+        for engine, flags in ENGINES.items():
+            # writer() appends, so every engine starts from an empty log
+            self.write("events.log", "")
+            with self.subTest(engine=engine):
+                self.assertEqual(run_script(path, *flags), (
+                    "event 0\nevent 1\nevent 2\nERROR last\n34\n3\n24\nERROR last\n4\n"
+                ))
+
+    def test_opening_failures_raise(self):
+        path = self.write("failures.shs", FAILURES)
+        missing = "[Errno 2] No such file or directory"
+        for engine, flags in ENGINES.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(run_script(path, *flags).splitlines(), [
+                    f"lines: fileio: {missing}: 'missing.txt'",
+                    f"mmap: fileio: {missing}: 'missing.txt'",
+                    f"open: fileio: {missing}: 'missing.txt'",
+                    f"writer: fileio: {missing}: 'missing/events.log'",
+                    "size: fileio: buffer size must be greater than 1",
+                ])
+
+
+if __name__ == "__main__":
+    unittest.main()
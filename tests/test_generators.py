@@ -0,0 +1,85 @@
+import unittest
+
+from support import ScriptTestCase
+
+COUNTDOWN = """
+fn countdown(n) {
+    while n > 0 {
+        yield n
+        n = n - 1
+    }
+}
+"""
+
+
+class GeneratorTest(ScriptTestCase):
+    def test_generators_resume_where_they_yielded(self):
+        self.assert_prints(COUNTDOWN + """
+for i in countdown(3) { print(i) }
+fn evens(limit) {
+    for i in 0 .. limit {
+        if i % 2 == 0 { yield i }
+    }
+}
+print(list(evens(7)))
+""", ["3", "2", "1", "[0, 2, 4, 6]"])
+
+    def test_a_generator_is_exhausted_once(self):
+        self.assert_prints(COUNTDOWN + """
+let gen = countdown(2)
+print(list(gen))
+print(list(gen))
+""", ["[2, 1]", "[]"])
+
+    def test_returning_from_a_loop_over_a_generator(self):
+        self.assert_prints(COUNTDOWN + """
+fn first_below(limit) {
+    for x in countdown(100) {
+        if x < limit { return x }
+    }
+}
+print(first_below(98))
+""", ["97"])
+
+
+class ForInTest(ScriptTestCase):
+    def test_strings_and_dictionaries(self):
+        self.assert_prints("""
+let letters = []
+for ch in "abc" { letters = letters + [ch] }
+print(letters)
+let keys = []
+let d = {a: 1, b: 2}
+for k in d {
+    d["c"] = 3
+    keys = keys + [k]
+}
+print(keys)
+print(d.keys())
+""", ["[a, b, c]", "[a, b]", "[a, b, c]"])
+
+    def test_break_and_continue(self):
+        self.assert_prints("""
+let found = 0
+for x in [1, 2, 3, 4] {
+    if x == 2 { continue }
+    if x == 4 { break }
+    found = found + x
+}
+print(found)
+""", ["4"])
+
+    def test_closures_capture_each_iteration(self):
+        self.assert_prints("""
+let fs = []
+for x in [1, 2, 3] {
+    let scaled = x * 10
+    fn f() { return scaled }
+    fs = fs + [f]
+}
+print(fs[0]() + fs[1]() + fs[2]())
+""", ["60"])
+
+
+if __name__ == "__main__":
+    unittest.main()
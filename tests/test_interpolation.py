@@ -0,0 +1,35 @@
+import unittest
+
+from support import ScriptTestCase
+
+
+class InterpolationTest(ScriptTestCase):
+    def test_values_are_captured_when_the_string_is_built(self):
+        self.assert_prints("""
+let x = 5
+let s = "w ${x}"
+x = 6
+print(s)
+print("now ${x}")
+""", ["w 5", "now 6"])
+
+    def test_locals_and_parameters(self):
+        self.assert_prints("""
+fn greet(who) {
+    let punctuation = "!"
+    return "hello ${who}${punctuation}"
+}
+print(greet("ann"))
+for i in 0 .. 2 { print("row ${i}") }
+""", ["hello ann!", "row 0", "row 1"])
+
+    def test_undefined_names_stay_in_the_text(self):
+        self.assert_prints("""
+print("missing ${nobody} stays")
+let items = [1, 2]
+print("items ${items}")
+""", ["missing ${nobody} stays", "items [1, 2]"])
+
+
+if __name__ == "__main__":
+    unittest.main()
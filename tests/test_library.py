@@ -0,0 +1,69 @@
+import unittest
+
+from support import ENGINES, ScriptTestCase, run_script
+
+SLICES = """
+import fileio
+let xs = [1, 2, 3, 4, 5, 6]
+let n = 6
+print(xs.slice(0, n / 2))
+print("abcdef".slice(n / 3))
+print(slice(xs, -2))
+fileio.write("data.txt", "hello world")
+let view = fileio.mmap("data.txt")
+print(view.slice(0, view.length / 2))
+view.close()
+try { print(xs.slice("a", 2)) } catch (e) { print(e) }
+try { print(xs.slice(0, 1 / 0)) } catch (e) { print("division") }
+"""
+
+
+class SliceTest(ScriptTestCase):
+    def test_computed_positions_are_truncated(self):
+        path = self.write("slices.shs", SLICES)
+        for engine, flags in ENGINES.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(run_script(path, *flags).splitlines(), [
+                    "[1, 2, 3]", "cdef", "[5, 6]", "hello", "slice() positions must be numbers", "division",
+                ])
+
+
+class MethodDispatchTest(ScriptTestCase):
+    def test_list_methods_and_builtins(self):
+        self.assert_prints("""
+let xs = [3, 1, 2]
+print(xs.map((x) => x * 10))
+print(xs.filter((x) => x > 1))
+print(xs.reduce((a, b) => a + b, 10))
+print(xs.reduce((a, b) => a * b))
+print(xs.sort())
+print(xs.sort((x) => -x))
+print(xs)
+print(sum(xs) + xs.sum())
+print(xs.min() + xs.max((x) => -x))
+print(xs.reverse())
+print(xs.join("-"))
+print(range(1, 7, 2))
+""", ["[30, 10, 20]", "[3, 2]", "16", "6", "[1, 2, 3]", "[3, 2, 1]", "[3, 1, 2]", "12", "2",
+      "[2, 1, 3]", "3-1-2", "[1, 3, 5]"])
+
+    def test_dict_and_string_methods(self):
+        self.assert_prints("""
+let d = {a: 1, b: 2}
+print(d.keys())
+print(d.values())
+print(d.items())
+let shadow = {keys: "mine"}
+print(shadow.keys)
+print("abc".reverse())
+""", ["[a, b]", "[1, 2]", "[[a, 1], [b, 2]]", "mine", "cba"])
+
+    def test_empty_list_errors(self):
+        self.assert_prints("""
+try { [].reduce((a, b) => a + b) } catch (e) { print(e) }
+try { [].min() } catch (e) { print(e) }
+""", ["reduce() of an empty list needs an initial value", "min() of an empty list"])
+
+
+if __name__ == "__main__":
+    unittest.main()
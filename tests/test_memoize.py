@@ -0,0 +1,50 @@
+import unittest
+
+from support import ScriptTestCase
+
+
+class MemoizeTest(ScriptTestCase):
+    def test_least_recently_used_entries_are_evicted(self):
+        self.assert_prints("""
+let calls = 0
+fn square(n) {
+    calls = calls + 1
+    return n * n
+}
+let fast = memoize(square, 2)
+print(fast(3) + fast(3) + fast(4))
+print(calls)
+fast(5)
+fast(3)
+print(calls)
+print(fast.stats())
+fast.clear()
+print(fast.size)
+print(fast.maxsize)
+""", ["34", "2", "4", "{hits: 1, misses: 4, evictions: 2, size: 2, maxsize: 2}", "0", "2"])
+
+    def test_recursive_function_with_unbounded_cache(self):
+        self.assert_prints("""
+fn fib(n) {
+    if n < 2 { return n }
+    return fib(n - 1) + fib(n - 2)
+}
+fib = memoize(fib, null)
+print(fib(60))
+print(fib.misses)
+print(fib.evictions)
+""", ["1548008755920", "61", "0"])
+
+    def test_lambdas_and_unhashable_arguments(self):
+        self.assert_prints("""
+let next = memoize((a) => a + 1)
+print(next(1) + next(1))
+print(next.maxsize)
+let total = memoize((items) => sum(items))
+print(total([1, 2]) + total([1, 2]))
+print(total.size)
+""", ["4", "128", "6", "0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
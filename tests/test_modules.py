@@ -0,0 +1,29 @@
+import unittest
+
+from support import ScriptTestCase, run_script
+
+DEEP_MODULE = """
+fn depth(n) {
+    if n == 0 { return 0 }
+    return 1 + depth(n - 1)
+}
+print(depth(1500))
+"""
+
+
+class ModuleOptionsTest(ScriptTestCase):
+    """Imported modules run with the importing script's engine options."""
+
+    def setUp(self):
+        super().setUp()
+        self.write("deep.shs", DEEP_MODULE)
+        self.path = self.write("main.shs", 'import "deep"\nprint("done")\n')
+
+    def test_max_depth_applies_to_modules(self):
+        self.assertEqual(run_script(self.path, "--vm"), "1500\ndone\n")
+        self.assertEqual(run_script(self.path, "--vm", "--max-depth", "1000"),
+                         "Runtime Error: Maximum call depth of 1000 exceeded\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from support import ScriptTestCase
+
+
+class NdarrTest(ScriptTestCase):
+    def test_elementwise_arithmetic_keeps_dtypes(self):
+        self.assert_prints("""
+import "ndarr"
+let a = ndarr.arange(0, 5, 1, "int64")
+let b = ndarr.ones(5, "int64")
+print(a * 2 + b)
+print(10 - a)
+print(a / 2)
+print(-a)
+print(ndarr.sqrt(ndarr.array([1, 4, 9])))
+print(ndarr.linspace(0, 1, 3))
+print(ndarr.zeros(3).astype("int64"))
+""", [
+            "ndarr([1, 3, 5, 7, 9], int64)",
+            "ndarr([10, 9, 8, 7, 6], int64)",
+            "ndarr([0, 0.5, 1, 1.5, 2], float64)",
+            "ndarr([0, -1, -2, -3, -4], int64)",
+            "ndarr([1, 2, 3], float64)",
+            "ndarr([0, 0.5, 1], float64)",
+            "ndarr([0, 0, 0], int64)",
+        ])
+
+    def test_reductions_indexing_and_iteration(self):
+        self.assert_prints("""
+import "ndarr"
+let a = ndarr.arange(0, 5, 1, "int64")
+print(a.sum())
+print(a.mean())
+print(ndarr.dot(a, ndarr.ones(5, "int64")))
+print(a.max() + a.min())
+a[2] = 7
+print(a[2])
+print(a.tolist())
+print(a.length)
+print(a.dtype)
+let total = 0
+for x in a { total = total + x }
+print(total)
+print(ndarr.zeros(2000))
+""", ["10", "2", "10", "4", "7", "[0, 1, 7, 3, 4]", "5", "int64", "15", "ndarr([0, 0, 0, ..., 0, 0, 0], float64)"])
+
+    def test_errors(self):
+        self.assert_prints("""
+import "ndarr"
+let a = ndarr.zeros(5, "int64")
+try { print(a + ndarr.ones(2)) } catch (e) { print(e) }
+try { a[0] = 1.5 } catch (e) { print(e) }
+try { ndarr.zeros(2, "int8") } catch (e) { print(e) }
+""", [
+            "ndarr: arrays have different lengths (5 and 2)",
+            "ndarr: cannot store a float in an int64 array",
+            "ndarr: unknown dtype 'int8' (expected float64 or int64)",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from support import ENGINES, ScriptTestCase, run_script
+
+# name -> (source, expected output); every case must print the same with
+# and without -O on every engine
+CASES = {
+    "folding": ("""
+print(60 * 60 * 24)
+print(2 ** 10 - 1)
+print(7 / 2)
+print(7 % 3 + -1)
+print("a" + 1 + 2)
+print(1 + 2 + "a")
+print(1 < 2 and 3 >= 3)
+print(not (0 or ""))
+print("ab" == "a" + "b")
+""", "86400\n1023\n3.5\n0\na12\n3a\ntrue\ntrue\ntrue\n"),
+
+    "failing folds stay at runtime": ("""
+try {
+    print(1 / 0)
+} catch (e) {
+    print("caught")
+}
+print("after")
+""", "caught\nafter\n"),
+
+    "branch pruning": ("""
+if false { print("never") } elif 1 + 1 == 2 { print("elif") } else { print("else") }
+if 0 { print("zero") } else { print("else branch") }
+if "" { print("empty") }
+while false { print("loop") }
+let n = 0
+while 1 > 2 { n = n + 1 }
+print(n)
+if true { print("always") } else { print("dead") }
+""", "elif\nelse branch\n0\nalways\n"),
+
+    "inlined if bodies keep block scope": ("""
+let x = "outer"
+if true {
+    let x = "inner"
+    print(x)
+}
+print(x)
+fn f() {
+    if 1 {
+        let y = 1
+        print(y)
+    } else {
+        let y = 2
+    }
+    if true {
+        x = "assigned"
+    }
+    return x
+}
+print(f())
+print(x)
+""", "inner\nouter\n1\nassigned\nassigned\n"),
+
+    "templates are copied on every use": ("""
+fn make() { return [1, 2, 3] }
+let a = make()
+let b = make()
+a[0] = 99
+print(a)
+print(b)
+fn config() { return {debug: false, level: 1} }
+let c = config()
+c["level"] = 5
+print(config().level)
+let rows = []
+for i in 0 .. 3 {
+    let row = [0, 0]
+    row[0] = i
+    rows = rows + [row]
+}
+print(rows)
+""", "[99, 2, 3]\n[1, 2, 3]\n1\n[[0, 0], [1, 0], [2, 0]]\n"),
+
+    "signed zeros stay distinct constants": ("""
+print(0.0)
+print(-0.0)
+let x = -0.0
+print(x)
+print(0.0 * -1)
+""", "0\n-0\n-0\n-0\n"),
+}
+
+
+class OptimizerEquivalenceTest(ScriptTestCase):
+    def test_optimized_output_is_identical(self):
+        for name, (source, expected) in CASES.items():
+            path = self.write("case.shs", source)
+            for engine, flags in ENGINES.items():
+                for optimize in ([], ["-O"]):
+                    with self.subTest(case=name, engine=engine, optimize=bool(optimize)):
+                        self.assertEqual(run_script(path, "--no-cache", *flags, *optimize), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
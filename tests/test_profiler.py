@@ -0,0 +1,34 @@
+import os
+import unittest
+
+from support import ScriptTestCase, run_script
+
+# Deeper than Python's recursion limit unless tail calls reuse the caller's place
+TAIL_RECURSION = """
+fn loop(n) {
+    if n == 0 { return "done" }
+    return loop(n - 1)
+}
+print(loop(3000))
+"""
+
+
+class ProfilerTest(ScriptTestCase):
+    def test_tail_calls_run_in_constant_stack_while_profiling(self):
+        path = self.write("loop.shs", TAIL_RECURSION)
+        self.assertEqual(run_script(path, "--profile"), "done\n")
+
+    def test_collapsed_stacks_only_written_when_asked(self):
+        path = self.write("loop.shs", TAIL_RECURSION)
+        directory = os.path.dirname(path)
+        run_script(path, "--profile")
+        self.assertEqual(sorted(os.listdir(directory)), ["loop.shs"])
+
+        collapsed = os.path.join(directory, "stacks.txt")
+        self.assertEqual(run_script(path, "--collapsed", collapsed), "done\n")
+        with open(collapsed, encoding="utf-8") as file:
+            self.assertIn("<main>;loop:1 ", file.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from support import ENGINES, ScriptTestCase, run_script
+
+DEEP = """
+fn depth(n) {
+    if n == 0 { return 0 }
+    return 1 + depth(n - 1)
+}
+print(depth(10000))
+print(depth(50000))
+"""
+
+# Nesting depth of the parenthesized expression in NESTED
+NESTING = 100000
+NESTED = "print(" + "(" * NESTING + "1" + ")" * NESTING + ")\n"
+
+
+class RecursionTest(ScriptTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = self.write("deep.shs", DEEP)
+
+    def test_tree_walker_and_closures_report_call_depth(self):
+        expected = "10000\nRuntime Error: Maximum call depth exceeded (run deeply recursive scripts with --vm)\n"
+        self.assertEqual(run_script(self.path, "--no-tier-up"), expected)
+        self.assertEqual(run_script(self.path, "--closures"), expected)
+
+    def test_vm_runs_deep_recursion(self):
+        self.assertEqual(run_script(self.path, "--vm"), "10000\n50000\n")
+        self.assertEqual(run_script(self.path, "--vm", "--max-depth", "20000"),
+                         "10000\nRuntime Error: Maximum call depth of 20000 exceeded\n")
+
+    def test_deep_nesting_is_a_syntax_error(self):
+        path = self.write("nested.shs", NESTED)
+        for engine, flags in ENGINES.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(run_script(path, "--no-cache", *flags), "Syntax Error: Program is nested too deeply\n")
+
+    def test_max_depth_requires_vm(self):
+        self.assertEqual(run_script(self.path, "--max-depth", "1000"),
+                         "Error: --max-depth is only supported with --vm\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from support import ENGINES, ScriptTestCase, run_script
+
+# Enough calls for every function below to be transpiled partway through
+CALLS = 300
+
+HUGE = "9" * 200 + ".0"
+
+NON_FINITE = f"""
+fn big(x) {{ return x + {HUGE} * {HUGE} }}
+fn nan(x) {{ return x + ({HUGE} * {HUGE} - {HUGE} * {HUGE}) }}
+fn small(x) {{ return x - {HUGE} * {HUGE} }}
+let results = []
+for i in 0 .. {CALLS} {{
+    results = [big(i), nan(i), small(i)]
+}}
+print(results)
+"""
+
+# Empty ndarr arrays have a Python length of 0 but are truthy in ShravScript
+TRUTHINESS = f"""
+import "ndarr"
+fn branch(x) {{ if x {{ return 1 }} return 0 }}
+fn loop(x) {{
+    let n = 0
+    while x and n < 2 {{ n = n + 1 }}
+    return n
+}}
+fn negate(x) {{ return not x }}
+let empty = ndarr.array([], "int64")
+let totals = [0, 0, 0]
+for i in 0 .. {CALLS} {{
+    totals = [totals[0] + branch(empty), totals[1] + loop(empty), totals[2]]
+    if negate(empty) {{ totals[2] = totals[2] + 1 }}
+}}
+print(totals)
+"""
+
+
+class TierUpTest(ScriptTestCase):
+    """Hot functions must give the same results before and after tier-up."""
+
+    def assert_same_everywhere(self, source, expected):
+        path = self.write("script.shs", source)
+        for optimize in ([], ["-O"]):
+            self.assertEqual(run_script(path, "--no-cache", "--no-tier-up", *optimize), expected)
+            for engine, flags in ENGINES.items():
+                with self.subTest(engine=engine, optimize=bool(optimize)):
+                    self.assertEqual(run_script(path, "--no-cache", *flags, *optimize), expected)
+
+    def test_non_finite_literals(self):
+        self.assert_same_everywhere(NON_FINITE, "[inf, nan, -inf]\n")
+
+    def test_conditions_use_shravscript_truthiness(self):
+        self.assert_same_everywhere(TRUTHINESS, "[300, 600, 0]\n")
+
+
+if __name__ == "__main__":
+    unittest.main()